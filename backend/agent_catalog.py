@@ -0,0 +1,125 @@
+"""
+Copy-on-write catalog of the custom agents.
+
+Routing reads the custom agents for every segment of every session, while
+create/update/delete messages and other workers' changes (see storage.py)
+modify them. Instead of one list changed in place under the readers, each
+change builds a new AgentCatalog snapshot (the agents in order, a name
+index and one compiled trigger pattern) and swaps it in with a single
+assignment. A reader takes agent_catalog.snapshot once and works on that
+snapshot: it never sees a half-applied change, needs no lock, and finds
+an agent by name or by trigger without scanning the list.
+
+Snapshots are never modified after they are built, so neither are the
+agent configs they hold; changes always go through the catalog.
+"""
+import re
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from storage import store, ENTITY_AGENTS
+
+# Get the logger instance configured in main.py
+logger = logging.getLogger("main")
+
+
+class AgentCatalog:
+    """Immutable snapshot of the custom agents."""
+    __slots__ = ("agents", "by_name", "version", "_trigger_pattern", "_trigger_owner")
+
+    def __init__(self, agents: List[dict], version: int = 0):
+        # One config per name, in creation order
+        by_name: Dict[str, dict] = {}
+        for agent in agents:
+            by_name[agent.get("name", "Custom Agent")] = agent
+        self.agents: Tuple[dict, ...] = tuple(by_name.values())
+        self.by_name = by_name
+        self.version = version
+
+        # Lowercased trigger -> position of the first agent that has it
+        owner: Dict[str, int] = {}
+        for position, agent in enumerate(self.agents):
+            for trigger in agent.get("triggers") or ():
+                owner.setdefault(str(trigger).lower(), position)
+        self._trigger_owner = owner
+        # Alternatives in agent order inside a lookahead: at each position the match
+        # reported is the trigger of the earliest agent that matches there
+        self._trigger_pattern = (re.compile("(?=(" + "|".join(map(re.escape, owner)) + "))")
+                                 if owner else None)
+
+    def __len__(self) -> int:
+        return len(self.agents)
+
+    def get(self, name: str) -> Optional[dict]:
+        return self.by_name.get(name)
+
+    def match_trigger(self, lowered_text: str) -> Optional[dict]:
+        """
+        The first agent, in catalog order, with a trigger in the (lowercased) text.
+
+        Same result as checking each agent's triggers in turn, in one pass
+        over the text.
+        """
+        if self._trigger_pattern is None:
+            return None
+        best = None
+        for match in self._trigger_pattern.finditer(lowered_text):
+            position = self._trigger_owner[match.group(1)]
+            if best is None or position < best:
+                best = position
+                if best == 0:
+                    break
+        return self.agents[best] if best is not None else None
+
+    def with_agent(self, config: dict, old_name: Optional[str] = None) -> "AgentCatalog":
+        """A new snapshot with config added, or replacing old_name (or its own name) in place."""
+        name = config.get("name")
+        replaced = old_name if old_name in self.by_name else name
+        if replaced not in self.by_name:
+            return AgentCatalog(list(self.agents) + [config], self.version + 1)
+        agents = []
+        for agent in self.agents:
+            if agent.get("name") == replaced:
+                agents.append(config)
+            elif agent.get("name") != name:
+                # A rename onto another agent's name replaces that agent
+                agents.append(agent)
+        return AgentCatalog(agents, self.version + 1)
+
+    def without_agent(self, name: str) -> "AgentCatalog":
+        return AgentCatalog([agent for agent in self.agents if agent.get("name") != name], self.version + 1)
+
+
+class CustomAgentCatalog:
+    """Holds the current snapshot; every change swaps in a new one."""
+
+    def __init__(self, agents: List[dict]):
+        self.snapshot = AgentCatalog(agents)
+
+    def create(self, config: dict):
+        self.snapshot = self.snapshot.with_agent(config)
+
+    def update(self, old_name: str, config: dict) -> bool:
+        """Replace the agent named old_name; False if there is none."""
+        snapshot = self.snapshot
+        if old_name not in snapshot.by_name:
+            return False
+        self.snapshot = snapshot.with_agent(config, old_name=old_name)
+        return True
+
+    def delete(self, name: str) -> bool:
+        snapshot = self.snapshot
+        if name not in snapshot.by_name:
+            return False
+        self.snapshot = snapshot.without_agent(name)
+        return True
+
+    def replace(self, agents: List[dict]):
+        """Pick up custom agents changed by another worker."""
+        self.snapshot = AgentCatalog(agents, self.snapshot.version + 1)
+        logger.info(f"Reloaded {len(self.snapshot)} custom agents from the store")
+
+
+# Create singleton instance
+agent_catalog = CustomAgentCatalog(store.load_agents())
+store.subscribe(ENTITY_AGENTS, agent_catalog.replace)
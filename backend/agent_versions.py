@@ -1,124 +1,322 @@
 """
 Agent versioning system for the AI Meeting Assistant.
 Allows creating and managing multiple versions of agents without modifying the original code.
+
+Versions are held in memory, indexed by agent and version name, so reads
+never touch the disk. Changes are buffered and appended to a journal
+shortly after they are made (AGENT_VERSIONS_FLUSH_DELAY); once the
+journal reaches AGENT_VERSIONS_COMPACT_EVERY entries it is folded into
+agent_versions.json, which is written to a temporary file and renamed
+into place so it is never left half-written. Both writes run on the I/O
+thread (see io_executor.py). At startup the snapshot is loaded and the
+journal replayed over it.
+
+With the SQLite store (STORE_BACKEND=sqlite, see storage.py) the database
+replaces the files: changes are written to it in the background, and the
+index is reloaded when another worker changes a version.
 """
 import os
 import json
 import logging
 import time
+import asyncio
+from typing import Dict, List, Optional
 from utils import extract_agent_prompt
+from storage import store, ENTITY_VERSIONS
+from io_executor import io_executor
 
 # Get the logger instance configured in main.py
 logger = logging.getLogger("main")
 
-# File to store agent versions
+# File to store agent versions, and the journal of changes not yet folded into it
 AGENT_VERSIONS_FILE = os.path.join(os.path.dirname(__file__), 'agent_versions.json')
+AGENT_VERSIONS_JOURNAL_FILE = os.path.join(os.path.dirname(__file__), 'agent_versions.journal.jsonl')
 
-# Initialize agent versions with empty data if file doesn't exist
-if not os.path.exists(AGENT_VERSIONS_FILE):
-    with open(AGENT_VERSIONS_FILE, 'w') as f:
-        json.dump({}, f)
-        logger.info(f"Created empty agent versions file at {AGENT_VERSIONS_FILE}")
+# Seconds changes are buffered before they are appended to the journal
+AGENT_VERSIONS_FLUSH_DELAY = float(os.getenv("AGENT_VERSIONS_FLUSH_DELAY", "1.0"))
+# Journal entries after which the journal is compacted into the snapshot file
+AGENT_VERSIONS_COMPACT_EVERY = int(os.getenv("AGENT_VERSIONS_COMPACT_EVERY", "100"))
 
-# Load agent versions from file
-def load_agent_versions():
-    """Load all agent versions from the JSON file."""
-    try:
-        with open(AGENT_VERSIONS_FILE, 'r') as f:
-            versions = json.load(f)
-            logger.info(f"Loaded agent versions from {AGENT_VERSIONS_FILE}")
-            return versions
-    except Exception as e:
-        logger.error(f"Error loading agent versions: {e}")
-        return {}
-
-# Save agent versions to file
-def save_agent_versions(versions):
-    """Save agent versions to the JSON file."""
-    try:
-        with open(AGENT_VERSIONS_FILE, 'w') as f:
-            json.dump(versions, f, indent=2)
-        logger.info(f"Saved agent versions to {AGENT_VERSIONS_FILE}")
+
+class AgentVersionStore:
+    """
+    In-memory index of agent versions with a write-behind journal.
+
+    Journal entries are {"op": "create", "agent": ..., "version": {...}} and
+    {"op": "delete", "agent": ..., "version_name": ...}. Replaying them is
+    idempotent: creating an existing version replaces it, and deleting a
+    missing one does nothing, so a crash between compaction and truncating
+    the journal loses nothing.
+    """
+
+    def __init__(self, snapshot_file: str = AGENT_VERSIONS_FILE, journal_file: str = AGENT_VERSIONS_JOURNAL_FILE):
+        self.snapshot_file = snapshot_file
+        self.journal_file = journal_file
+        # agent name -> version name -> version, in creation order
+        self.versions: Dict[str, Dict[str, dict]] = {}
+        self.journal_entries = 0
+        self._pending: List[dict] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # False when versions live in the store's database rather than the files
+        self.journaled = True
+        # Database writes still in flight
+        self._writes = set()
+        self.load()
+
+    def load(self):
+        """Load versions from the store's database, or from the snapshot and journal files."""
+        records = store.load_versions()
+        if records is None:
+            self.load_files()
+            return
+        self.journaled = False
+        if not records and (os.path.exists(self.snapshot_file) or os.path.exists(self.journal_file)):
+            # A new database: bring over the versions kept in files so far
+            self.load_files()
+            records = {agent_name: list(versions.values()) for agent_name, versions in self.versions.items()}
+            store.import_versions(records)
+            logger.info(f"Imported versions of {len(records)} agents into the store")
+        self.index(records)
+        store.subscribe(ENTITY_VERSIONS, self.index)
+
+    def index(self, records: Dict[str, List[dict]]):
+        """Replace the in-memory index with versions loaded from the store."""
+        versions: Dict[str, Dict[str, dict]] = {}
+        for agent_name, agent_versions in records.items():
+            for version in agent_versions:
+                versions.setdefault(agent_name, {})[version["version_name"]] = version
+        self.versions = versions
+
+    def load_files(self):
+        """Load the snapshot, replay the journal over it and compact if the journal had entries."""
+        self.versions = {}
+        if os.path.exists(self.snapshot_file):
+            try:
+                with open(self.snapshot_file, 'r') as f:
+                    for agent_name, versions in json.load(f).items():
+                        for version in versions:
+                            self._apply({"op": "create", "agent": agent_name, "version": version})
+                logger.info(f"Loaded agent versions from {self.snapshot_file}")
+            except Exception as e:
+                logger.error(f"Error loading agent versions: {e}")
+        self.journal_entries = 0
+        if os.path.exists(self.journal_file):
+            try:
+                with open(self.journal_file, 'r') as f:
+                    for line in f:
+                        if line.strip():
+                            self._apply(json.loads(line))
+                            self.journal_entries += 1
+            except json.JSONDecodeError:
+                # A torn final line from a crash mid-append; everything before it is kept
+                logger.warning(f"Ignoring incomplete entry at the end of {self.journal_file}")
+            except Exception as e:
+                logger.error(f"Error replaying agent versions journal: {e}")
+        if self.journal_entries or not os.path.exists(self.snapshot_file):
+            self.compact()
+
+    def _apply(self, entry: dict):
+        agent_name = entry["agent"]
+        if entry["op"] == "create":
+            version = entry["version"]
+            self.versions.setdefault(agent_name, {})[version["version_name"]] = version
+        elif entry["op"] == "delete":
+            versions = self.versions.get(agent_name)
+            if versions is not None:
+                versions.pop(entry["version_name"], None)
+                if not versions:
+                    del self.versions[agent_name]
+
+    def _record(self, entry: dict):
+        """Apply a change in memory and queue it for the journal, or write it to the store's database."""
+        self._apply(entry)
+        if not self.journaled:
+            if entry["op"] == "create":
+                write = store.save_version(entry["agent"], entry["version"])
+            else:
+                write = store.delete_version(entry["agent"], entry["version_name"])
+            try:
+                task = asyncio.get_running_loop().create_task(write)
+            except RuntimeError:
+                asyncio.run(write)
+                return
+            self._writes.add(task)
+            task.add_done_callback(self._writes.discard)
+            return
+        self._pending.append(entry)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop (scripts): write straight away
+            self.flush()
+            return
+        if self._flush_handle is None:
+            self._flush_handle = loop.call_later(AGENT_VERSIONS_FLUSH_DELAY, self.flush)
+
+    def get(self, agent_name: str, version_name: str) -> Optional[dict]:
+        return self.versions.get(agent_name, {}).get(version_name)
+
+    def list(self, agent_name: str) -> List[dict]:
+        return list(self.versions.get(agent_name, {}).values())
+
+    def create(self, agent_name: str, version: dict):
+        self._record({"op": "create", "agent": agent_name, "version": version})
+
+    def delete(self, agent_name: str, version_name: str) -> bool:
+        if self.get(agent_name, version_name) is None:
+            return False
+        self._record({"op": "delete", "agent": agent_name, "version_name": version_name})
         return True
-    except Exception as e:
-        logger.error(f"Error saving agent versions: {e}")
-        return False
+
+    def flush(self):
+        """Append buffered changes to the journal on the I/O thread, compacting it once it is long enough."""
+        self._flush_handle = None
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        lines = [json.dumps(entry) + "\n" for entry in pending]
+        # Counted when submitted, so a compaction knows which entries its snapshot covers
+        self.journal_entries += len(pending)
+        io_executor.submit(self._append_journal, lines, done=lambda written: self._flushed(pending, written))
+        if self.journal_entries >= AGENT_VERSIONS_COMPACT_EVERY:
+            self.compact()
+
+    def _append_journal(self, lines: List[str]) -> bool:
+        try:
+            with open(self.journal_file, 'a') as f:
+                f.writelines(lines)
+                f.flush()
+                os.fsync(f.fileno())
+            return True
+        except Exception as e:
+            logger.error(f"Error saving agent versions journal: {e}")
+            return False
+
+    def _flushed(self, pending: List[dict], written: bool):
+        if not written:
+            # Keep the entries for the next flush, and make sure there is one
+            self.journal_entries -= len(pending)
+            self._pending = pending + self._pending
+            if self._flush_handle is None:
+                try:
+                    loop = asyncio.get_running_loop()
+                except RuntimeError:
+                    return
+                self._flush_handle = loop.call_later(AGENT_VERSIONS_FLUSH_DELAY, self.flush)
+
+    def compact(self):
+        """Write the whole index to the snapshot file atomically and empty the journal, on the I/O thread."""
+        if not self.journaled:
+            return
+        # Versions are replaced, never modified, so copying the lists is a consistent snapshot
+        snapshot = {agent_name: list(versions.values()) for agent_name, versions in self.versions.items()}
+        entries = self.journal_entries
+        io_executor.submit(self._write_snapshot, snapshot, done=lambda written: self._compacted(entries, written))
+
+    def _write_snapshot(self, snapshot: Dict[str, List[dict]]) -> bool:
+        temp_file = f"{self.snapshot_file}.tmp"
+        try:
+            with open(temp_file, 'w') as f:
+                json.dump(snapshot, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_file, self.snapshot_file)
+            # Journal appends run on the same thread in submission order, so every
+            # entry in the journal now is in the snapshot; replaying them would be harmless
+            if os.path.exists(self.journal_file):
+                open(self.journal_file, 'w').close()
+            logger.info(f"Saved agent versions to {self.snapshot_file}")
+            return True
+        except Exception as e:
+            logger.error(f"Error saving agent versions: {e}")
+            return False
+
+    def _compacted(self, entries: int, written: bool):
+        if written:
+            # Entries submitted after the snapshot was taken are still in the journal
+            self.journal_entries = max(0, self.journal_entries - entries)
+
+    async def close(self):
+        """Write out buffered changes and compact, e.g. at shutdown."""
+        if self._writes:
+            await asyncio.gather(*self._writes, return_exceptions=True)
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+        self.flush()
+        await io_executor.drain()
+        if self._flush_handle is not None:
+            # The flush failed and was re-armed; the compaction below covers its entries
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self._pending or self.journal_entries:
+            self.compact()
+            await io_executor.drain()
+
+
+# Create singleton instance
+version_store = AgentVersionStore()
+
+# Load agent versions
+def load_agent_versions():
+    """All agent versions, by agent name."""
+    return {agent_name: version_store.list(agent_name) for agent_name in version_store.versions}
+
+# Save agent versions
+def save_agent_versions(versions=None):
+    """Queue the agent versions to be written out now; versions is accepted for compatibility and ignored."""
+    version_store.flush()
+    version_store.compact()
+    return True
 
 # Get all versions of a specific agent
 def get_agent_versions(agent_name):
     """Get all versions of a specific agent."""
-    versions = load_agent_versions()
-    if agent_name in versions:
-        return versions[agent_name]
-    return []
+    return version_store.list(agent_name)
+
+# Get one version of a specific agent
+def get_agent_version(agent_name, version_name):
+    """Get a version of an agent by name, or None."""
+    return version_store.get(agent_name, version_name)
 
 # Get the latest version of a specific agent
 def get_latest_agent_version(agent_name):
     """Get the latest version of a specific agent."""
     versions = get_agent_versions(agent_name)
     if versions:
-        # Sort by timestamp (descending) and get the first one
-        sorted_versions = sorted(versions, key=lambda x: x.get('timestamp', 0), reverse=True)
-        return sorted_versions[0]
+        return max(versions, key=lambda x: x.get('timestamp', 0))
     return None
 
 # Create a new version of an agent
 def create_agent_version(agent_name, prompt_text, version_name, description=""):
-    """Create a new version of an agent."""
-    versions = load_agent_versions()
-    
-    # Initialize agent entry if it doesn't exist
-    if agent_name not in versions:
-        versions[agent_name] = []
-    
-    # Create new version object
+    """Create a new version of an agent, replacing any existing version of the same name."""
     version = {
         "version_name": version_name,
         "prompt_text": prompt_text,
         "timestamp": int(time.time()),
         "description": description
     }
-    
-    # Add to versions list
-    versions[agent_name].append(version)
-    
-    # Save updated versions
-    if save_agent_versions(versions):
-        return {"success": True, "version": version}
-    else:
-        return {"error": "Failed to save agent version"}
+    version_store.create(agent_name, version)
+    return {"success": True, "version": version}
 
 # Delete a specific version of an agent
 def delete_agent_version(agent_name, version_name):
     """Delete a specific version of an agent."""
-    versions = load_agent_versions()
-    
-    if agent_name not in versions:
+    if agent_name not in version_store.versions:
         return {"error": f"Agent {agent_name} not found"}
-    
-    # Find version by name
-    for i, version in enumerate(versions[agent_name]):
-        if version.get("version_name") == version_name:
-            versions[agent_name].pop(i)
-            
-            # Save updated versions
-            if save_agent_versions(versions):
-                return {"success": True, "message": f"Deleted version {version_name} of {agent_name}"}
-            else:
-                return {"error": "Failed to save after deletion"}
-    
-    return {"error": f"Version {version_name} not found for {agent_name}"}
+    if not version_store.delete(agent_name, version_name):
+        return {"error": f"Version {version_name} not found for {agent_name}"}
+    return {"success": True, "message": f"Deleted version {version_name} of {agent_name}"}
 
 # Extract the original prompt for an agent
 def extract_original_agent_prompt(agent_name):
     """Extract the original prompt for an agent."""
-    result = extract_agent_prompt(agent_name)
+    result = extract_agent_prompt(agent_name, original=True)
     if "error" in result:
         return result
-    
+
     return {
         "success": True,
         "agent_name": agent_name,
         "prompt_text": result["prompt_text"],
         "is_original": True
-    }
\ No newline at end of file
+    }
@@ -0,0 +1,220 @@
+# backend/agents/combined_agent.py
+import json
+import asyncio
+import logging
+from typing import List, Optional
+from utils import format_agent_response
+from llm_providers import llm_client, CallPriority, current_call_priority
+from model_registry import TASK_SHORT_CARD
+from structured_output import STRUCTURED_OUTPUT_ENABLED, combined_card_schema, render_card, COMBINED_CARD_SCHEMA_INSTRUCTIONS
+from relevance_gate import relevance_gate
+from insight_dedup import insight_dedup
+from prompt_registry import prompt_registry
+from meeting_memory import current_meeting_memory, MEETING_MEMORY_FOR_AGENTS, MEETING_MEMORY_PROMPT_SECTION
+
+from agents.registry import (
+    AGENT_SPECS, canonical_agent_name, run_agent,
+    input_rejection, report_input_rejection, output_rejection, OUTPUT_TOO_SHORT, OUTPUT_NO_CONTEXT,
+)
+
+# Get the logger instance configured in main.py
+logger = logging.getLogger("main")
+
+# Agents that can share a single combined request, keyed by the name their cards are broadcast under
+COMBINABLE_AGENTS = {name: spec for name, spec in AGENT_SPECS.items() if spec.combinable}
+
+# Stands in for the transcript inside each agent's instructions; the transcript itself is sent once
+SHARED_TRANSCRIPT_REFERENCE = "[the SHARED TRANSCRIPT above]"
+
+# Extra output tokens per card for the JSON wrapper and escaping
+JSON_OVERHEAD_TOKENS = 60
+
+
+def is_combinable(name: str) -> bool:
+    """Whether an agent can be served from a combined request."""
+    return canonical_agent_name(name) in COMBINABLE_AGENTS
+
+
+def build_combined_prompt(agent_names: List[str], text: str, background: str = "", structured: bool = False) -> str:
+    """
+    Build one prompt that asks for a card from each agent, sending the transcript (and meeting background) only once.
+
+    With structured=True the output instructions describe combined_card_schema instead of a free-text JSON array.
+    """
+    sections = []
+    for agent_name in agent_names:
+        template = prompt_registry.template_for(COMBINABLE_AGENTS[agent_name])
+        sections.append(f"=== AGENT: {agent_name} ===\n{template.render(text=SHARED_TRANSCRIPT_REFERENCE)}")
+    agent_list = ", ".join(f'"{name}"' for name in agent_names)
+    background_section = MEETING_MEMORY_PROMPT_SECTION.format(background=background) if background else ""
+    if structured:
+        output_instructions = COMBINED_CARD_SCHEMA_INSTRUCTIONS.format(agent_list=agent_list)
+    else:
+        output_instructions = f"""Return ONLY a JSON array with exactly one object per agent, in this order: {agent_list}.
+Each object must have the form {{"agent": "<agent name>", "content": "<that agent's complete card>"}}.
+If an agent's instructions tell it to respond with "NO_BUSINESS_CONTEXT", use exactly that as its content.
+Do not add any text before or after the JSON array."""
+
+    return f"""You are writing insight cards for several specialist agents of an AI meeting assistant for BUSINESS meetings. Each agent has its own role, instructions and output format below. Write each card exactly as that agent would on its own, following its format precisely and independently of the other agents.
+
+SHARED TRANSCRIPT:
+"{text}"{background_section}
+
+{chr(10).join(sections)}
+
+=== OUTPUT ===
+{output_instructions}"""
+
+
+def parse_combined_response(raw_text: str) -> dict:
+    """
+    Split a combined response into per-agent card contents.
+
+    Returns a dict of agent name -> content. Malformed output yields an empty dict.
+    """
+    text = raw_text.strip()
+    start, end = text.find("["), text.rfind("]")
+    if start == -1 or end <= start:
+        return {}
+    try:
+        items = json.loads(text[start:end + 1])
+    except json.JSONDecodeError as e:
+        logger.warning(f"[Combined Agents] Could not parse JSON response: {e}")
+        return {}
+
+    cards = {}
+    lowered = {name.lower(): name for name in COMBINABLE_AGENTS}
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        name = canonical_agent_name(str(item.get("agent", "")).strip())
+        name = lowered.get(name.lower(), name)
+        content = item.get("content")
+        if name in COMBINABLE_AGENTS and isinstance(content, str):
+            cards[name] = content.strip()
+    return cards
+
+
+def parse_structured_combined_response(parsed: Optional[dict]) -> dict:
+    """Per-agent card contents from a combined_card_schema response; the first card per agent wins."""
+    cards = {}
+    for item in (parsed or {}).get("cards") or []:
+        if not isinstance(item, dict):
+            continue
+        name = canonical_agent_name(str(item.get("agent", "")).strip())
+        if name in COMBINABLE_AGENTS and name not in cards:
+            cards[name] = render_card(item, COMBINABLE_AGENTS[name].no_context_marker).strip()
+    return cards
+
+
+async def run_combined_agents(agent_names: List[str], text: str, model, broadcaster: callable):
+    """
+    Generates cards for several agents with a single LLM request.
+
+    The transcript and shared instructions are sent once and the model returns
+    a JSON array with one card per agent, which is split and broadcast under
+    each agent's own name. Agents whose card is missing from the response are
+    run individually.
+    """
+    agent_names = list(dict.fromkeys(canonical_agent_name(name) for name in agent_names))
+    logger.info(f">>> Running Combined Agents: {', '.join(agent_names)}")
+
+    # --- Input Validation ---
+    if not model:
+        logger.error("[Combined Agents] Failed: model instance not provided.")
+        return
+    if not broadcaster:
+        logger.critical("[Combined Agents] Failed: Broadcaster function not provided. Cannot send insights.")
+        return
+    unknown = [name for name in agent_names if name not in COMBINABLE_AGENTS]
+    if unknown:
+        logger.error(f"[Combined Agents] Failed: agents cannot be combined: {unknown}")
+        return
+    # Apply each agent's own input filter, as run_agent would, before anything is paid for
+    rejections = {name: input_rejection(COMBINABLE_AGENTS[name], text) for name in agent_names}
+    for name, rejection in rejections.items():
+        if rejection is not None:
+            await report_input_rejection(COMBINABLE_AGENTS[name], text, rejection, broadcaster)
+    agent_names = [name for name in agent_names if rejections[name] is None]
+    if not agent_names:
+        return
+
+    # Leave out agents whose relevance models predict a no-context answer
+    gated = current_call_priority.get() != CallPriority.EXPLICIT
+    gate_decisions = dict(zip(agent_names, relevance_gate.check_many(agent_names, text, gated=gated)))
+    skipped = [name for name, decision in gate_decisions.items() if decision is not None and not decision.run]
+    if skipped:
+        logger.info(f"[Combined Agents] Skipped by relevance gate: {skipped}")
+    # ...and those that already answered a near-duplicate of this input
+    covered = [name for name in agent_names if name not in skipped and insight_dedup.covered(name, text, gated=gated)]
+    if covered:
+        logger.info(f"[Combined Agents] Skipped as near-duplicate input: {covered}")
+    if skipped or covered:
+        agent_names = [name for name in agent_names if name not in skipped and name not in covered]
+        if not agent_names:
+            return
+
+    params = [COMBINABLE_AGENTS[name].model_params for name in agent_names]
+    # The meeting's summary and topics as background, sent once for all agents
+    memory = current_meeting_memory.get()
+    background = memory.background() if MEETING_MEMORY_FOR_AGENTS and memory is not None else ""
+    # With structured output the cards array is enforced by the provider rather than parsed from free text
+    response_schema = combined_card_schema(agent_names) if STRUCTURED_OUTPUT_ENABLED else None
+    combined_prompt = build_combined_prompt(agent_names, text, background, structured=response_schema is not None)
+
+    cards = {}
+    try:
+        logger.info(f"[Combined Agents] Sending one request for {len(agent_names)} agents...")
+        model_config = llm_client.model_config_for(
+            TASK_SHORT_CARD,
+            agent_name="Combined Agents",
+            temperature=sum(p["temperature"] for p in params) / len(params),
+            max_tokens=sum(p["max_tokens"] + JSON_OVERHEAD_TOKENS for p in params),
+            top_p=max(p["top_p"] for p in params)
+        )
+        # No early abort: the first card being a no-context answer says nothing about the others
+        model_response = await llm_client.generate_content(
+            combined_prompt, model_config, agent_name="Combined Agents", response_schema=response_schema
+        )
+        logger.info(f"[Combined Agents] Using {model_response.model_provider} model: {model_response.model_name}")
+
+        if model_response.finish_reason == "SAFETY" or model_response.finish_reason == "BLOCKED":
+            logger.warning("[Combined Agents] Generation blocked due to safety settings.")
+            return
+        if response_schema is not None:
+            cards = parse_structured_combined_response(model_response.parsed)
+        else:
+            cards = parse_combined_response(model_response.text)
+
+    except Exception as e:
+        logger.error(f"[Combined Agents] Error during LLM call or processing: {e}")
+        logger.exception("Traceback:")
+        if "429 Resource exhausted" in str(e):
+            logger.error("RATE LIMITING ERROR: API quota exceeded for combined agents. Consider increasing MIN_TRAFFIC_COP_INTERVAL.")
+        return
+
+    for agent_name in agent_names:
+        content = cards.get(agent_name)
+        if content is None:
+            continue
+        rejection = output_rejection(COMBINABLE_AGENTS[agent_name], content)
+        if rejection == OUTPUT_TOO_SHORT:
+            logger.warning(f"[{agent_name}] Combined generation is too short or empty: '{content}'")
+            relevance_gate.record(gate_decisions[agent_name], text, accepted=False)
+        elif rejection == OUTPUT_NO_CONTEXT:
+            logger.info(f"[{agent_name}] Explicit no context marker detected, not sending card.")
+            relevance_gate.record(gate_decisions[agent_name], text, accepted=False)
+        else:
+            logger.info(f"[{agent_name}] Card generated in combined request.")
+            relevance_gate.record(gate_decisions[agent_name], text, accepted=True)
+            insight_dedup.record_input(agent_name, text)
+            await format_agent_response(agent_name, content, broadcaster, "insight")
+
+    # Fall back to individual requests for anything the combined response did not cover
+    missing = [name for name in agent_names if name not in cards]
+    if missing:
+        logger.warning(f"[Combined Agents] No card returned for {missing}; running them individually.")
+        await asyncio.gather(
+            *(run_agent(COMBINABLE_AGENTS[name], text, model, broadcaster) for name in missing),
+            return_exceptions=True
+        )
@@ -1,18 +1,59 @@
 # backend/agents/dynamic_agent.py
 import logging
-from vertexai.generative_models import GenerativeModel, Part, FinishReason
-import vertexai.generative_models as generative_models
-from utils import format_agent_response, STANDARDIZED_PROMPT_FORMAT
+from utils import format_agent_response, STANDARDIZED_PROMPT_FORMAT, EarlyAbortCheck
 import sys
 import os
 
 # Add parent directory to path to import llm_providers
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from llm_providers import llm_client, ModelConfig
+from llm_providers import llm_client, CallPriority, current_call_priority
+from model_registry import TASK_SHORT_CARD
+from structured_output import with_card_schema, card_text
+from prompt_templates import PromptTemplate, compile_template
+from knowledge_store import knowledge_store, KNOWLEDGE_PROMPT_SECTION
+from relevance_gate import relevance_gate
+from insight_dedup import insight_dedup
+from meeting_memory import current_meeting_memory, MEETING_MEMORY_FOR_AGENTS, MEETING_MEMORY_PROMPT_SECTION
 
 # Get the logger instance configured in main.py
 logger = logging.getLogger("main")
 
+# --- API Call Configuration ---
+GENERATION_CONFIG = {
+    "temperature": 0.7,  # Balanced creativity and coherence
+    "max_output_tokens": 500, # Allow space for detailed response
+}
+
+
+# --- Prompt Templates ---
+# Placeholders a custom or versioned prompt may use
+TEMPLATE_SLOTS = ("name", "goal", "text")
+
+OUTPUT_FORMAT_TEMPLATE = PromptTemplate("Custom Agent output format", STANDARDIZED_PROMPT_FORMAT, ("specific_content",))
+
+DEFAULT_TEMPLATE = PromptTemplate("Custom Agent", """You are {name}, an AI agent that specializes in: {goal}
+
+TRANSCRIPT:
+"{text}"
+
+Your task is to analyze this transcript segment through the lens of your specialization.
+Be creative in finding connections to your area of expertise, but be genuine and specific.
+If there truly is no connection to your specialty, respond with "NO_RELEVANT_CONTEXT".
+
+{output_format}
+
+GUIDELINES:
+1. Write like a brilliant, excited entrepreneur sharing their vision - not like corporate marketing
+2. Keep your headline clear, exciting and sophisticated
+3. NO arbitrary metrics, percentages, or manufactured statistics
+4. NO buzzwords like "revolutionize," "transform," "disrupt," "optimize," etc.
+5. Be specific about ideas but use natural, passionate language
+6. Write from a place of genuine excitement about possibilities, not hype
+7. ORIGINALITY IS CRITICAL: Your insights must go beyond what's directly stated in the transcript
+8. If you find no connections to your specialty, just respond with "NO_RELEVANT_CONTEXT"
+""", TEMPLATE_SLOTS + ("output_format",))
+
+
 async def run_dynamic_agent(text: str, model, broadcaster: callable, agent_config: dict):
     """
     A flexible agent that can be configured at runtime with custom goals and parameters.
@@ -42,14 +83,17 @@ async def run_dynamic_agent(text: str, model, broadcaster: callable, agent_confi
         except Exception as broadcast_err:
             logger.error(f"[{agent_name}] Failed to broadcast insufficient context error: {broadcast_err}")
         return
-    
-    # Customize the standardized prompt for this specific agent
-    specific_content = f"insights related to: {agent_goal}"
-    
-    prompt = STANDARDIZED_PROMPT_FORMAT.format(
-        specific_content=specific_content,
-        analysis=f"Detailed analysis of how this relates to {agent_goal}. Provide specific, actionable insights."
-    )
+
+    # Skip the call when the agent's relevance model predicts a no-context answer
+    gated = current_call_priority.get() != CallPriority.EXPLICIT
+    gate_decision = relevance_gate.check(agent_name, text, gated=gated)
+    if gate_decision is not None and not gate_decision.run:
+        logger.info(f"[{agent_name}] Skipped: relevance gate predicts no context (p={gate_decision.probability:.2f})")
+        return
+    # Skip the call when the agent already answered a near-duplicate of this input
+    if insight_dedup.covered(agent_name, text, gated=gated):
+        logger.info(f"[{agent_name}] Skipped: already produced a card for a near-duplicate input")
+        return
     
     # Check if a specific prompt template version is requested
     template = None
@@ -58,119 +102,96 @@ async def run_dynamic_agent(text: str, model, broadcaster: callable, agent_confi
         import sys
         import os
         sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        from agent_versions import get_agent_versions
+        from agent_versions import get_agent_version
         
         version_name = agent_config.get("version_name")
-        # Get all versions of this agent
-        agent_versions = get_agent_versions(agent_name)
-        
-        # Find the specified version
-        for version in agent_versions:
-            if version.get("version_name") == version_name:
-                template = version.get("prompt_text")
-                logger.info(f"Using versioned prompt for {agent_name}: {version_name}")
-                break
+        # Look the version up in the in-memory version index
+        version = get_agent_version(agent_name, version_name)
+        if version is not None:
+            template = version.get("prompt_text")
+            logger.info(f"Using versioned prompt for {agent_name}: {version_name}")
     
-    # If no versioned prompt was found, use the provided prompt or default
+    # If no versioned prompt was found, use the provided prompt or default.
+    # Templates are compiled once and rendered in a single pass, so text that
+    # contains "{name}" or "{goal}" is inserted verbatim.
     if not template:
-        template = agent_config.get("prompt") or f"""You are {agent_name}, an AI agent that specializes in: {agent_goal}
-
-TRANSCRIPT:
-"{text}"
-
-Your task is to analyze this transcript segment through the lens of your specialization.
-Be creative in finding connections to your area of expertise, but be genuine and specific.
-If there truly is no connection to your specialty, respond with "NO_RELEVANT_CONTEXT".
-
-{prompt}
-
-GUIDELINES:
-1. Write like a brilliant, excited entrepreneur sharing their vision - not like corporate marketing
-2. Keep your headline clear, exciting and sophisticated
-3. NO arbitrary metrics, percentages, or manufactured statistics
-4. NO buzzwords like "revolutionize," "transform," "disrupt," "optimize," etc.
-5. Be specific about ideas but use natural, passionate language
-6. Write from a place of genuine excitement about possibilities, not hype
-7. ORIGINALITY IS CRITICAL: Your insights must go beyond what's directly stated in the transcript
-8. If you find no connections to your specialty, just respond with "NO_RELEVANT_CONTEXT"
-"""
+        template = agent_config.get("prompt")
+    if template:
+        full_prompt = compile_template(template, TEMPLATE_SLOTS, agent_name).render(
+            name=agent_name, goal=agent_goal, text=text
+        )
+    else:
+        # Customize the standardized prompt for this specific agent
+        output_format = OUTPUT_FORMAT_TEMPLATE.render(specific_content=f"insights related to: {agent_goal}")
+        full_prompt = DEFAULT_TEMPLATE.render(name=agent_name, goal=agent_goal, text=text, output_format=output_format)
 
-    # Replace placeholders in template
-    full_prompt = template.replace("{name}", agent_name)
-    full_prompt = full_prompt.replace("{goal}", agent_goal)
-    full_prompt = full_prompt.replace("{text}", text)
-    
-    # --- API Call Configuration ---
-    generation_config = {
-        "temperature": 0.7,  # Balanced creativity and coherence
-        "max_output_tokens": 500, # Allow space for detailed response
-    }
-    
-    safety_settings = {
-        generative_models.HarmCategory.HARM_CATEGORY_HARASSMENT: generative_models.HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
-        generative_models.HarmCategory.HARM_CATEGORY_HATE_SPEECH: generative_models.HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
-        generative_models.HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: generative_models.HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
-        generative_models.HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: generative_models.HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
-    }
+    # Excerpts from the agent's knowledge directory, if it has one
+    if agent_config.get("knowledge_dir"):
+        knowledge_text = await knowledge_store.retrieve(agent_config["knowledge_dir"], text)
+        if knowledge_text:
+            full_prompt += KNOWLEDGE_PROMPT_SECTION.format(context=knowledge_text)
+    # The meeting's summary and topics as background
+    memory = current_meeting_memory.get()
+    if MEETING_MEMORY_FOR_AGENTS and memory is not None:
+        background = memory.background()
+        if background:
+            full_prompt += MEETING_MEMORY_PROMPT_SECTION.format(background=background)
     
     # --- API Call and Response Handling ---
     try:
-        # Use the model parameter for backwards compatibility if it's a GenerativeModel
-        # Otherwise, use the unified llm_client for maximum compatibility
         logger.info(f"[{agent_name}] Sending request to LLM...")
         
-        if isinstance(model, GenerativeModel):
-            # Legacy path - use directly provided Gemini model
-            response = await model.generate_content_async(
-                full_prompt,
-                generation_config=generation_config,
-                safety_settings=safety_settings
-            )
-            
-            # Check safety blocks
-            if response.candidates and response.candidates[0].finish_reason == FinishReason.SAFETY:
-                logger.warning(f"[{agent_name}] Generation blocked due to safety settings.")
-                # Don't send error card
-                return
-                
-            generated_text = response.text if response.text else ""
-            
-        else:
-            # Use unified client - preferred path
-            model_config = ModelConfig(
-                provider=llm_client.active_provider,
-                model_name=llm_client.active_model_name,
-                temperature=generation_config.get("temperature", 0.7),
-                max_tokens=generation_config.get("max_output_tokens", 500)
-            )
-            
-            model_response = await llm_client.generate_content(full_prompt, model_config)
-            generated_text = model_response.text
-            
-            # Log the model provider that was used
-            logger.info(f"[{agent_name}] Using {model_response.model_provider} model: {model_response.model_name}")
-            
-            # Check if the response was blocked for safety
-            if model_response.finish_reason == "SAFETY" or model_response.finish_reason == "BLOCKED":
-                logger.warning(f"[{agent_name}] Generation blocked due to safety settings.")
-                # Don't send error card
-                return
-                
+        # Honour the custom agent's preferred model, if any
+        model_config = llm_client.model_config_for(
+            TASK_SHORT_CARD,
+            agent_name=agent_name,
+            model=agent_config.get("model"),
+            temperature=GENERATION_CONFIG["temperature"],
+            max_tokens=GENERATION_CONFIG["max_output_tokens"]
+        )
+
+        full_prompt, response_schema = with_card_schema(full_prompt)
+        # Stop paying for the rest of a no-context or apology response as soon as it starts
+        early_abort = EarlyAbortCheck()
+        model_response = await llm_client.generate_content(
+            full_prompt, model_config, agent_name=agent_name,
+            response_schema=response_schema, early_abort=early_abort
+        )
+        generated_text = card_text(model_response, response_schema, "NO_RELEVANT_CONTEXT")
+
+        # Log the model provider that was used
+        logger.info(f"[{agent_name}] Using {model_response.model_provider} model: {model_response.model_name}")
+
+        # Check if the response was blocked for safety
+        if model_response.finish_reason == "SAFETY" or model_response.finish_reason == "BLOCKED":
+            logger.warning(f"[{agent_name}] Generation blocked due to safety settings.")
+            # Don't send error card
+            return
+
+        if model_response.finish_reason == "ABORTED":
+            logger.info(f"[{agent_name}] Response aborted early ({early_abort.reason}), not sending card.")
+            relevance_gate.record(gate_decision, text, accepted=False)
+            return
+
         # Process the response text
         generated_text = generated_text.strip()
         if not generated_text:
             logger.warning(f"[{agent_name}] Generation produced empty text content after stripping.")
+            relevance_gate.record(gate_decision, text, accepted=False)
             # Don't send error card
             return
             
         # Check for explicit insufficient context marker
         elif generated_text.lower() == "no_relevant_context":
             logger.info(f"[{agent_name}] Explicit no context marker detected, not sending card.")
+            relevance_gate.record(gate_decision, text, accepted=False)
             # Don't send any response card when explicitly marked as no context
             return
             
         else:
             logger.info(f"[{agent_name}] Successfully generated insight.")
+            relevance_gate.record(gate_decision, text, accepted=True)
+            insight_dedup.record_input(agent_name, text)
             await format_agent_response(agent_name, generated_text, broadcaster, "insight")
             
     except Exception as e:
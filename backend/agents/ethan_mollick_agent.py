@@ -1,46 +1,94 @@
 # backend/agents/ethan_mollick_agent.py
 import logging
 import os
-import glob
-from vertexai.generative_models import GenerativeModel, Part, FinishReason
-import vertexai.generative_models as generative_models
-from utils import format_agent_response, STANDARDIZED_PROMPT_FORMAT
+from utils import format_agent_response
 import sys
 
 # Add parent directory to path to import llm_providers
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from llm_providers import llm_client, ModelConfig
+from llm_providers import llm_client
+from model_registry import TASK_LONG_CARD
+from knowledge_store import knowledge_store
 
 # Get the logger instance configured in main.py
 logger = logging.getLogger("main")
 
-# Path to Ethan Mollick's knowledge base
-KNOWLEDGE_BASE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "knowledge_base", "ethan_mollick")
+# Ethan Mollick's knowledge base, relative to knowledge_base/
+KNOWLEDGE_DIR = "ethan_mollick"
+
+# --- API Call Configuration ---
+GENERATION_CONFIG = {
+    "temperature": 0.75,  # Slightly higher to encourage more creative and perspective-expanding responses
+    "max_output_tokens": 1000,  # Allow for thorough responses
+    "top_p": 0.9,
+}
+
+# --- Triggers ---
+# The full phrase that invokes the agent
+TRIGGER_PHRASE = "Ethan Mollick, I need your help"
+# Common transcriptions of the name; these only count together with a help phrase
+NAME_VARIATIONS = (
+    "ethan mollick",
+    "ethan malik",
+    "ethan, malik",
+    "ethan molick",
+    "ethan mall",
+    "ethan mole",
+    "ethan malek",
+)
+HELP_PHRASES = ("i need your help", "can you help", "help me", "i need help")
+# Used when nothing follows the trigger phrase
+DEFAULT_QUERY = "Please provide general insights based on your expertise."
+
+# --- Prompt ---
+# The instructions are identical across calls, so they go first as a cacheable
+# prefix; the retrieved excerpts and the query follow. At ~600 tokens the prefix
+# is below every provider's cache minimum, so today it is sent inline; it is
+# cached only if the instructions grow past the minimum (see llm_providers.py).
+INSTRUCTIONS = """You are Ethan Mollick, professor at Wharton and expert on AI, innovation, entrepreneurship, and education. Your response should embody Ethan's style, tone, and expertise as reflected in his writing. You're thoughtful, evidence-based, nuanced, and practical.
+
+Excerpts of your writing selected for the user query are given at the end, just before the query. Use them to inform your response, but you can also draw on your broader knowledge.
+
+REQUIRED RESPONSE FORMAT - YOU MUST FOLLOW THIS EXACTLY:
+
+[Select an emoji that PRECISELY matches the specific topic being discussed] [Brief, compelling headline - 5-7 words]
+
+[One strong sentence that summarizes your main insight]
+
+[Your main advice goes here - be specific to the query, provide surprising insights, and offer concrete examples. Do NOT acknowledge the question was asked.]
+
+CHOOSE YOUR EMOJI BASED ON THE EXACT TOPIC BEING DISCUSSED:
+- If discussing meetings → 📊 or 👥 or 🗓️
+- If discussing AI implementation → 🤖 or 🧠 or 💻
+- If discussing marketing → 📱 or 🎯 or 📢
+- If discussing sales → 💰 or 🤝 or 📈 
+- If discussing productivity → ⚡ or ⏱️ or 📋
+- If discussing education → 📚 or 🎓 or ✏️
+- If discussing healthcare → 🏥 or 💊 or 🩺
+- If discussing finance → 💸 or 📊 or 💹
+
+SELECT THE EMOJI THAT MOST SPECIFICALLY RELATES TO THE EXACT TOPIC IN THE QUESTION - BE EXTREMELY LITERAL AND SPECIFIC
+
+CRITICAL FORMATTING INSTRUCTIONS:
+1. The headline MUST start with ONE relevant emoji followed by a space
+2. Put a blank line between headline, summary, and main content
+3. Make the headline extremely specific to the query
+4. Keep the summary to exactly one sentence
+5. In the main content, use **bold** for important concepts
+6. Do not use numbered lists or bullet points
+7. Do not include phrases like "based on your question" or "it sounds like"
+8. Do not add sections called "conclusion" or "summary" at the end
+
+CONTENT REQUIREMENTS:
+1. Offer a surprising insight that most people haven't considered
+2. Be extremely concrete with specific examples 
+3. Include research findings that support your advice
+4. Focus on practical, actionable advice
+5. Draw from your knowledge base but add your broader expertise
+6. Ensure your advice is highly specific to the query, not generic
+
+Your goal is to make the reader think "wow, I never considered that perspective" and walk away with a concrete action they can take immediately."""
 
-def load_knowledge_base():
-    """Load all markdown files from Ethan Mollick's knowledge base."""
-    knowledge = []
-    
-    # Find all markdown files in the knowledge base directory
-    md_files = glob.glob(os.path.join(KNOWLEDGE_BASE_PATH, "*.md"))
-    
-    for file_path in md_files:
-        if os.path.basename(file_path) == "README.md":
-            continue  # Skip the README file
-            
-        try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                content = file.read()
-                # Extract filename without extension for reference
-                filename = os.path.basename(file_path).replace('.md', '')
-                knowledge.append({
-                    "filename": filename,
-                    "content": content
-                })
-        except Exception as e:
-            logger.error(f"Error loading knowledge base file {file_path}: {e}")
-    
-    return knowledge
 
 async def run_ethan_mollick_agent(text: str, model, broadcaster: callable):
     """
@@ -70,16 +118,8 @@ async def run_ethan_mollick_agent(text: str, model, broadcaster: callable):
         return
 
     # Check if the text contains a variation of the trigger phrase
-    main_trigger_phrase = "Ethan Mollick, I need your help"
-    alternate_triggers = [
-        "ethan mollick",
-        "ethan malik",
-        "ethan, malik",
-        "ethan molick",
-        "ethan mall",
-        "ethan mole",
-        "ethan malek"
-    ]
+    main_trigger_phrase = TRIGGER_PHRASE
+    alternate_triggers = NAME_VARIATIONS
     
     # First check for the full expected phrase
     if main_trigger_phrase.lower() in text.lower():
@@ -105,7 +145,7 @@ async def run_ethan_mollick_agent(text: str, model, broadcaster: callable):
         query_start = text.lower().find(trigger_used.lower()) + len(trigger_used)
     else:
         # Look for "I need your help" or variations after the name
-        help_phrases = ["i need your help", "can you help", "help me", "i need help"]
+        help_phrases = HELP_PHRASES
         name_pos = text.lower().find(trigger_used.lower())
         
         # Look for help phrases after the name
@@ -125,120 +165,44 @@ async def run_ethan_mollick_agent(text: str, model, broadcaster: callable):
     query = text[query_start:].strip()
     
     if not query:
-        query = "Please provide general insights based on your expertise."
+        query = DEFAULT_QUERY
     
-    # Load the knowledge base
-    knowledge_base = load_knowledge_base()
+    # Only the excerpts most relevant to the query go into the prompt. A generic
+    # query says nothing about the topic, so the whole segment is used instead.
+    retrieval_query = text if query == DEFAULT_QUERY else query
+    knowledge_text = await knowledge_store.retrieve(KNOWLEDGE_DIR, retrieval_query)
     
-    # Create a formatted knowledge base for the prompt
-    knowledge_text = ""
-    for item in knowledge_base:
-        knowledge_text += f"--- {item['filename']} ---\n\n{item['content']}\n\n"
-    
-    # Create the prompt including Ethan's knowledge base
-    direct_prompt = f"""You are Ethan Mollick, professor at Wharton and expert on AI, innovation, entrepreneurship, and education. Your response should embody Ethan's style, tone, and expertise as reflected in his writing. You're thoughtful, evidence-based, nuanced, and practical.
-
-USER QUERY:
-"{query}"
-
-Below is a selected collection of your writing that may be relevant to the query. Use this to inform your response, but you can also draw on your broader knowledge.
-
-KNOWLEDGE BASE:
-{knowledge_text}
-
-REQUIRED RESPONSE FORMAT - YOU MUST FOLLOW THIS EXACTLY:
-
-[Select an emoji that PRECISELY matches the specific topic being discussed] [Brief, compelling headline - 5-7 words]
-
-[One strong sentence that summarizes your main insight]
-
-[Your main advice goes here - be specific to the query, provide surprising insights, and offer concrete examples. Do NOT acknowledge the question was asked.]
-
-CHOOSE YOUR EMOJI BASED ON THE EXACT TOPIC BEING DISCUSSED:
-- If discussing meetings → 📊 or 👥 or 🗓️
-- If discussing AI implementation → 🤖 or 🧠 or 💻
-- If discussing marketing → 📱 or 🎯 or 📢
-- If discussing sales → 💰 or 🤝 or 📈 
-- If discussing productivity → ⚡ or ⏱️ or 📋
-- If discussing education → 📚 or 🎓 or ✏️
-- If discussing healthcare → 🏥 or 💊 or 🩺
-- If discussing finance → 💸 or 📊 or 💹
-
-SELECT THE EMOJI THAT MOST SPECIFICALLY RELATES TO THE EXACT TOPIC IN THE QUESTION - BE EXTREMELY LITERAL AND SPECIFIC
-
-CRITICAL FORMATTING INSTRUCTIONS:
-1. The headline MUST start with ONE relevant emoji followed by a space
-2. Put a blank line between headline, summary, and main content
-3. Make the headline extremely specific to the query
-4. Keep the summary to exactly one sentence
-5. In the main content, use **bold** for important concepts
-6. Do not use numbered lists or bullet points
-7. Do not include phrases like "based on your question" or "it sounds like"
-8. Do not add sections called "conclusion" or "summary" at the end
-
-CONTENT REQUIREMENTS:
-1. Offer a surprising insight that most people haven't considered
-2. Be extremely concrete with specific examples 
-3. Include research findings that support your advice
-4. Focus on practical, actionable advice
-5. Draw from your knowledge base but add your broader expertise
-6. Ensure your advice is highly specific to the query, not generic
-
-Your goal is to make the reader think "wow, I never considered that perspective" and walk away with a concrete action they can take immediately."""
-
-    # --- API Call Configuration ---
-    generation_config = {
-        "temperature": 0.75,  # Slightly higher to encourage more creative and perspective-expanding responses
-        "max_output_tokens": 1000,  # Allow for thorough responses
-        "top_p": 0.9,
-    }
-    
-    safety_settings = {
-        generative_models.HarmCategory.HARM_CATEGORY_HARASSMENT: generative_models.HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
-        generative_models.HarmCategory.HARM_CATEGORY_HATE_SPEECH: generative_models.HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
-        generative_models.HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: generative_models.HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
-        generative_models.HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: generative_models.HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
-    }
+    # Dynamic suffix after the INSTRUCTIONS prefix: the retrieved excerpts and the query
+    query_prompt = f'\n\nKNOWLEDGE BASE EXCERPTS:\n{knowledge_text or "(none matched this query)"}\n\nUSER QUERY:\n"{query}"'
     
     # --- API Call and Response Handling ---
     try:
         logger.info(f"[{agent_name}] Sending request to LLM...")
         
-        if isinstance(model, GenerativeModel):
-            # Use directly provided Gemini model
-            response = await model.generate_content_async(
-                direct_prompt,
-                generation_config=generation_config,
-                safety_settings=safety_settings
-            )
-            
-            # Check safety blocks
-            if response.candidates and response.candidates[0].finish_reason == FinishReason.SAFETY:
-                logger.warning(f"[{agent_name}] Generation blocked due to safety settings.")
-                return
-                
-            generated_text = response.text if response.text else ""
-            
-        else:
-            # Use the unified client
-            model_config = ModelConfig(
-                provider=llm_client.active_provider,
-                model_name=llm_client.active_model_name,
-                temperature=generation_config.get("temperature", 0.75),
-                max_tokens=generation_config.get("max_output_tokens", 1000)
-            )
-            
-            model_response = await llm_client.generate_content(direct_prompt, model_config)
-            generated_text = model_response.text
-            
-            # Log the model provider that was used
-            logger.info(f"[{agent_name}] Using {model_response.model_provider} model: {model_response.model_name}")
-            
-            # Check if the response was blocked for safety
-            if model_response.finish_reason == "SAFETY" or model_response.finish_reason == "BLOCKED":
-                logger.warning(f"[{agent_name}] Generation blocked due to safety settings.")
-                return
-                
+        model_config = llm_client.model_config_for(
+            TASK_LONG_CARD,
+            agent_name=agent_name,
+            temperature=GENERATION_CONFIG["temperature"],
+            max_tokens=GENERATION_CONFIG["max_output_tokens"],
+            top_p=GENERATION_CONFIG["top_p"]
+        )
+
+        model_response = await llm_client.generate_content(
+            query_prompt,
+            model_config,
+            agent_name=agent_name,
+            cacheable_prefix=INSTRUCTIONS
+        )
+        generated_text = model_response.text
+
+        # Log the model provider that was used
+        logger.info(f"[{agent_name}] Using {model_response.model_provider} model: {model_response.model_name}")
+
+        # Check if the response was blocked for safety
+        if model_response.finish_reason == "SAFETY" or model_response.finish_reason == "BLOCKED":
+            logger.warning(f"[{agent_name}] Generation blocked due to safety settings.")
+            return
+
         # Process the response text
         generated_text = generated_text.strip()
         if not generated_text:
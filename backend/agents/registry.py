@@ -0,0 +1,375 @@
+# backend/agents/registry.py
+"""
+Declarative registry of the built-in agents.
+
+Each agent is described once, by an AgentSpec: its prompt builder, model
+task and generation limits, the input it reads (and, for meeting context,
+its token budget), its explicit triggers and
+how it can be routed, and the knowledge directory, if any, whose excerpts
+are added to its prompt. Routing tables, the trigger dispatcher, combined
+requests and prompt extraction/editing are all derived from AGENT_SPECS,
+which is built once at import. Card agents run through the single generic
+executor run_agent; agents with behaviour of their own (Ethan Mollick's
+knowledge base) supply a runner instead of a prompt builder.
+"""
+import os
+import logging
+from types import MappingProxyType
+from typing import Callable, Mapping, Optional
+
+from utils import format_agent_response, EarlyAbortCheck
+from llm_providers import llm_client, CallPriority, current_call_priority
+from model_registry import TASK_SHORT_CARD, TASK_LONG_CARD
+from structured_output import with_card_schema, card_text
+from prompt_templates import PromptTemplate
+from prompt_registry import prompt_registry
+from knowledge_store import knowledge_store, KNOWLEDGE_PROMPT_SECTION
+from relevance_gate import relevance_gate
+from insight_dedup import insight_dedup
+from meeting_memory import current_meeting_memory, MEETING_MEMORY_FOR_AGENTS, MEETING_MEMORY_PROMPT_SECTION
+
+from agents import radical_expander, product_agent, debate_agent, skeptical_agent, one_small_thing_agent, disruptor_agent
+from agents import ethan_mollick_agent
+
+# Get the logger instance configured in main.py
+logger = logging.getLogger("main")
+
+# What an agent reads: the current transcript segment, or the meeting context (see MeetingMemory.context)
+INPUT_SEGMENT = "segment"
+INPUT_CONTEXT = "context"
+
+AGENTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class AgentSpec:
+    """
+    Immutable description of one agent.
+
+    Everything derivable per call is computed here once: the prompt builder
+    is compiled into a PromptTemplate with a single "text" slot, triggers and
+    required terms are lowercased and the keyword arguments for
+    model_config_for are built from the generation config.
+    """
+    __slots__ = (
+        "name", "module_file", "build_prompt", "template", "runner", "task", "generation", "model_params",
+        "input", "min_input_chars", "insufficient_context_message", "required_terms",
+        "no_context_marker", "min_output_chars", "triggers", "aliases",
+        "routable", "explicit", "combinable", "knowledge_dir", "context_tokens",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        module_file: str,
+        build_prompt: Optional[Callable[[str], str]] = None,
+        runner: Optional[Callable] = None,
+        task: str = TASK_SHORT_CARD,
+        generation: Optional[dict] = None,
+        input: str = INPUT_SEGMENT,
+        min_input_chars: int = 15,
+        insufficient_context_message: str = "",
+        required_terms: tuple = (),
+        no_context_marker: str = "NO_BUSINESS_CONTEXT",
+        min_output_chars: int = 1,
+        triggers: tuple = (),
+        aliases: tuple = (),
+        routable: bool = False,
+        explicit: bool = False,
+        combinable: bool = False,
+        knowledge_dir: Optional[str] = None,
+        context_tokens: Optional[int] = None,
+    ):
+        if (build_prompt is None) == (runner is None):
+            raise ValueError(f"Agent '{name}' needs exactly one of build_prompt or runner")
+        generation = dict(generation or {})
+        values = {
+            "name": name,
+            "module_file": module_file,
+            "build_prompt": build_prompt,
+            "template": PromptTemplate.from_function(name, build_prompt, ("text",)) if build_prompt else None,
+            "runner": runner,
+            "task": task,
+            "generation": MappingProxyType(generation),
+            "model_params": MappingProxyType({
+                "temperature": generation.get("temperature", 0.7),
+                "max_tokens": generation.get("max_output_tokens", 500),
+                "top_p": generation.get("top_p", 0.95),
+            }),
+            "input": input,
+            "min_input_chars": min_input_chars,
+            "insufficient_context_message": insufficient_context_message,
+            "required_terms": tuple(term.lower() for term in required_terms),
+            "no_context_marker": no_context_marker,
+            "min_output_chars": min_output_chars,
+            "triggers": tuple(trigger.lower() for trigger in triggers),
+            "aliases": tuple(aliases),
+            "routable": routable,
+            "explicit": explicit,
+            "combinable": combinable,
+            "knowledge_dir": knowledge_dir,
+            "context_tokens": context_tokens,
+        }
+        for key, value in values.items():
+            object.__setattr__(self, key, value)
+
+    def __setattr__(self, key, value):
+        raise AttributeError(f"AgentSpec '{self.name}' is immutable")
+
+    def __repr__(self):
+        return f"AgentSpec({self.name!r})"
+
+    def matches_trigger(self, lowered_text: str) -> bool:
+        """Whether one of the agent's explicit triggers appears in already-lowercased text."""
+        return any(trigger in lowered_text for trigger in self.triggers)
+
+
+# --- Built-in Agents ---
+_SPECS = (
+    # Provocative scenarios for a segment's first-principles goal via AI-driven organizational restructuring
+    AgentSpec(
+        "Radical Expander", "radical_expander.py",
+        build_prompt=radical_expander.build_radical_expander_prompt,
+        generation=radical_expander.GENERATION_CONFIG,
+        insufficient_context_message="Insufficient context to identify fundamental goals and generate transformative scenarios.",
+        # Skipped silently unless the segment mentions something business-related
+        required_terms=(
+            "business", "company", "organization", "team", "management", "process",
+            "project", "client", "customer", "market", "product", "service",
+            "strategy", "operation", "workflow", "efficiency", "performance",
+            "meeting", "communication", "hiring", "goal", "objective", "growth",
+        ),
+        min_output_chars=15,
+        routable=True, combinable=True,
+    ),
+    # Sci-fi level product concepts grounded in the segment's domain
+    AgentSpec(
+        "Product Agent", "product_agent.py",
+        build_prompt=product_agent.build_product_prompt,
+        generation=product_agent.GENERATION_CONFIG,
+        insufficient_context_message="Insufficient context to invent a meaningful product concept.",
+        min_output_chars=15,
+        aliases=("Wild Product Agent",),
+        routable=True, combinable=True,
+    ),
+    # On request, politely surfaces divergent viewpoints in the recent context
+    AgentSpec(
+        "Debate Agent", "debate_agent.py",
+        build_prompt=debate_agent.build_debate_prompt,
+        generation=debate_agent.GENERATION_CONFIG,
+        input=INPUT_CONTEXT,
+        # Divergent positions can be minutes apart, so it reads further back than the default budget
+        context_tokens=1200,
+        min_input_chars=25,
+        insufficient_context_message="Insufficient context to identify meaningful divergent perspectives or tensions.",
+        triggers=("debate agent", "analyze conflict"),
+        explicit=True,
+    ),
+    # Constructive critique: overlooked risks, assumptions and mitigations
+    AgentSpec(
+        "Skeptical Agent", "skeptical_agent.py",
+        build_prompt=skeptical_agent.build_skeptical_prompt,
+        generation=skeptical_agent.GENERATION_CONFIG,
+        insufficient_context_message="Insufficient context to identify meaningful concerns or challenges.",
+        triggers=("skeptical agent", "devil's advocate", "critique this", "what could go wrong"),
+        routable=True, combinable=True,
+    ),
+    # One concrete, immediately actionable first step with AI
+    AgentSpec(
+        "Next Step Agent", "one_small_thing_agent.py",
+        build_prompt=one_small_thing_agent.build_one_small_thing_prompt,
+        generation=one_small_thing_agent.GENERATION_CONFIG,
+        insufficient_context_message="Insufficient context to provide a meaningful recommendation.",
+        triggers=("one small thing", "first step", "where to start", "how to begin", "quick win"),
+        aliases=("One Small Thing",),
+        routable=True, combinable=True,
+    ),
+    # AI-first business models that would replace the industry under discussion
+    AgentSpec(
+        "Disruptor", "disruptor_agent.py",
+        build_prompt=disruptor_agent.build_disruptor_prompt,
+        generation=disruptor_agent.GENERATION_CONFIG,
+        insufficient_context_message="Insufficient context to identify industry and generate disruption scenarios.",
+        min_output_chars=15,
+        triggers=("disruptor", "disrupt", "disruption", "ai startup", "startup disruption", "industry disruptor"),
+        routable=True, combinable=True,
+    ),
+    # Long-form advice in Ethan Mollick's voice, backed by his knowledge base
+    AgentSpec(
+        "Ethan Mollick", "ethan_mollick_agent.py",
+        runner=ethan_mollick_agent.run_ethan_mollick_agent,
+        task=TASK_LONG_CARD,
+        generation=ethan_mollick_agent.GENERATION_CONFIG,
+        triggers=(ethan_mollick_agent.TRIGGER_PHRASE,),
+        explicit=True,
+        knowledge_dir=ethan_mollick_agent.KNOWLEDGE_DIR,
+    ),
+)
+
+AGENT_SPECS: Mapping[str, AgentSpec] = MappingProxyType({spec.name: spec for spec in _SPECS})
+
+# Other names the router and trigger dispatcher use for the same agents
+AGENT_ALIASES: Mapping[str, str] = MappingProxyType({alias: spec.name for spec in _SPECS for alias in spec.aliases})
+
+# Prompts in source form, for reading and runtime editing
+prompt_registry.load(_SPECS)
+
+
+def canonical_agent_name(name: str) -> str:
+    """Return the name an agent's cards are broadcast under."""
+    return AGENT_ALIASES.get(name, name)
+
+
+def get_agent_spec(name: str) -> Optional[AgentSpec]:
+    """Look up a built-in agent by its name or an alias; None for unknown (e.g. custom) agents."""
+    return AGENT_SPECS.get(AGENT_ALIASES.get(name, name))
+
+
+def agent_module_path(name: str) -> Optional[str]:
+    """Path of the module holding a built-in agent's prompt, or None for unknown agents."""
+    spec = get_agent_spec(name)
+    return os.path.join(AGENTS_DIR, spec.module_file) if spec else None
+
+
+# --- Input and Output Checks ---
+# Shared by run_agent and combined requests, so an agent filters the same way in both
+INPUT_TOO_SHORT = "too short"
+INPUT_NO_REQUIRED_TERMS = "no required terms"
+OUTPUT_TOO_SHORT = "too short"
+OUTPUT_NO_CONTEXT = "no context marker"
+
+
+def input_rejection(spec: AgentSpec, text: str) -> Optional[str]:
+    """Why the agent should not be called on this text (INPUT_*), or None to call it."""
+    if not text or len(text.strip()) < spec.min_input_chars:
+        return INPUT_TOO_SHORT
+    if spec.required_terms:
+        lowered = text.lower()
+        if not any(term in lowered for term in spec.required_terms):
+            return INPUT_NO_REQUIRED_TERMS
+    return None
+
+
+async def report_input_rejection(spec: AgentSpec, text: str, reason: str, broadcaster: callable):
+    """Log a rejected input; input that is too short also gets the agent's insufficient context card."""
+    agent_name = spec.name
+    if reason == INPUT_NO_REQUIRED_TERMS:
+        logger.info(f"[{agent_name}] Skipped: No business context detected in transcript")
+        # Don't send any message - silently skip
+        return
+    logger.warning(f"[{agent_name}] Skipped: Input text too short or insufficient context: '{(text or '')[:50]}...'")
+    try:
+        await format_agent_response(agent_name, spec.insufficient_context_message, broadcaster, "error")
+    except Exception as broadcast_err:
+        logger.error(f"[{agent_name}] Failed to broadcast insufficient context error: {broadcast_err}")
+
+
+def output_rejection(spec: AgentSpec, generated_text: str) -> Optional[str]:
+    """Why a generated card should not be broadcast (OUTPUT_*), or None to send it."""
+    if len(generated_text) < spec.min_output_chars:
+        return OUTPUT_TOO_SHORT
+    # Only check for explicit insufficient context marker
+    if generated_text.lower() == spec.no_context_marker.lower():
+        return OUTPUT_NO_CONTEXT
+    return None
+
+
+# --- Generic Executor ---
+async def run_agent(spec: AgentSpec, text: str, model, broadcaster: callable):
+    """
+    Runs a built-in agent on its input text and broadcasts its card.
+
+    Args:
+        spec: The agent to run
+        text: The transcript segment or recent context, according to spec.input
+        model: The unified LLM client
+        broadcaster: Function to broadcast responses
+    """
+    agent_name = spec.name
+    if spec.runner is not None:
+        await spec.runner(text=text, model=model, broadcaster=broadcaster)
+        return
+
+    logger.info(f">>> Running {agent_name} Agent...")
+
+    # --- Input Validation ---
+    if not model:
+        logger.error(f"[{agent_name}] Failed: model instance not provided.")
+        return
+    if not broadcaster:
+        logger.critical(f"[{agent_name}] Failed: Broadcaster function not provided. Cannot send insights.")
+        return
+    rejection = input_rejection(spec, text)
+    if rejection is not None:
+        await report_input_rejection(spec, text, rejection, broadcaster)
+        return
+
+    # Skip the call when the agent's relevance model predicts a no-context answer
+    gated = current_call_priority.get() != CallPriority.EXPLICIT
+    gate_decision = relevance_gate.check(agent_name, text, gated=gated)
+    if gate_decision is not None and not gate_decision.run:
+        logger.info(f"[{agent_name}] Skipped: relevance gate predicts no context (p={gate_decision.probability:.2f})")
+        return
+    # Skip the call when the agent already answered a near-duplicate of this input
+    if insight_dedup.covered(agent_name, text, gated=gated):
+        logger.info(f"[{agent_name}] Skipped: already produced a card for a near-duplicate input")
+        return
+
+    cacheable_prefix, prompt = prompt_registry.template_for(spec).render_cacheable(text=text)
+    if spec.knowledge_dir:
+        knowledge_text = await knowledge_store.retrieve(spec.knowledge_dir, text)
+        if knowledge_text:
+            prompt += KNOWLEDGE_PROMPT_SECTION.format(context=knowledge_text)
+    # Agents reading a single segment get the meeting's summary and topics as background
+    memory = current_meeting_memory.get()
+    if MEETING_MEMORY_FOR_AGENTS and memory is not None and spec.input == INPUT_SEGMENT:
+        background = memory.background()
+        if background:
+            prompt += MEETING_MEMORY_PROMPT_SECTION.format(background=background)
+
+    # --- API Call and Response Handling ---
+    try:
+        logger.info(f"[{agent_name}] Sending request to LLM...")
+        model_config = llm_client.model_config_for(spec.task, agent_name=agent_name, **spec.model_params)
+        prompt, response_schema = with_card_schema(prompt)
+        # Stop paying for the rest of a no-context or apology response as soon as it starts
+        early_abort = EarlyAbortCheck()
+        model_response = await llm_client.generate_content(
+            prompt, model_config, agent_name=agent_name, cacheable_prefix=cacheable_prefix,
+            response_schema=response_schema, early_abort=early_abort
+        )
+        logger.info(f"[{agent_name}] Using {model_response.model_provider} model: {model_response.model_name}")
+
+        if model_response.finish_reason == "SAFETY" or model_response.finish_reason == "BLOCKED":
+            logger.warning(f"[{agent_name}] Generation blocked due to safety settings.")
+            # Don't send error card
+            return
+
+        if model_response.finish_reason == "ABORTED":
+            logger.info(f"[{agent_name}] Response aborted early ({early_abort.reason}), not sending card.")
+            relevance_gate.record(gate_decision, text, accepted=False)
+            return
+
+        generated_text = card_text(model_response, response_schema, spec.no_context_marker).strip()
+        rejection = output_rejection(spec, generated_text)
+        if rejection == OUTPUT_TOO_SHORT:
+            logger.warning(f"[{agent_name}] Generated content is too short or empty: '{generated_text}'. Finish Reason: {model_response.finish_reason}")
+            relevance_gate.record(gate_decision, text, accepted=False)
+            # Don't send error card
+            return
+        elif rejection == OUTPUT_NO_CONTEXT:
+            logger.info(f"[{agent_name}] Explicit no context marker detected, not sending card.")
+            relevance_gate.record(gate_decision, text, accepted=False)
+            # Don't send any response card when explicitly marked as no context
+            return
+        else:
+            logger.info(f"[{agent_name}] Successfully generated insight.")
+            relevance_gate.record(gate_decision, text, accepted=True)
+            insight_dedup.record_input(agent_name, text)
+            await format_agent_response(agent_name, generated_text, broadcaster, "insight")
+
+    except Exception as e:
+        logger.error(f"[{agent_name}] Error during LLM call or processing: {e}")
+        logger.exception("Traceback:")
+        # Don't broadcast errors to frontend
+        if "429 Resource exhausted" in str(e):
+            logger.error(f"RATE LIMITING ERROR: API quota exceeded for agent '{agent_name}'. Consider increasing MIN_TRAFFIC_COP_INTERVAL.")
@@ -0,0 +1,95 @@
+"""
+Import-time benchmark for the backend.
+
+Imports a module (``main`` by default) in fresh interpreters with
+``python -X importtime`` and reports wall-clock import time plus the
+slowest modules, so startup regressions show up before they reach a
+Cloud Run cold start.
+
+Usage:
+    python benchmarks/import_time.py [--module main] [--runs 5] [--top 15] [--json]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_once(module: str) -> dict:
+    """Import the module in a fresh interpreter and return timing details."""
+    start_time = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True
+    )
+    wall_ms = (time.perf_counter() - start_time) * 1000
+
+    # importtime lines look like: "import time:   self [us] | cumulative | imported package"
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line.split(":", 1)[1].split("|")
+            # Nesting depth is encoded as indentation after the single separator space
+            modules[name[1:].rstrip()] = int(cumulative_us)
+        except ValueError:
+            continue
+    top_level = {name: us for name, us in modules.items() if not name.startswith(" ")}
+    return {
+        "ok": result.returncode == 0,
+        "error": result.stderr.strip().splitlines()[-1] if result.returncode else None,
+        "wall_ms": wall_ms,
+        "import_ms": sum(top_level.values()) / 1000,
+        "modules": modules,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure backend import time")
+    parser.add_argument("--module", default="main", help="Module to import (default: main)")
+    parser.add_argument("--runs", type=int, default=5, help="Number of fresh-interpreter runs")
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest modules to list")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    runs = [run_once(args.module) for _ in range(args.runs)]
+    failed = [run for run in runs if not run["ok"]]
+    if failed:
+        print(f"Importing '{args.module}' failed: {failed[0]['error']}", file=sys.stderr)
+        sys.exit(1)
+
+    # Slowest modules by cumulative time, from the median run
+    median_run = sorted(runs, key=lambda run: run["import_ms"])[len(runs) // 2]
+    slowest = sorted(median_run["modules"].items(), key=lambda item: item[1], reverse=True)[:args.top]
+
+    summary = {
+        "module": args.module,
+        "runs": args.runs,
+        "import_ms_median": round(statistics.median(run["import_ms"] for run in runs), 1),
+        "import_ms_min": round(min(run["import_ms"] for run in runs), 1),
+        "wall_ms_median": round(statistics.median(run["wall_ms"] for run in runs), 1),
+        "slowest_modules": [{"module": name.strip(), "cumulative_ms": round(us / 1000, 1)} for name, us in slowest],
+    }
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+
+    print(f"Import of '{args.module}' over {args.runs} runs:")
+    print(f"  import time: median {summary['import_ms_median']} ms, min {summary['import_ms_min']} ms")
+    print(f"  interpreter wall time: median {summary['wall_ms_median']} ms")
+    print("Slowest modules (cumulative, median run):")
+    for entry in summary["slowest_modules"]:
+        print(f"  {entry['cumulative_ms']:>9.1f} ms  {entry['module']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Event loop lag under persistence load.
+
+Runs the backend's persistence paths in-process for a few seconds: agent
+version changes (journal appends, compactions), usage log appends at
+session end, and custom agent saves. Meanwhile a LoopLagMonitor samples
+how late the event loop runs. --slow-disk adds a delay to every file
+write and fsync, in whichever thread it runs, to stand in for a slow or
+contended disk. --inline runs the same writes on the event loop instead of
+the I/O thread, for comparison with how they ran before.
+
+All files are written to a temporary directory.
+
+Usage:
+    python benchmarks/persistence_lag.py [--seconds 5] [--rate 50] [--slow-disk 20] [--inline] [--json]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import builtins
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import io_executor as io_module  # noqa: E402
+from io_executor import io_executor, JsonLinesWriter, LoopLagMonitor  # noqa: E402
+from agent_versions import AgentVersionStore  # noqa: E402
+from storage import JsonStore  # noqa: E402
+from usage_tracking import UsageTracker  # noqa: E402
+
+
+def slow_down_disk(delay_ms: float):
+    """Delay every file opened for writing, and every fsync, by delay_ms."""
+    real_open, real_fsync = builtins.open, os.fsync
+
+    def slow_open(file, mode="r", *args, **kwargs):
+        if any(flag in mode for flag in "wax+"):
+            time.sleep(delay_ms / 1000)
+        return real_open(file, mode, *args, **kwargs)
+
+    def slow_fsync(fd):
+        time.sleep(delay_ms / 1000)
+        real_fsync(fd)
+
+    builtins.open, os.fsync = slow_open, slow_fsync
+
+
+def run_inline():
+    """Run submitted writes on the event loop, as they ran before the I/O thread."""
+    async def run(func, *args):
+        return func(*args)
+
+    def submit(func, *args, done=None):
+        result = func(*args)
+        if done is not None:
+            done(result)
+
+    io_executor.run, io_executor.submit = run, submit
+
+
+async def generate_load(directory: str, seconds: float, rate: float) -> dict:
+    versions = AgentVersionStore(os.path.join(directory, "versions.json"), os.path.join(directory, "versions.journal.jsonl"))
+    usage = UsageTracker()
+    usage.usage_log = JsonLinesWriter(os.path.join(directory, "usage_log.jsonl"))
+    agents = JsonStore(os.path.join(directory, "custom_agents.json"))
+    monitor = LoopLagMonitor(interval=0.01)
+    monitor_task = asyncio.create_task(monitor.run())
+
+    operations = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        versions.create("Skeptical Agent", {"version_name": f"v{operations % 50}", "prompt_text": "x" * 2000,
+                                            "timestamp": int(time.time()), "description": ""})
+        usage.start_session(f"session-{operations}")
+        usage.end_session(f"session-{operations}")
+        if operations % 10 == 0:
+            await agents.save_agent({"name": f"Agent {operations % 20}", "prompt": "y" * 1000, "triggers": []})
+        operations += 1
+        await asyncio.sleep(1 / rate)
+
+    started = time.perf_counter()
+    await versions.close()
+    await io_executor.drain()
+    drain_seconds = time.perf_counter() - started
+    monitor_task.cancel()
+    return {"operations": operations, "drain_s": round(drain_seconds, 3), **monitor.stats()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure event loop lag while persisting under load")
+    parser.add_argument("--seconds", type=float, default=5.0, help="Seconds of load")
+    parser.add_argument("--rate", type=float, default=50.0, help="Load iterations per second")
+    parser.add_argument("--slow-disk", type=float, default=0.0, help="Milliseconds added to every file write and fsync")
+    parser.add_argument("--inline", action="store_true", help="Write on the event loop instead of the I/O thread")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    # Only report stalls in the summary, not one log line each
+    io_module.LOOP_LAG_WARN_MS = float("inf")
+    if args.slow_disk:
+        slow_down_disk(args.slow_disk)
+    if args.inline:
+        run_inline()
+
+    with tempfile.TemporaryDirectory() as directory:
+        summary = {"mode": "inline" if args.inline else "io-thread", "slow_disk_ms": args.slow_disk,
+                   **asyncio.run(generate_load(directory, args.seconds, args.rate))}
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+    print(f"{summary['mode']}, slow disk {args.slow_disk}ms: {summary['operations']} iterations, "
+          f"loop lag p50 {summary['p50_ms']}ms, p99 {summary['p99_ms']}ms, max {summary['max_ms']}ms, "
+          f"drained in {summary['drain_s']}s")
+
+
+if __name__ == "__main__":
+    main()
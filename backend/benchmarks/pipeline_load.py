@@ -0,0 +1,129 @@
+"""
+End-to-end load benchmark for the WebSocket -> routing -> agent -> broadcast path.
+
+Start the backend with the mock provider so no quota is used, e.g.:
+
+    MOCK_LLM=1 SPEECH_ENABLED=0 MIN_TRAFFIC_COP_INTERVAL=0 \\
+        uvicorn main:app --port 8080
+
+then run:
+
+    python benchmarks/pipeline_load.py --clients 4 --segments 25
+
+Each client sends "inject_transcript" messages. Insights are broadcast to
+every connection, so the first client listens and matches each insight to
+the oldest unanswered segment to estimate end-to-end latency. Segments the
+router sends to no agent never produce an insight; they time out and are
+counted separately. Usage totals are read from GET /usage at the end.
+"""
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+import urllib.request
+from collections import deque
+
+import websockets
+
+SAMPLE_SEGMENTS = [
+    "Our weekly planning meeting takes two hours and nobody reads the notes afterwards.",
+    "Customers keep asking for a cheaper plan without the analytics features.",
+    "We want to roll out the new pricing to every region by next quarter.",
+    "I'm not sure where we should start with AI in customer support.",
+    "A startup just launched an AI-first competitor in our market.",
+    "The hiring pipeline for engineers has slowed down since spring.",
+]
+
+
+async def run_client(index: int, args, pending: deque, sent: list):
+    """Send segments from one client at the configured interval."""
+    async with websockets.connect(args.url, max_size=None) as ws:
+        for n in range(args.segments):
+            text = f"{SAMPLE_SEGMENTS[(index + n) % len(SAMPLE_SEGMENTS)]} (client {index}, segment {n})"
+            pending.append(time.perf_counter())
+            sent.append(1)
+            await ws.send(json.dumps({"type": "inject_transcript", "text": text}))
+            await asyncio.sleep(args.interval)
+        # Stay connected while the last pipelines finish
+        await asyncio.sleep(args.timeout)
+
+
+async def listen(args, pending: deque, latencies: list, stop: asyncio.Event):
+    """Collect insight broadcasts and match them to the oldest pending segment."""
+    async with websockets.connect(args.url, max_size=None) as ws:
+        while not stop.is_set():
+            try:
+                raw = await asyncio.wait_for(ws.recv(), timeout=0.5)
+            except asyncio.TimeoutError:
+                # Expire segments that never produced an insight
+                now = time.perf_counter()
+                while pending and now - pending[0] > args.timeout:
+                    pending.popleft()
+                continue
+            message = json.loads(raw)
+            if message.get("type") == "insight" and pending:
+                latencies.append((time.perf_counter() - pending.popleft()) * 1000)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def main_async(args):
+    pending: deque = deque()
+    sent: list = []
+    latencies: list = []
+    stop = asyncio.Event()
+
+    listener = asyncio.create_task(listen(args, pending, latencies, stop))
+    await asyncio.sleep(0.5)  # Let the listener connect first
+    start_time = time.perf_counter()
+    await asyncio.gather(*(run_client(i, args, pending, sent) for i in range(args.clients)))
+    elapsed = time.perf_counter() - start_time
+    stop.set()
+    await listener
+
+    summary = {
+        "clients": args.clients,
+        "segments_sent": len(sent),
+        "insights_received": len(latencies),
+        "elapsed_s": round(elapsed, 2),
+        "insights_per_s": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+    }
+    if latencies:
+        summary.update({
+            "latency_ms_p50": round(statistics.median(latencies), 1),
+            "latency_ms_p95": round(percentile(latencies, 95), 1),
+            "latency_ms_max": round(max(latencies), 1),
+        })
+    try:
+        http_url = args.url.replace("ws://", "http://").replace("wss://", "https://").rsplit("/ws", 1)[0]
+        with urllib.request.urlopen(f"{http_url}/usage", timeout=5) as response:
+            summary["usage_totals"] = json.load(response).get("totals")
+    except Exception as e:
+        summary["usage_error"] = str(e)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the transcript pipeline over WebSocket")
+    parser.add_argument("--url", default="ws://localhost:8080/ws", help="Backend WebSocket URL")
+    parser.add_argument("--clients", type=int, default=1, help="Concurrent WebSocket clients")
+    parser.add_argument("--segments", type=int, default=20, help="Segments sent per client")
+    parser.add_argument("--interval", type=float, default=0.5, help="Seconds between segments per client")
+    parser.add_argument("--timeout", type=float, default=15.0, help="Seconds to wait for an insight")
+    args = parser.parse_args()
+
+    try:
+        summary = asyncio.run(main_async(args))
+    except OSError as e:
+        print(f"Could not connect to {args.url}: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Micro-benchmark for prompt rendering.
+
+For every built-in card agent, compares building the prompt with the
+agent's f-string builder against rendering its precompiled PromptTemplate,
+and reports prompt size: total bytes, static bytes (identical on every
+call) and the static prefix that could be cached provider-side. The custom
+agent path is measured too, against the three str.replace passes it used
+before templates were compiled.
+
+Usage:
+    python benchmarks/prompt_render.py [--iterations 20000] [--json]
+"""
+import os
+import sys
+import json
+import timeit
+import argparse
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from agents.registry import AGENT_SPECS  # noqa: E402
+from agents.dynamic_agent import DEFAULT_TEMPLATE, OUTPUT_FORMAT_TEMPLATE, TEMPLATE_SLOTS  # noqa: E402
+from prompt_templates import compile_template  # noqa: E402
+
+SAMPLE_SEGMENT = (
+    "Our weekly planning meeting takes two hours and nobody reads the notes afterwards. "
+    "We should figure out where to start with AI before the next quarter."
+)
+SAMPLE_NAME = "Pricing Coach"
+SAMPLE_GOAL = "pricing strategy and packaging"
+
+
+def time_us(func, iterations: int) -> float:
+    """Best-of-three mean time per call, in microseconds."""
+    return min(timeit.repeat(func, number=iterations, repeat=3)) / iterations * 1e6
+
+
+def measure_agents(iterations: int) -> list:
+    results = []
+    for name, spec in AGENT_SPECS.items():
+        if spec.template is None:
+            continue
+        template = spec.template
+        rendered = template.render(text=SAMPLE_SEGMENT)
+        assert rendered == spec.build_prompt(SAMPLE_SEGMENT), f"{name}: template differs from builder"
+        results.append({
+            "agent": name,
+            "builder_us": round(time_us(lambda: spec.build_prompt(SAMPLE_SEGMENT), iterations), 2),
+            "template_us": round(time_us(lambda: template.render(text=SAMPLE_SEGMENT), iterations), 2),
+            "bytes": len(rendered.encode("utf-8")),
+            "static_bytes": len(template.render(text="").encode("utf-8")),
+            "static_prefix_bytes": len(template.static_prefix.encode("utf-8")),
+        })
+    return results
+
+
+def measure_custom_agent(iterations: int) -> dict:
+    """The custom agent's default prompt, the old replace-based way and compiled."""
+    output_format = OUTPUT_FORMAT_TEMPLATE.render(specific_content=f"insights related to: {SAMPLE_GOAL}")
+    source = DEFAULT_TEMPLATE.render(name="{name}", goal="{goal}", text="{text}", output_format=output_format)
+
+    def replace_passes():
+        prompt = source.replace("{name}", SAMPLE_NAME)
+        prompt = prompt.replace("{goal}", SAMPLE_GOAL)
+        return prompt.replace("{text}", SAMPLE_SEGMENT)
+
+    def compiled():
+        return compile_template(source, TEMPLATE_SLOTS, SAMPLE_NAME).render(
+            name=SAMPLE_NAME, goal=SAMPLE_GOAL, text=SAMPLE_SEGMENT
+        )
+
+    assert replace_passes() == compiled()
+    return {
+        "agent": "Custom Agent (default prompt)",
+        "replace_us": round(time_us(replace_passes, iterations), 2),
+        "template_us": round(time_us(compiled, iterations), 2),
+        "bytes": len(compiled().encode("utf-8")),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure prompt render time and size per agent")
+    parser.add_argument("--iterations", type=int, default=20000, help="Renders per timing run")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    summary = {
+        "iterations": args.iterations,
+        "agents": measure_agents(args.iterations),
+        "custom_agent": measure_custom_agent(args.iterations),
+    }
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+
+    print(f"{'agent':<18} {'builder us':>10} {'template us':>11} {'bytes':>7} {'static':>7} {'prefix':>7}")
+    for entry in summary["agents"]:
+        print(f"{entry['agent']:<18} {entry['builder_us']:>10.2f} {entry['template_us']:>11.2f} "
+              f"{entry['bytes']:>7} {entry['static_bytes']:>7} {entry['static_prefix_bytes']:>7}")
+    custom = summary["custom_agent"]
+    print(f"{custom['agent']}: replace passes {custom['replace_us']:.2f} us, "
+          f"compiled template {custom['template_us']:.2f} us, {custom['bytes']} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Deadlines and cancellation for agent generations.
+
+Every transcript segment gets a deadline when it arrives; LLM calls made
+while processing it inherit the deadline through a context variable and
+are abandoned once it passes. Agent pipelines run as tasks owned by their
+WebSocket session, so they can be cancelled when the session closes or
+when a newer routing decision supersedes them.
+"""
+import os
+import time
+import asyncio
+import logging
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+# Get the logger instance configured in main.py
+logger = logging.getLogger("main")
+
+# Seconds from a segment's arrival until its generations are abandoned
+SEGMENT_DEADLINE_SECONDS = float(os.getenv("SEGMENT_DEADLINE_SECONDS", "60"))
+
+# How long session cleanup waits for cancelled pipelines to unwind
+CANCEL_GRACE_SECONDS = 2.0
+
+# Cancellation reasons, passed as the task cancel message and reported in usage stats
+CANCEL_DEADLINE = "deadline"
+CANCEL_SUPERSEDED = "superseded"
+CANCEL_SESSION_CLOSED = "session_closed"
+# Recorded when a streamed response is closed early (see utils.EarlyAbortCheck)
+CANCEL_EARLY_ABORT = "early_abort"
+
+# Absolute time.monotonic() deadline of the work the current task is doing
+current_deadline: ContextVar[Optional[float]] = ContextVar("current_deadline", default=None)
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """Raised when an LLM call cannot finish before its segment's deadline."""
+
+
+def deadline_for_segment(arrival_time: Optional[float] = None) -> float:
+    """Return the deadline for a segment that arrived at arrival_time (monotonic clock)."""
+    return (arrival_time if arrival_time is not None else time.monotonic()) + SEGMENT_DEADLINE_SECONDS
+
+
+def cancel_reason(error: asyncio.CancelledError) -> str:
+    """Return the reason a task was cancelled with, or "cancelled" if none was given."""
+    return str(error.args[0]) if error.args and error.args[0] else "cancelled"
+
+
+class SessionWork:
+    """
+    Agent pipelines in flight for one WebSocket session.
+
+    Automatically routed pipelines are supersedable: starting a new one
+    cancels the ones still running for older segments. Explicitly requested
+    pipelines are never superseded, only cancelled when the session closes.
+    """
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        # task -> whether a newer routing decision may cancel it
+        self._tasks: Dict[asyncio.Task, bool] = {}
+
+    def start(self, coro, supersedable: bool = True) -> asyncio.Task:
+        """Run a pipeline as a task owned by this session."""
+        if supersedable:
+            for task, can_supersede in list(self._tasks.items()):
+                if can_supersede and not task.done():
+                    logger.info(f"Session {self.session_id}: cancelling pipeline superseded by a newer segment")
+                    task.cancel(CANCEL_SUPERSEDED)
+        task = asyncio.create_task(coro)
+        self._tasks[task] = supersedable
+        task.add_done_callback(self._finished)
+        return task
+
+    def _finished(self, task: asyncio.Task):
+        self._tasks.pop(task, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Session {self.session_id}: agent pipeline failed: {task.exception()}")
+
+    @property
+    def in_flight(self) -> int:
+        return sum(1 for task in self._tasks if not task.done())
+
+    async def cancel_all(self, reason: str = CANCEL_SESSION_CLOSED):
+        """Cancel every pipeline and wait briefly for them to unwind."""
+        tasks = [task for task in self._tasks if not task.done()]
+        if not tasks:
+            return
+        logger.info(f"Session {self.session_id}: cancelling {len(tasks)} in-flight pipeline(s) ({reason})")
+        for task in tasks:
+            task.cancel(reason)
+        await asyncio.wait(tasks, timeout=CANCEL_GRACE_SECONDS)
@@ -0,0 +1,190 @@
+"""
+Near-duplicate card suppression within a session.
+
+Agents routed on adjacent segments often produce cards that say almost
+the same thing. Every card broadcast in a session is fingerprinted with a
+64-bit SimHash over its word unigrams and bigrams, and a card within
+INSIGHT_DEDUP_MAX_DISTANCE bits of an earlier one is not sent; it is
+counted against the card it repeats instead. The check is a scan of at
+most INSIGHT_DEDUP_HISTORY integers per card.
+
+With INSIGHT_DEDUP_BEFORE_GENERATION on, the input each card was generated
+from is fingerprinted too, and an automatically routed agent is not called
+again for a segment close to one it already answered, since its card would
+most likely be a repeat. Explicitly requested agents always run.
+"""
+import os
+import hashlib
+import logging
+from collections import Counter, deque
+from typing import Deque, Dict, Optional
+
+from knowledge_index import tokenize
+from usage_tracking import current_session_id
+
+# Get the logger instance configured in main.py
+logger = logging.getLogger("main")
+
+# --- Insight Deduplication Configuration ---
+INSIGHT_DEDUP_ENABLED = os.getenv("INSIGHT_DEDUP_ENABLED", "1") != "0"
+# Cards whose fingerprints differ in at most this many of 64 bits are near-duplicates
+# (light rewordings of a card land around 8-14 bits apart, unrelated cards 18 or more)
+INSIGHT_DEDUP_MAX_DISTANCE = int(os.getenv("INSIGHT_DEDUP_MAX_DISTANCE", "12"))
+# Fingerprints kept per session (cards, and inputs per agent)
+INSIGHT_DEDUP_HISTORY = int(os.getenv("INSIGHT_DEDUP_HISTORY", "200"))
+# Skip automatically routed calls whose input is a near-duplicate of one that already produced a card
+INSIGHT_DEDUP_BEFORE_GENERATION = os.getenv("INSIGHT_DEDUP_BEFORE_GENERATION", "0") != "0"
+
+FINGERPRINT_BITS = 64
+
+
+def shingle_hash(shingle: str) -> int:
+    return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def simhash(text: str) -> Optional[int]:
+    """64-bit SimHash of a text's unigrams and bigrams; None if it has no content words."""
+    tokens = tokenize(text)
+    if not tokens:
+        return None
+    shingles = Counter(tokens)
+    shingles.update(f"{first} {second}" for first, second in zip(tokens, tokens[1:]))
+    weights = [0] * FINGERPRINT_BITS
+    for shingle, count in shingles.items():
+        value = shingle_hash(shingle)
+        for bit in range(FINGERPRINT_BITS):
+            weights[bit] += count if value >> bit & 1 else -count
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+
+def hamming_distance(first: int, second: int) -> int:
+    return (first ^ second).bit_count()
+
+
+class CardFingerprint:
+    """A broadcast card's fingerprint, and how many near-duplicates of it were suppressed."""
+    __slots__ = ("agent_name", "fingerprint", "duplicates")
+
+    def __init__(self, agent_name: str, fingerprint: int):
+        self.agent_name = agent_name
+        self.fingerprint = fingerprint
+        self.duplicates = 0
+
+
+class SessionInsights:
+    """Fingerprints of one session's cards and of the inputs that produced them."""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.cards: Deque[CardFingerprint] = deque(maxlen=INSIGHT_DEDUP_HISTORY)
+        self.inputs: Dict[str, Deque[int]] = {}
+        self.counts = Counter()
+
+    def find(self, fingerprint: int) -> Optional[CardFingerprint]:
+        """The closest earlier card within INSIGHT_DEDUP_MAX_DISTANCE, if any."""
+        best, best_distance = None, INSIGHT_DEDUP_MAX_DISTANCE + 1
+        for card in self.cards:
+            distance = hamming_distance(card.fingerprint, fingerprint)
+            if distance < best_distance:
+                best, best_distance = card, distance
+        return best
+
+    def admit(self, agent_name: str, content: str) -> bool:
+        """Whether a card should be broadcast; near-duplicates are merged into the card they repeat."""
+        fingerprint = simhash(content)
+        if fingerprint is None:
+            return True
+        original = self.find(fingerprint)
+        if original is not None:
+            original.duplicates += 1
+            self.counts["suppressed"] += 1
+            logger.info(f"Session {self.session_id}: suppressed near-duplicate card from {agent_name} "
+                        f"(repeats a card from {original.agent_name})")
+            return False
+        self.cards.append(CardFingerprint(agent_name, fingerprint))
+        self.counts["broadcast"] += 1
+        return True
+
+    def record_input(self, agent_name: str, text: str):
+        """Remember an input that produced one of the agent's cards."""
+        fingerprint = simhash(text)
+        if fingerprint is not None:
+            self.inputs.setdefault(agent_name, deque(maxlen=INSIGHT_DEDUP_HISTORY)).append(fingerprint)
+
+    def covered(self, agent_name: str, text: str) -> bool:
+        """Whether the agent already produced a card for a near-duplicate of this input."""
+        fingerprint = simhash(text)
+        if fingerprint is None:
+            return False
+        if any(hamming_distance(seen, fingerprint) <= INSIGHT_DEDUP_MAX_DISTANCE
+               for seen in self.inputs.get(agent_name, ())):
+            self.counts["skipped"] += 1
+            return True
+        return False
+
+    def stats(self) -> dict:
+        return {
+            "cards_broadcast": self.counts["broadcast"],
+            "duplicates_suppressed": self.counts["suppressed"],
+            "generations_skipped": self.counts["skipped"],
+        }
+
+
+class InsightDeduplicator:
+    """Per-session fingerprint indexes; calls act on the session of the current task."""
+
+    def __init__(self):
+        self.sessions: Dict[str, SessionInsights] = {}
+        self.totals = Counter()
+
+    def start_session(self, session_id: str):
+        if INSIGHT_DEDUP_ENABLED:
+            self.sessions[session_id] = SessionInsights(session_id)
+
+    def end_session(self, session_id: str) -> Optional[dict]:
+        session = self.sessions.pop(session_id, None)
+        if session is None:
+            return None
+        self.totals.update(session.counts)
+        stats = session.stats()
+        if stats["duplicates_suppressed"] or stats["generations_skipped"]:
+            logger.info(f"Session {session_id} insights: {stats['cards_broadcast']} cards broadcast, "
+                        f"{stats['duplicates_suppressed']} near-duplicates suppressed, "
+                        f"{stats['generations_skipped']} generations skipped")
+        return stats
+
+    def _current(self) -> Optional[SessionInsights]:
+        return self.sessions.get(current_session_id.get())
+
+    def admit(self, agent_name: str, content: str) -> bool:
+        """Whether a card from the current session should be broadcast."""
+        session = self._current()
+        return session is None or session.admit(agent_name, content)
+
+    def record_input(self, agent_name: str, text: str):
+        session = self._current()
+        if session is not None and INSIGHT_DEDUP_BEFORE_GENERATION:
+            session.record_input(agent_name, text)
+
+    def covered(self, agent_name: str, text: str, gated: bool = True) -> bool:
+        """Whether an agent call can be skipped because it would repeat one of the agent's cards."""
+        session = self._current()
+        return gated and INSIGHT_DEDUP_BEFORE_GENERATION and session is not None and session.covered(agent_name, text)
+
+    def snapshot(self) -> dict:
+        totals = self.totals.copy()
+        for session in self.sessions.values():
+            totals.update(session.counts)
+        return {
+            "enabled": INSIGHT_DEDUP_ENABLED,
+            "max_distance": INSIGHT_DEDUP_MAX_DISTANCE,
+            "before_generation": INSIGHT_DEDUP_BEFORE_GENERATION,
+            "active_sessions": len(self.sessions),
+            "cards_broadcast": totals["broadcast"],
+            "duplicates_suppressed": totals["suppressed"],
+            "generations_skipped": totals["skipped"],
+        }
+
+
+# Create singleton instance
+insight_dedup = InsightDeduplicator()
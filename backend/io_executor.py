@@ -0,0 +1,179 @@
+"""
+Blocking file I/O off the event loop, and a monitor of the loop's lag.
+
+Every persistence write (custom agents, agent versions, usage and
+relevance logs, the SQLite store) runs on one dedicated I/O thread rather
+than on the event loop or the default executor shared with provider
+calls. A single thread runs writes in the order they were submitted, so
+appends to one file never interleave and a snapshot is never overtaken
+by an older one. On a slow disk the writes queue up on that thread while
+every session keeps being served.
+
+JsonLinesWriter coalesces appends: records queued while a write is
+waiting for the thread go out together, in one open and one write.
+
+LoopLagMonitor sleeps LOOP_LAG_INTERVAL seconds at a time and records how
+late the loop wakes it. Anything that blocks the loop, a stray synchronous
+write included, shows up as lag; GET /loop reports it with the I/O
+thread's backlog.
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+import functools
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+# Get the logger instance configured in main.py
+logger = logging.getLogger("main")
+
+# --- Loop Lag Monitor Configuration ---
+# Seconds between lag samples
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.5"))
+# Lag above this many milliseconds is logged as a stall
+LOOP_LAG_WARN_MS = float(os.getenv("LOOP_LAG_WARN_MS", "100"))
+# Recent samples kept for percentiles (ten minutes at the default interval)
+LOOP_LAG_SAMPLES = 1200
+
+
+class IOExecutor:
+    """The dedicated I/O thread, and the writes submitted to it that are still running."""
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="file-io")
+        self._tasks = set()
+        self.counts = Counter()
+
+    async def run(self, func: Callable, *args) -> Any:
+        """Run func(*args) on the I/O thread and wait for its result."""
+        self.counts["submitted"] += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, functools.partial(func, *args))
+        finally:
+            self.counts["completed"] += 1
+
+    def submit(self, func: Callable, *args, done: Optional[Callable] = None):
+        """
+        Run func(*args) on the I/O thread without waiting, then done(result) on the event loop.
+
+        Without a running loop (scripts, startup) both run straight away.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            result = func(*args)
+            if done is not None:
+                done(result)
+            return
+        task = loop.create_task(self._run_then(func, args, done))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_then(self, func: Callable, args: tuple, done: Optional[Callable]):
+        try:
+            result = await self.run(func, *args)
+            if done is not None:
+                done(result)
+        except Exception as e:
+            logger.error(f"Error in background write {getattr(func, '__qualname__', func)}: {e}")
+
+    async def drain(self):
+        """Wait for every submitted write, including writes submitted by the ones waited for."""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "submitted": self.counts["submitted"],
+            "completed": self.counts["completed"],
+            "backlog": self.counts["submitted"] - self.counts["completed"],
+        }
+
+
+class JsonLinesWriter:
+    """Appends JSON records to a file from the I/O thread, coalescing records queued meanwhile."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lines = []
+        self._lock = threading.Lock()
+        self._scheduled = False
+
+    def append(self, record: dict):
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            self._lines.append(line)
+            if self._scheduled:
+                return
+            self._scheduled = True
+        io_executor.submit(self._write)
+
+    def extend(self, records):
+        for record in records:
+            self.append(record)
+
+    def _write(self):
+        with self._lock:
+            lines, self._lines = self._lines, []
+            self._scheduled = False
+        if not lines:
+            return
+        try:
+            with open(self.path, 'a') as f:
+                f.writelines(lines)
+        except Exception as e:
+            logger.error(f"Error appending {len(lines)} records to {self.path}: {e}")
+
+
+class LoopLagMonitor:
+    """How late the event loop runs a task that is due, sampled every LOOP_LAG_INTERVAL seconds."""
+
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL):
+        self.interval = interval
+        self.samples = deque(maxlen=LOOP_LAG_SAMPLES)
+        self.max_ms = 0.0
+        self.stalls = 0
+        self.started_at: Optional[float] = None
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        self.started_at = time.time()
+        while True:
+            due = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.add(max(0.0, (loop.time() - due) * 1000))
+
+    def add(self, lag_ms: float):
+        self.samples.append(lag_ms)
+        if lag_ms > self.max_ms:
+            self.max_ms = lag_ms
+        if lag_ms > LOOP_LAG_WARN_MS:
+            self.stalls += 1
+            logger.warning(f"Event loop stalled for {lag_ms:.0f}ms (I/O backlog: {io_executor.stats()['backlog']})")
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return round(ordered[min(len(ordered) - 1, int(pct / 100.0 * len(ordered)))], 2)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "interval_s": self.interval,
+            "samples": len(self.samples),
+            "p50_ms": self.percentile(50),
+            "p99_ms": self.percentile(99),
+            "max_ms": round(self.max_ms, 2),
+            "stalls": self.stalls,
+            "stall_threshold_ms": LOOP_LAG_WARN_MS,
+            "io": io_executor.stats(),
+        }
+
+
+# Create singleton instances
+io_executor = IOExecutor()
+loop_lag_monitor = LoopLagMonitor()
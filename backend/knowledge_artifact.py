@@ -0,0 +1,241 @@
+"""
+Prebuilt, memory-mapped knowledge indexes.
+
+Indexing a large knowledge base at container start slows cold starts, so
+the Docker build compiles each knowledge directory into an artifact in its
+.index/ subdirectory:
+
+    manifest.json         format, chunking/vector settings, documents and their chunk ranges
+    term_keys.npy         uint64 term hashes, sorted
+    term_offsets.npy      int64 start of each term's postings (plus a final end offset)
+    posting_chunks.npy    uint32 chunk ids, grouped by term
+    posting_freqs.npy     uint16 term frequency per posting
+    chunk_lengths.npy     uint32 tokens per chunk
+    chunk_offsets.npy     int64 start of each chunk record in chunk_data (plus a final end offset)
+    chunk_data.npy        uint8 JSON [source, title, text] records
+    vectors.npy           float16 hashed term vectors, one row per chunk (when vectors are enabled)
+
+At runtime every array is opened with np.load(mmap_mode="r"): loading
+costs a few file opens, pages are read only when a query touches them, and
+worker processes share them through the page cache. Terms are looked up by
+binary search over their hashes, so no vocabulary is rebuilt in memory.
+KnowledgeIndex searches an artifact as its base layer, and documents
+changed since the build replace their artifact chunks in memory.
+
+Usage:
+    python knowledge_artifact.py [knowledge_dir ...] [--root knowledge_base] [--no-vectors]
+"""
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import argparse
+from typing import Dict, List, Optional, Tuple
+
+from knowledge_index import (
+    KB_CHUNK_CHARS, KB_VECTOR_DIM, KB_VECTOR_WEIGHT, Chunk, analyze_chunks, chunk_markdown, document_paths,
+)
+
+try:
+    import numpy as np
+except ImportError:  # Artifacts need NumPy; without it knowledge bases are indexed at runtime
+    np = None
+
+# Get the logger instance configured in main.py
+logger = logging.getLogger("main")
+
+# --- Artifact Configuration ---
+# Subdirectory of a knowledge directory holding its artifact (hidden, so it is never indexed as a document)
+KB_ARTIFACT_DIR = ".index"
+# Bumped whenever the layout or the tokenizer changes; older artifacts are ignored
+KB_ARTIFACT_FORMAT = 1
+# Term frequencies are stored as uint16
+MAX_STORED_FREQUENCY = 65535
+
+
+def term_key(term: str) -> int:
+    """64-bit hash a term is stored and looked up under."""
+    return int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def artifact_path(directory: str) -> str:
+    return os.path.join(directory, KB_ARTIFACT_DIR)
+
+
+def expected_vector_dim() -> Optional[int]:
+    """Vector dimensions an artifact must have to serve this process; None when vectors are off."""
+    return KB_VECTOR_DIM if KB_VECTOR_WEIGHT > 0 else None
+
+
+def build_artifact(directory: str, vectors: bool = True) -> Dict[str, int]:
+    """
+    Compile a knowledge directory into its artifact, replacing any earlier one.
+
+    Returns the number of documents, chunks and terms written. The artifact
+    is written next to the old one and swapped in at the end, so a reader
+    never sees half an artifact.
+    """
+    if np is None:
+        raise RuntimeError("Building a knowledge artifact requires NumPy")
+    vectors = vectors and KB_VECTOR_WEIGHT > 0
+
+    documents = {}
+    records: List[bytes] = []
+    lengths: List[int] = []
+    vector_rows = []
+    postings: Dict[int, List[Tuple[int, int]]] = {}
+    for source, path in document_paths(directory):
+        stat = os.stat(path)
+        with open(path, "rb") as f:
+            data = f.read()
+        start = len(records)
+        for chunk, counts, vector in analyze_chunks(chunk_markdown(source, data.decode("utf-8", errors="replace"))):
+            chunk_id = len(records)
+            records.append(json.dumps([chunk.source, chunk.title, chunk.text], ensure_ascii=False).encode("utf-8"))
+            lengths.append(sum(counts.values()))
+            for term, frequency in counts.items():
+                postings.setdefault(term_key(term), []).append((chunk_id, min(frequency, MAX_STORED_FREQUENCY)))
+            if vectors:
+                vector_rows.append(vector)
+        documents[source] = {
+            "chunks": [start, len(records)],
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "digest": hashlib.sha1(data).hexdigest(),
+        }
+
+    keys = sorted(postings)
+    offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(postings[key]) for key in keys])
+    pairs = [pair for key in keys for pair in postings[key]]
+    record_offsets = np.zeros(len(records) + 1, dtype=np.int64)
+    record_offsets[1:] = np.cumsum([len(record) for record in records])
+    arrays = {
+        "term_keys": np.array(keys, dtype=np.uint64),
+        "term_offsets": offsets,
+        "posting_chunks": np.array([chunk_id for chunk_id, _ in pairs], dtype=np.uint32),
+        "posting_freqs": np.array([frequency for _, frequency in pairs], dtype=np.uint16),
+        "chunk_lengths": np.array(lengths, dtype=np.uint32),
+        "chunk_offsets": record_offsets,
+        "chunk_data": np.frombuffer(b"".join(records), dtype=np.uint8),
+    }
+    if vectors:
+        arrays["vectors"] = (np.stack(vector_rows) if vector_rows
+                             else np.zeros((0, KB_VECTOR_DIM), dtype=np.float32)).astype(np.float16)
+    manifest = {
+        "format": KB_ARTIFACT_FORMAT,
+        "created": time.time(),
+        "chunk_chars": KB_CHUNK_CHARS,
+        "vector_dim": KB_VECTOR_DIM if vectors else None,
+        "chunk_count": len(records),
+        "total_length": int(sum(lengths)),
+        "documents": documents,
+    }
+
+    target = artifact_path(directory)
+    staging = f"{target}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    for name, array in arrays.items():
+        np.save(os.path.join(staging, f"{name}.npy"), array)
+    with open(os.path.join(staging, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(staging, target)
+    return {"documents": len(documents), "chunks": len(records), "terms": len(keys)}
+
+
+class KnowledgeArtifact:
+    """A loaded, read-only artifact; its arrays are memory-mapped."""
+
+    def __init__(self, path: str, manifest: dict, arrays: dict):
+        self.path = path
+        self.documents: Dict[str, dict] = manifest["documents"]
+        self.chunk_count: int = manifest["chunk_count"]
+        self.total_length: int = manifest["total_length"]
+        self.term_keys = arrays["term_keys"]
+        self.term_offsets = arrays["term_offsets"]
+        self.posting_chunks = arrays["posting_chunks"]
+        self.posting_freqs = arrays["posting_freqs"]
+        self.lengths = arrays["chunk_lengths"]
+        self.chunk_offsets = arrays["chunk_offsets"]
+        self.chunk_data = arrays["chunk_data"]
+        # Only used when this process blends in vector similarity
+        self.vectors = arrays.get("vectors") if expected_vector_dim() else None
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["KnowledgeArtifact"]:
+        """Open a directory's artifact; None if it has none or it was built with other settings."""
+        path = artifact_path(directory)
+        manifest_path = os.path.join(path, "manifest.json")
+        if np is None or not os.path.exists(manifest_path):
+            return None
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("format") != KB_ARTIFACT_FORMAT or manifest.get("chunk_chars") != KB_CHUNK_CHARS:
+                logger.warning(f"Ignoring knowledge artifact {path}: built with other chunking settings")
+                return None
+            vector_dim = expected_vector_dim()
+            if vector_dim is not None and manifest.get("vector_dim") != vector_dim:
+                logger.warning(f"Ignoring knowledge artifact {path}: built without {vector_dim}-dimension vectors")
+                return None
+            arrays = {}
+            for file_name in os.listdir(path):
+                if file_name.endswith(".npy"):
+                    arrays[file_name[:-4]] = np.load(os.path.join(path, file_name), mmap_mode="r")
+            return cls(path, manifest, arrays)
+        except Exception as e:
+            logger.error(f"Could not load knowledge artifact {path}: {e}")
+            return None
+
+    def postings(self, term: str) -> Optional[Tuple["np.ndarray", "np.ndarray"]]:
+        """(chunk ids, term frequencies) for a term, or None if no chunk contains it."""
+        key = term_key(term)
+        position = int(np.searchsorted(self.term_keys, np.uint64(key)))
+        if position >= len(self.term_keys) or int(self.term_keys[position]) != key:
+            return None
+        start, end = int(self.term_offsets[position]), int(self.term_offsets[position + 1])
+        return self.posting_chunks[start:end], self.posting_freqs[start:end]
+
+    def chunk(self, chunk_id: int) -> Chunk:
+        start, end = int(self.chunk_offsets[chunk_id]), int(self.chunk_offsets[chunk_id + 1])
+        source, title, text = json.loads(bytes(self.chunk_data[start:end]).decode("utf-8"))
+        return Chunk(source, title, text)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "path": self.path,
+            "documents": len(self.documents),
+            "chunks": self.chunk_count,
+            "terms": len(self.term_keys),
+            "bytes": sum(os.path.getsize(os.path.join(self.path, name)) for name in os.listdir(self.path)),
+        }
+
+
+def main():
+    from knowledge_store import KNOWLEDGE_BASE_ROOT
+
+    parser = argparse.ArgumentParser(description="Compile knowledge directories into memory-mapped indexes")
+    parser.add_argument("directories", nargs="*",
+                        help="Knowledge directories relative to --root (default: every directory under it)")
+    parser.add_argument("--root", default=KNOWLEDGE_BASE_ROOT, help="Knowledge base root directory")
+    parser.add_argument("--no-vectors", action="store_true", help="Leave hashed term vectors out of the artifacts")
+    args = parser.parse_args()
+
+    names = args.directories or sorted(
+        name for name in os.listdir(args.root)
+        if os.path.isdir(os.path.join(args.root, name)) and not name.startswith(".")
+    )
+    for name in names:
+        start_time = time.perf_counter()
+        directory = os.path.join(args.root, name)
+        counts = build_artifact(directory, vectors=not args.no_vectors)
+        print(f"{name}: {counts['documents']} documents, {counts['chunks']} chunks, {counts['terms']} terms "
+              f"-> {artifact_path(directory)} in {time.perf_counter() - start_time:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,390 @@
+"""
+In-process retrieval over an agent's markdown knowledge base.
+
+Documents are split into heading-aware chunks and indexed into a BM25
+inverted index, plus hashed term vectors for cosine similarity when NumPy
+is installed. A document can be added, replaced or removed on its own, so
+an edited file is reindexed without rebuilding the rest (see
+knowledge_store.py). context_for() returns the chunks most relevant to a
+query, formatted for a prompt and capped at a token budget, so an agent
+sends a few relevant excerpts instead of its whole corpus.
+"""
+import os
+import re
+import math
+import zlib
+import logging
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from usage_tracking import estimate_tokens
+
+try:
+    import numpy as np
+except ImportError:  # Hashed-vector similarity is optional; BM25 works without it
+    np = None
+
+# Get the logger instance configured in main.py
+logger = logging.getLogger("main")
+
+# --- Retrieval Configuration ---
+# Target chunk size; paragraphs are packed up to this many characters
+KB_CHUNK_CHARS = int(os.getenv("KB_CHUNK_CHARS", "1200"))
+# Chunks returned per query, and the prompt tokens they may use in total
+KB_TOP_K = int(os.getenv("KB_TOP_K", "6"))
+KB_CONTEXT_TOKENS = int(os.getenv("KB_CONTEXT_TOKENS", "1500"))
+# BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+# Hashed term vectors: dimensions, and the weight of cosine similarity in the final score
+KB_VECTOR_DIM = int(os.getenv("KB_VECTOR_DIM", "1024"))
+KB_VECTOR_WEIGHT = float(os.getenv("KB_VECTOR_WEIGHT", "0.3")) if np is not None else 0.0
+# Best BM25 matches per result slot taken from a prebuilt artifact before vector blending
+KB_ARTIFACT_CANDIDATES = int(os.getenv("KB_ARTIFACT_CANDIDATES", "20"))
+
+# Files in a knowledge directory that describe it rather than belong to it
+SKIPPED_FILES = {"README.md"}
+# Extensions of indexed documents; plain text is chunked like markdown without headings
+KB_EXTENSIONS = (".md", ".txt")
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+STOPWORDS = frozenset("""
+a about after all also an and any are as at be because been but by can could did do does for from
+had has have he her his how i if in into is it its just like may me more most my no not of on one
+or our out so some than that the their them then there these they this those to up us was we were
+what when which who will with would you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords."""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS and len(token) > 1]
+
+
+def term_bucket(term: str) -> int:
+    """Stable vector dimension for a term (crc32, so it matches across processes)."""
+    return zlib.crc32(term.encode("utf-8")) % KB_VECTOR_DIM
+
+
+class Chunk:
+    """A retrievable passage of one document."""
+    __slots__ = ("source", "title", "text")
+
+    def __init__(self, source: str, title: str, text: str):
+        self.source = source
+        self.title = title
+        self.text = text
+
+    def to_dict(self) -> Dict[str, str]:
+        return {"source": self.source, "title": self.title, "text": self.text}
+
+
+def document_paths(directory: str) -> List[Tuple[str, str]]:
+    """
+    (source, path) for every document under a directory, sorted by source.
+
+    The source is the path relative to the directory without its extension,
+    with "/" separators, so it is stable across runs and platforms.
+    """
+    documents = []
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        for file_name in files:
+            if file_name in SKIPPED_FILES or not file_name.endswith(KB_EXTENSIONS):
+                continue
+            path = os.path.join(root, file_name)
+            source = os.path.splitext(os.path.relpath(path, directory))[0].replace(os.sep, "/")
+            documents.append((source, path))
+    # Sorted so chunk order, and so prompts built from it, are stable across runs
+    documents.sort()
+    return documents
+
+
+def chunk_markdown(source: str, content: str, max_chars: int = KB_CHUNK_CHARS) -> List[Chunk]:
+    """
+    Split a markdown document into chunks.
+
+    Sections start at headings; within a section, paragraphs are packed
+    into chunks of up to max_chars. A paragraph longer than that becomes a
+    chunk of its own. Each chunk is titled with its document and heading.
+    """
+    chunks = []
+    doc_title = source
+    heading = ""
+    paragraphs: List[str] = []
+
+    def flush():
+        buffer = ""
+        for paragraph in paragraphs:
+            if buffer and len(buffer) + len(paragraph) + 2 > max_chars:
+                chunks.append(Chunk(source, f"{doc_title} / {heading}" if heading else doc_title, buffer))
+                buffer = ""
+            buffer = f"{buffer}\n\n{paragraph}" if buffer else paragraph
+        if buffer:
+            chunks.append(Chunk(source, f"{doc_title} / {heading}" if heading else doc_title, buffer))
+        paragraphs.clear()
+
+    for block in re.split(r"\n\s*\n", content):
+        block = block.strip()
+        if not block:
+            continue
+        if block.startswith("#"):
+            first_line, _, rest = block.partition("\n")
+            title = first_line.lstrip("#").strip()
+            flush()
+            if first_line.startswith("# ") and doc_title == source:
+                doc_title = title
+            else:
+                heading = title
+            if rest.strip():
+                paragraphs.append(rest.strip())
+            continue
+        paragraphs.append(block)
+    flush()
+    return chunks
+
+
+def term_vector(counts: Counter):
+    """Normalised hashed term vector of a chunk or query (requires NumPy)."""
+    vector = np.zeros(KB_VECTOR_DIM, dtype=np.float32)
+    for term, frequency in counts.items():
+        vector[term_bucket(term)] += 1.0 + math.log(frequency)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def analyze_chunks(chunks: Iterable[Chunk]) -> List[Tuple[Chunk, Counter, object]]:
+    """
+    Tokenize chunks for KnowledgeIndex.add_document: (chunk, term counts, vector or None).
+
+    This is the expensive part of indexing a document and touches no index
+    state, so it can run before, and outside, any lock around the index.
+    """
+    vectors = KB_VECTOR_WEIGHT > 0
+    analyzed = []
+    for chunk in chunks:
+        counts = Counter(tokenize(f"{chunk.title}\n{chunk.text}"))
+        analyzed.append((chunk, counts, term_vector(counts) if vectors else None))
+    return analyzed
+
+
+def format_context(results: Iterable[Tuple[Chunk, float]], token_budget: int = KB_CONTEXT_TOKENS) -> str:
+    """
+    Format search results for a prompt.
+
+    Chunks are added best first until the next one would exceed
+    token_budget; an empty string means nothing matched.
+    """
+    sections = []
+    used = 0
+    for chunk, _ in results:
+        section = f"--- {chunk.title} ---\n\n{chunk.text}"
+        tokens = estimate_tokens(section)
+        if sections and used + tokens > token_budget:
+            break
+        sections.append(section)
+        used += tokens
+    return "\n\n".join(sections)
+
+
+class KnowledgeIndex:
+    """
+    BM25 (plus optional hashed-vector cosine) index over knowledge chunks.
+
+    Chunks are grouped by source document. Postings are keyed by chunk id,
+    and document frequencies and the average chunk length are read at query
+    time, so adding, replacing or removing a document touches only that
+    document's chunks. The index itself is not thread-safe; KnowledgeBase
+    serialises access to it.
+
+    An index can sit on a prebuilt KnowledgeArtifact (knowledge_artifact.py).
+    Artifact chunks are searched in place, under negative ids, and adding or
+    removing a document masks its artifact chunks, so edits made after the
+    artifact was built take precedence over it.
+    """
+
+    def __init__(self, chunks: Iterable[Chunk] = (), artifact=None):
+        self.chunks: Dict[int, Chunk] = {}
+        # term -> {chunk id: term frequency}
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.lengths: Dict[int, int] = {}
+        self.total_length = 0
+        # chunk id -> its distinct terms, so removal needs no re-tokenizing
+        self.chunk_terms: Dict[int, Tuple[str, ...]] = {}
+        # source -> ids of its chunks, in document order
+        self.documents: Dict[str, List[int]] = {}
+        # chunk id -> hashed term vector; None when vectors are disabled
+        self.vectors: Optional[dict] = {} if KB_VECTOR_WEIGHT > 0 else None
+        self._next_id = 0
+        self.artifact = artifact
+        # Artifact documents replaced or removed since it was built, and the chunks they cover
+        self._masked_sources = set()
+        self._artifact_mask = None
+        self._masked_chunks = 0
+        self._masked_length = 0
+        by_source: Dict[str, List[Chunk]] = {}
+        for chunk in chunks:
+            by_source.setdefault(chunk.source, []).append(chunk)
+        for source, document_chunks in by_source.items():
+            self.add_document(source, analyze_chunks(document_chunks))
+
+    @classmethod
+    def from_directory(cls, directory: str, max_chars: int = KB_CHUNK_CHARS) -> "KnowledgeIndex":
+        """Index every document in a directory (README.md excluded) in one pass."""
+        index = cls()
+        for source, path in document_paths(directory):
+            try:
+                with open(path, "r", encoding="utf-8", errors="replace") as f:
+                    content = f.read()
+            except Exception as e:
+                logger.error(f"Error loading knowledge base file {path}: {e}")
+                continue
+            index.add_document(source, analyze_chunks(chunk_markdown(source, content, max_chars)))
+        logger.info(f"Indexed {len(index.chunks)} knowledge chunks from {directory}"
+                    f"{' with hashed vectors' if index.vectors is not None else ''}")
+        return index
+
+    def add_document(self, source: str, analyzed: List[Tuple[Chunk, Counter, object]]):
+        """Add a document from analyze_chunks output, replacing any earlier version of it."""
+        self.remove_document(source)
+        ids = []
+        for chunk, counts, vector in analyzed:
+            chunk_id = self._next_id
+            self._next_id += 1
+            self.chunks[chunk_id] = chunk
+            length = sum(counts.values())
+            self.lengths[chunk_id] = length
+            self.total_length += length
+            for term, frequency in counts.items():
+                self.postings.setdefault(term, {})[chunk_id] = frequency
+            self.chunk_terms[chunk_id] = tuple(counts)
+            if self.vectors is not None:
+                self.vectors[chunk_id] = vector if vector is not None else term_vector(counts)
+            ids.append(chunk_id)
+        if ids:
+            self.documents[source] = ids
+
+    def remove_document(self, source: str) -> bool:
+        """Remove a document's chunks; False if it was not indexed."""
+        masked = self._mask_artifact_document(source)
+        ids = self.documents.pop(source, None)
+        if ids is None:
+            return masked
+        for chunk_id in ids:
+            del self.chunks[chunk_id]
+            self.total_length -= self.lengths.pop(chunk_id)
+            if self.vectors is not None:
+                self.vectors.pop(chunk_id, None)
+            for term in self.chunk_terms.pop(chunk_id):
+                postings = self.postings[term]
+                del postings[chunk_id]
+                if not postings:
+                    del self.postings[term]
+        return True
+
+    def _mask_artifact_document(self, source: str) -> bool:
+        """Hide an artifact document's chunks from search; False if the artifact lacks it or it is hidden already."""
+        document = self.artifact.documents.get(source) if self.artifact is not None else None
+        if document is None or source in self._masked_sources:
+            return False
+        if self._artifact_mask is None:
+            self._artifact_mask = np.zeros(self.artifact.chunk_count, dtype=bool)
+        start, end = document["chunks"]
+        self._artifact_mask[start:end] = True
+        self._masked_chunks += end - start
+        self._masked_length += int(self.artifact.lengths[start:end].sum())
+        self._masked_sources.add(source)
+        return True
+
+    @property
+    def chunk_count(self) -> int:
+        """Searchable chunks, in memory and in the artifact."""
+        if self.artifact is None:
+            return len(self.chunks)
+        return len(self.chunks) + self.artifact.chunk_count - self._masked_chunks
+
+    def _artifact_postings(self, term: str):
+        postings = self.artifact.postings(term) if self.artifact is not None else None
+        if postings is None or self._artifact_mask is None:
+            return postings
+        ids, frequencies = postings
+        visible = ~self._artifact_mask[ids]
+        return ids[visible], frequencies[visible]
+
+    def _chunk(self, key: int) -> Chunk:
+        return self.chunks[key] if key >= 0 else self.artifact.chunk(-key - 1)
+
+    def _chunk_vector(self, key: int):
+        return self.vectors[key] if key >= 0 else self.artifact.vectors[-key - 1].astype(np.float32)
+
+    def search(self, query: str, k: int = KB_TOP_K) -> List[Tuple[Chunk, float]]:
+        """Return up to k (chunk, score) pairs, best first. Chunks sharing no term with the query are skipped."""
+        terms = Counter(tokenize(query))
+        count = self.chunk_count
+        if not terms or not count:
+            return []
+        total_length = self.total_length
+        if self.artifact is not None:
+            total_length += self.artifact.total_length - self._masked_length
+        average_length = total_length / count
+        # Keys are in-memory chunk ids, or -(artifact chunk id + 1)
+        scores: Dict[int, float] = {}
+        artifact_ids, artifact_scores = [], []
+        for term in terms:
+            postings = self.postings.get(term)
+            artifact_postings = self._artifact_postings(term)
+            document_frequency = len(postings) if postings else 0
+            if artifact_postings is not None:
+                document_frequency += len(artifact_postings[0])
+            if not document_frequency:
+                continue
+            idf = math.log(1 + (count - document_frequency + 0.5) / (document_frequency + 0.5))
+            for chunk_id, frequency in (postings or {}).items():
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[chunk_id] / average_length)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+            if artifact_postings is not None and len(artifact_postings[0]):
+                ids, frequencies = artifact_postings
+                frequencies = frequencies.astype(np.float64)
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.artifact.lengths[ids] / average_length)
+                artifact_ids.append(ids)
+                artifact_scores.append(idf * frequencies * (BM25_K1 + 1) / (frequencies + norm))
+        if artifact_ids:
+            # Sum per chunk across query terms, and keep the best BM25 candidates only
+            ids, inverse = np.unique(np.concatenate(artifact_ids), return_inverse=True)
+            totals = np.bincount(inverse, weights=np.concatenate(artifact_scores))
+            limit = k * KB_ARTIFACT_CANDIDATES
+            if len(ids) > limit:
+                best_positions = np.argpartition(-totals, limit)[:limit]
+                ids, totals = ids[best_positions], totals[best_positions]
+            for chunk_id, score in zip(ids.tolist(), totals.tolist()):
+                scores[-chunk_id - 1] = score
+        if not scores:
+            return []
+
+        if self.vectors is not None and (self.artifact is None or self.artifact.vectors is not None):
+            # Blend normalised BM25 with cosine similarity of hashed term vectors
+            best = max(scores.values())
+            similarity = np.stack([self._chunk_vector(key) for key in scores]) @ term_vector(terms)
+            scores = {
+                key: (1 - KB_VECTOR_WEIGHT) * score / best + KB_VECTOR_WEIGHT * float(cosine)
+                for (key, score), cosine in zip(scores.items(), similarity)
+            }
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(self._chunk(key), score) for key, score in ranked]
+
+    def context_for(self, query: str, k: int = KB_TOP_K, token_budget: int = KB_CONTEXT_TOKENS) -> str:
+        """The most relevant chunks for a query, formatted for a prompt (see format_context)."""
+        return format_context(self.search(query, k), token_budget)
+
+    def stats(self) -> Dict[str, object]:
+        documents = len(self.documents)
+        if self.artifact is not None:
+            documents += len(self.artifact.documents) - len(self._masked_sources)
+        return {
+            "documents": documents,
+            "chunks": self.chunk_count,
+            "terms": len(self.postings),
+            "vector_dim": KB_VECTOR_DIM if self.vectors is not None else None,
+            "artifact": self.artifact.stats() if self.artifact is not None else None,
+        }
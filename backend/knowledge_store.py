@@ -0,0 +1,235 @@
+"""
+Per-agent knowledge bases, indexed incrementally and reloaded while running.
+
+Any agent can attach a directory under knowledge_base/: built-in agents
+through AgentSpec.knowledge_dir, custom agents through "knowledge_dir" in
+their config. Each directory gets one KnowledgeBase whose index is updated
+a document at a time: a file is re-read only when its mtime or size
+changes, and re-chunked only when its content hash changes too. Indexing
+runs in a worker thread and each document is searchable as soon as it is
+indexed, so a large corpus delays neither startup nor the first call.
+watch() polls every registered directory and applies only what changed.
+
+A directory compiled at build time (knowledge_artifact.py) is searchable
+as soon as it is registered: its memory-mapped artifact is the base of the
+index, and refreshes only reindex documents that changed after the build.
+"""
+import os
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from typing import Dict, Optional
+
+from knowledge_index import (
+    KB_TOP_K, KB_CONTEXT_TOKENS, KnowledgeIndex, analyze_chunks, chunk_markdown, document_paths, format_context,
+)
+from knowledge_artifact import KnowledgeArtifact
+
+# Get the logger instance configured in main.py
+logger = logging.getLogger("main")
+
+# --- Knowledge Base Configuration ---
+# Directory that agents' knowledge_dir values are resolved against; they cannot point outside it
+KNOWLEDGE_BASE_ROOT = os.getenv(
+    "KNOWLEDGE_BASE_ROOT", os.path.join(os.path.dirname(os.path.abspath(__file__)), "knowledge_base")
+)
+# Seconds between scans for added, changed and deleted documents; 0 indexes once and stops watching
+KB_WATCH_INTERVAL = float(os.getenv("KB_WATCH_INTERVAL", "10"))
+
+# Appended to a card agent's prompt when its knowledge base has excerpts for the input
+KNOWLEDGE_PROMPT_SECTION = "\n\nRELEVANT KNOWLEDGE (excerpts from your knowledge base; use them where they apply):\n{context}"
+
+
+class DocumentState:
+    """What was last indexed for one file: its stat signature and content hash."""
+    __slots__ = ("mtime_ns", "size", "digest")
+
+    def __init__(self, mtime_ns: int, size: int, digest: str):
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.digest = digest
+
+
+class KnowledgeBase:
+    """
+    The incrementally maintained index of one knowledge directory.
+
+    refresh() and searches both run in worker threads, never on the event
+    loop, since a search waits for the index lock while a document's chunks
+    are swapped. Documents are read, chunked and tokenized outside the index
+    lock, which is only held to swap a document's chunks in or out and to
+    search.
+    """
+
+    def __init__(self, name: str, directory: str):
+        self.name = name
+        self.directory = directory
+        artifact = KnowledgeArtifact.load(directory)
+        self.index = KnowledgeIndex(artifact=artifact)
+        # source -> state of the file last indexed under it, starting from the artifact's build
+        self.files: Dict[str, DocumentState] = {}
+        if artifact is not None:
+            for source, document in artifact.documents.items():
+                self.files[source] = DocumentState(document["mtime_ns"], document["size"], document["digest"])
+            logger.info(f"Knowledge base '{name}': loaded prebuilt index of {artifact.chunk_count} chunks")
+        # True once the first full scan has finished
+        self.indexed = False
+        self.last_refresh: Optional[float] = None
+        self.last_refresh_seconds: Optional[float] = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def refresh(self) -> Dict[str, int]:
+        """
+        Bring the index up to date with the directory.
+
+        Returns counts of added, updated, removed and unchanged documents.
+        Only one refresh runs at a time; a concurrent call waits for it and
+        then finds little or nothing left to do.
+        """
+        with self._refresh_lock:
+            start_time = time.perf_counter()
+            counts = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+            seen = set()
+            for source, path in document_paths(self.directory):
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                seen.add(source)
+                state = self.files.get(source)
+                if state is not None and state.mtime_ns == stat.st_mtime_ns and state.size == stat.st_size:
+                    counts["unchanged"] += 1
+                    continue
+                try:
+                    with open(path, "rb") as f:
+                        data = f.read()
+                except OSError as e:
+                    logger.error(f"Error loading knowledge base file {path}: {e}")
+                    continue
+                digest = hashlib.sha1(data).hexdigest()
+                if state is not None and state.digest == digest:
+                    # Touched but not changed
+                    self.files[source] = DocumentState(stat.st_mtime_ns, stat.st_size, digest)
+                    counts["unchanged"] += 1
+                    continue
+                analyzed = analyze_chunks(chunk_markdown(source, data.decode("utf-8", errors="replace")))
+                with self._lock:
+                    self.index.add_document(source, analyzed)
+                self.files[source] = DocumentState(stat.st_mtime_ns, stat.st_size, digest)
+                counts["updated" if state is not None else "added"] += 1
+
+            for source in [source for source in self.files if source not in seen]:
+                with self._lock:
+                    self.index.remove_document(source)
+                del self.files[source]
+                counts["removed"] += 1
+
+            self.indexed = True
+            self.last_refresh = time.time()
+            self.last_refresh_seconds = round(time.perf_counter() - start_time, 3)
+
+        if counts["added"] or counts["updated"] or counts["removed"]:
+            logger.info(f"Knowledge base '{self.name}': {counts['added']} added, {counts['updated']} updated, "
+                        f"{counts['removed']} removed in {self.last_refresh_seconds}s "
+                        f"({self.index.chunk_count} chunks)")
+        return counts
+
+    def context_for(self, query: str, k: int = KB_TOP_K, token_budget: int = KB_CONTEXT_TOKENS) -> str:
+        """The most relevant chunks for a query, formatted for a prompt and capped at token_budget."""
+        with self._lock:
+            results = self.index.search(query, k)
+        return format_context(results, token_budget)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = self.index.stats()
+        return {
+            **stats,
+            "directory": self.directory,
+            "indexed": self.indexed,
+            "last_refresh": self.last_refresh,
+            "last_refresh_seconds": self.last_refresh_seconds,
+        }
+
+
+class KnowledgeStore:
+    """Registry of knowledge bases by directory, shared by every agent that attaches one."""
+
+    def __init__(self, root: str = KNOWLEDGE_BASE_ROOT):
+        self.root = os.path.realpath(root)
+        self.bases: Dict[str, KnowledgeBase] = {}
+        self._refreshing: Dict[str, asyncio.Task] = {}
+
+    def resolve(self, knowledge_dir: str) -> Optional[str]:
+        """Absolute path of a knowledge directory, or None if it is empty or escapes the root."""
+        if not knowledge_dir:
+            return None
+        directory = os.path.realpath(os.path.join(self.root, knowledge_dir))
+        if directory == self.root or os.path.commonpath([self.root, directory]) != self.root:
+            logger.warning(f"Ignoring knowledge directory '{knowledge_dir}': not inside {self.root}")
+            return None
+        return directory
+
+    def get(self, knowledge_dir: str) -> Optional[KnowledgeBase]:
+        """Return the knowledge base for a directory, registering it (unindexed) on first use."""
+        directory = self.resolve(knowledge_dir)
+        if directory is None:
+            return None
+        base = self.bases.get(directory)
+        if base is None:
+            base = self.bases[directory] = KnowledgeBase(os.path.relpath(directory, self.root), directory)
+        return base
+
+    def schedule_refresh(self, base: KnowledgeBase) -> asyncio.Task:
+        """Refresh a knowledge base in a worker thread, unless a refresh is already pending."""
+        task = self._refreshing.get(base.directory)
+        if task is None or task.done():
+            task = asyncio.create_task(self._refresh(base))
+            self._refreshing[base.directory] = task
+        return task
+
+    async def _refresh(self, base: KnowledgeBase):
+        try:
+            await asyncio.to_thread(base.refresh)
+        except Exception as e:
+            logger.error(f"Could not index knowledge base '{base.name}': {e}")
+
+    async def watch(self, interval: float = KB_WATCH_INTERVAL):
+        """Index every registered knowledge base, then rescan them every interval seconds."""
+        while True:
+            bases = list(self.bases.values())
+            if bases:
+                await asyncio.gather(*(self.schedule_refresh(base) for base in bases))
+            if interval <= 0:
+                return
+            await asyncio.sleep(interval)
+
+    async def retrieve(self, knowledge_dir: str, query: str, k: int = KB_TOP_K,
+                       token_budget: int = KB_CONTEXT_TOKENS) -> str:
+        """
+        Budgeted excerpts of an agent's knowledge base for a query.
+
+        Never waits for indexing: a base that has not been scanned yet is
+        scheduled for indexing and answers from the documents indexed so far.
+        The search, and any wait for the index lock, runs in a worker thread.
+        """
+        base = self.get(knowledge_dir)
+        if base is None:
+            return ""
+        if not base.indexed:
+            self.schedule_refresh(base)
+        return await asyncio.to_thread(base.context_for, query, k, token_budget)
+
+    def snapshot(self) -> dict:
+        return {
+            "root": self.root,
+            "watch_interval": KB_WATCH_INTERVAL,
+            "bases": {base.name: base.stats() for base in self.bases.values()},
+        }
+
+
+# Create singleton instance
+knowledge_store = KnowledgeStore()
@@ -6,16 +6,33 @@ allowing seamless switching between Gemini and Claude models.
 """
 
 import os
+import time
+import asyncio
+import threading
+import hashlib
+import datetime
 import logging
 import json
-from enum import Enum
+import heapq
+import itertools
+import contextlib
+from contextvars import ContextVar
+from enum import Enum, IntEnum
 from typing import Dict, List, Optional, Any, Union, Callable, Awaitable
 from dotenv import load_dotenv
 
-# Import provider SDKs
-import anthropic
-from vertexai.generative_models import GenerativeModel, Content, Part
-import vertexai.generative_models as gm
+# Provider SDKs (anthropic, openai, vertexai) are imported on first use in
+# UnifiedLLMClient._ensure_provider; together they add seconds to startup.
+
+from usage_tracking import usage_tracker, normalize_usage, estimate_tokens
+from structured_output import ResponseSchema
+from generation_control import (
+    current_deadline, deadline_for_segment, cancel_reason, DeadlineExceeded, CANCEL_DEADLINE, CANCEL_EARLY_ABORT
+)
+from model_registry import (
+    ModelSpec, ModelTier, TIER_FALLBACKS, models_for_provider, provider_for_model, select_model, tier_for
+)
+from provider_health import health_tracker
 
 # Load environment variables
 load_dotenv()
@@ -23,11 +40,100 @@ load_dotenv()
 # Configure logging
 logger = logging.getLogger("main")
 
+# --- Prompt Caching ---
+# Static prompt prefixes are cached provider-side when they are large enough
+PROMPT_CACHING_ENABLED = os.getenv("PROMPT_CACHING", "1") != "0"
+# Vertex AI context caching has a high minimum size; smaller prefixes are sent inline
+GEMINI_CACHE_MIN_TOKENS = int(os.getenv("GEMINI_CACHE_MIN_TOKENS", "32768"))
+GEMINI_CACHE_TTL_SECONDS = int(os.getenv("GEMINI_CACHE_TTL_SECONDS", "3600"))
+# Anthropic ignores cache breakpoints on prefixes below the model's minimum
+# (2048 tokens for Haiku models, 1024 for the others); those are sent inline too
+CLAUDE_CACHE_MIN_TOKENS = int(os.getenv("CLAUDE_CACHE_MIN_TOKENS", "1024"))
+CLAUDE_HAIKU_CACHE_MIN_TOKENS = 2048
+
+# --- Concurrency Limits ---
+# Maximum simultaneous calls per provider; bursts beyond it queue instead of
+# triggering 429 cascades. Override per provider with e.g.
+# LLM_PROVIDER_CONCURRENCY='{"claude": 4, "gemini": 16}'
+DEFAULT_PROVIDER_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+try:
+    PROVIDER_CONCURRENCY: Dict[str, int] = {
+        provider: int(limit) for provider, limit in json.loads(os.getenv("LLM_PROVIDER_CONCURRENCY", "{}")).items()
+    }
+except Exception as e:
+    logger.error(f"Invalid LLM_PROVIDER_CONCURRENCY override: {e}")
+    PROVIDER_CONCURRENCY = {}
+
+class CallPriority(IntEnum):
+    """Queue priority of an LLM call; lower values are admitted first."""
+    EXPLICIT = 0  # The user asked for this agent (Ethan Mollick, Debate Agent, use_agent_version)
+    ROUTING = 1   # Traffic Cop routing decision
+    AUTO = 2      # Automatically routed agent cards
+
+# Priority of calls made by the current task. Set around explicit invocations so
+# agents do not need to thread it through; generate_content can also override it.
+current_call_priority: ContextVar[CallPriority] = ContextVar("current_call_priority", default=CallPriority.AUTO)
+
+class PriorityLimiter:
+    """
+    Concurrency limiter that admits waiters by priority, then in arrival order.
+    
+    Works like an asyncio.Semaphore whose queue is a heap keyed on
+    (priority, sequence), so a burst of automatic calls cannot delay an
+    explicit request by more than the calls already in flight.
+    """
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self.active = 0
+        self._waiters: list = []
+        self._sequence = itertools.count()
+    
+    @property
+    def queued(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+    
+    async def _acquire(self, priority: CallPriority):
+        if self.active < self.limit and not self.queued:
+            self.active += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (int(priority), next(self._sequence), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # If the slot was handed over just before cancellation, pass it on
+            if future.done() and not future.cancelled():
+                self._release()
+            raise
+    
+    def _release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                # Hand the slot straight to the next waiter; active stays the same
+                future.set_result(None)
+                return
+        self.active -= 1
+    
+    @contextlib.asynccontextmanager
+    async def slot(self, priority: CallPriority):
+        """Hold one slot for the duration of the block; yields the queue wait in ms."""
+        start_time = time.perf_counter()
+        await self._acquire(priority)
+        try:
+            yield (time.perf_counter() - start_time) * 1000
+        finally:
+            self._release()
+    
+    def to_dict(self) -> Dict[str, int]:
+        return {"limit": self.limit, "active": self.active, "queued": self.queued}
+
 class ModelProvider(str, Enum):
     """Supported model providers."""
     GEMINI = "gemini"
     CLAUDE = "claude"
     OPENAI = "openai"
+    MOCK = "mock"  # Local deterministic mock for load tests and offline runs (see mock_llm.py)
 
 class ModelConfig:
     """Configuration for LLM models."""
@@ -55,82 +161,172 @@ class ModelResponse:
         finish_reason: str,
         model_provider: ModelProvider,
         model_name: str,
-        usage: Dict[str, int] = None
+        usage: Dict[str, int] = None,
+        latency_ms: Optional[float] = None,
+        ttft_ms: Optional[float] = None,
+        queue_ms: Optional[float] = None,
+        parsed: Optional[Dict[str, Any]] = None
     ):
         self.text = text
         self.finish_reason = finish_reason
         self.model_provider = model_provider
         self.model_name = model_name
-        self.usage = usage or {}
+        # Always carries input_tokens, output_tokens, total_tokens and cached_input_tokens
+        self.usage = usage or normalize_usage()
+        # Wall-clock latency of the whole call and time until the first token arrived
+        self.latency_ms = latency_ms
+        self.ttft_ms = ttft_ms
+        # Time spent waiting for a concurrency slot; not included in latency_ms
+        self.queue_ms = queue_ms
+        # Decoded JSON object when a response_schema was requested; None if malformed
+        self.parsed = parsed
 
 class UnifiedLLMClient:
     """
     Unified client for interacting with different LLM providers.
     """
     def __init__(self):
-        # Initialize provider clients
+        # Provider clients are created on first use (or by warm_up), so building
+        # the client only reads configuration and imports no provider SDK
         self.gemini_model = None
         self.claude_client = None
+        self.openai_client = None
+        self.mock_client = None
         self.active_provider = None
         self.active_model_name = None
+        # Set once warm_up has initialized every configured provider
+        self.ready = False
+        self.warmup_seconds = None
+        self._gemini_model_name = os.getenv("GEMINI_MODEL_NAME", "gemini-1.5-pro-002")
+        # Gemini needs one GenerativeModel per model name; built on first use
+        self._gemini_models: Dict[str, Any] = {}
+        # Gemini CachedContent-backed models keyed by (model name, prefix hash)
+        self._gemini_cached_models: Dict[tuple, tuple] = {}
+        self._gemini_cache_locks: Dict[tuple, asyncio.Lock] = {}
+        self._gemini_cache_failures: set = set()
+        # One priority-aware concurrency limiter per provider
+        self._limiters: Dict[ModelProvider, PriorityLimiter] = {
+            provider: PriorityLimiter(PROVIDER_CONCURRENCY.get(provider.value, DEFAULT_PROVIDER_CONCURRENCY))
+            for provider in ModelProvider
+        }
+        # Serializes client creation between warm-up and on-demand initialization
+        self._init_lock = threading.Lock()
+        # Auto mode: pick the fastest healthy model per tier instead of the active one
+        self.auto_select = os.getenv("LLM_AUTO_SELECT", "0") == "1"
         
-        # Try to load Gemini model
-        try:
-            from google.cloud import aiplatform
-            gemini_model_name = os.getenv("GEMINI_MODEL_NAME", "gemini-1.5-pro-002")
-            project_id = os.getenv("PROJECT_ID", "meetinganalyzer-454912")
-            location = os.getenv("LOCATION", "us-east1")
-            
-            # Initialize Vertex AI
-            aiplatform.init(project=project_id, location=location)
-            self.gemini_model = GenerativeModel(gemini_model_name)
-            logger.info(f"Initialized Gemini model: {gemini_model_name}")
-            
-            # Set as default if no other provider is active
-            if not self.active_provider:
-                self.active_provider = ModelProvider.GEMINI
-                self.active_model_name = gemini_model_name
-                
-        except Exception as e:
-            logger.error(f"Failed to initialize Gemini model: {e}")
+        # Providers with configuration present; dropped if their client fails to initialize.
+        # Vertex AI uses application default credentials, so Gemini is assumed
+        # configured unless explicitly disabled.
+        self._configured_providers = set()
+        if os.getenv("GEMINI_ENABLED", "1") != "0":
+            self._configured_providers.add(ModelProvider.GEMINI)
+        if os.getenv("ANTHROPIC_API_KEY"):
+            self._configured_providers.add(ModelProvider.CLAUDE)
+        else:
+            logger.warning("No Anthropic API key found in environment variables")
+        if os.getenv("OPENAI_API_KEY"):
+            self._configured_providers.add(ModelProvider.OPENAI)
+        else:
+            logger.warning("No OpenAI API key found in environment variables")
+        # The mock provider is opt-in and takes over as default when enabled
+        if os.getenv("MOCK_LLM", "0") == "1":
+            self._configured_providers.add(ModelProvider.MOCK)
         
-        # Try to load Claude client
-        try:
-            claude_api_key = os.getenv("ANTHROPIC_API_KEY")
-            if claude_api_key:
-                self.claude_client = anthropic.Anthropic(api_key=claude_api_key)
-                logger.info("Initialized Claude client")
-                
-                # Set Claude as default regardless of Gemini availability
-                self.active_provider = ModelProvider.CLAUDE
-                self.active_model_name = "claude-3-7-sonnet-20250219"
-            else:
-                logger.warning("No Anthropic API key found in environment variables")
-                
-        except Exception as e:
-            logger.error(f"Failed to initialize Claude client: {e}")
-            
-            
-        # Try to load OpenAI client
-        try:
-            openai_api_key = os.getenv("OPENAI_API_KEY")
-            if openai_api_key:
-                # Import OpenAI client
-                import openai as openai_client
-                self.openai_client = openai_client.OpenAI(api_key=openai_api_key)
-                logger.info("Initialized OpenAI client")
-                
-                # Only set as default if other clients aren't available and no provider is set
-                if not self.claude_client and not self.gemini_model and not self.deepseek_client and not self.active_provider:
-                    self.active_provider = ModelProvider.OPENAI
-                    self.active_model_name = "o3-mini"
-            else:
-                logger.warning("No OpenAI API key found in environment variables")
-                self.openai_client = None
-                
-        except Exception as e:
-            logger.error(f"Failed to initialize OpenAI client: {e}")
-            self.openai_client = None
+        # Default provider preference: Mock (when enabled), then Claude, Gemini, OpenAI
+        if ModelProvider.MOCK in self._configured_providers:
+            self.active_provider = ModelProvider.MOCK
+            self.active_model_name = "mock-standard"
+        elif ModelProvider.CLAUDE in self._configured_providers:
+            self.active_provider = ModelProvider.CLAUDE
+            self.active_model_name = "claude-3-7-sonnet-20250219"
+        elif ModelProvider.GEMINI in self._configured_providers:
+            self.active_provider = ModelProvider.GEMINI
+            self.active_model_name = self._gemini_model_name
+        elif ModelProvider.OPENAI in self._configured_providers:
+            self.active_provider = ModelProvider.OPENAI
+            self.active_model_name = "o3-mini"
+    
+    def _has_client(self, provider: ModelProvider) -> bool:
+        """Return True if the provider's client has already been created."""
+        if provider == ModelProvider.GEMINI:
+            return self.gemini_model is not None
+        if provider == ModelProvider.CLAUDE:
+            return self.claude_client is not None
+        if provider == ModelProvider.OPENAI:
+            return self.openai_client is not None
+        if provider == ModelProvider.MOCK:
+            return self.mock_client is not None
+        return False
+    
+    def _ensure_provider(self, provider: ModelProvider) -> bool:
+        """
+        Import the provider SDK and create its client if that has not happened yet.
+        
+        Blocking; call it through asyncio.to_thread from async code.
+        
+        Returns:
+            bool: True if the provider's client is ready, False if it is unavailable
+        """
+        if provider not in self._configured_providers:
+            return False
+        with self._init_lock:
+            if self._has_client(provider):
+                return True
+            try:
+                if provider == ModelProvider.GEMINI:
+                    from google.cloud import aiplatform
+                    from vertexai.generative_models import GenerativeModel
+                    project_id = os.getenv("PROJECT_ID", "meetinganalyzer-454912")
+                    location = os.getenv("LOCATION", "us-east1")
+                    
+                    # Initialize Vertex AI
+                    aiplatform.init(project=project_id, location=location)
+                    self._gemini_models[self._gemini_model_name] = GenerativeModel(self._gemini_model_name)
+                    self.gemini_model = self._gemini_models[self._gemini_model_name]
+                    logger.info(f"Initialized Gemini model: {self._gemini_model_name}")
+                elif provider == ModelProvider.CLAUDE:
+                    import anthropic
+                    # Use the async client: calls are awaited from the event loop
+                    self.claude_client = anthropic.AsyncAnthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+                    logger.info("Initialized Claude client")
+                elif provider == ModelProvider.OPENAI:
+                    import openai
+                    self.openai_client = openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+                    logger.info("Initialized OpenAI client")
+                elif provider == ModelProvider.MOCK:
+                    from mock_llm import MockLLM
+                    self.mock_client = MockLLM.from_env()
+                    logger.info("Initialized mock LLM provider")
+                return True
+            except Exception as e:
+                logger.error(f"Failed to initialize {provider.value} client: {e}")
+                self._configured_providers.discard(provider)
+                return False
+    
+    async def warm_up(self):
+        """
+        Initialize every configured provider off the event loop, active provider first.
+        
+        Falls back to the next available provider if the active one fails to
+        initialize, then marks the client ready.
+        """
+        start_time = time.perf_counter()
+        providers = sorted(self._configured_providers, key=lambda provider: provider != self.active_provider)
+        for provider in providers:
+            await asyncio.to_thread(self._ensure_provider, provider)
+        
+        if self.active_provider and not self.is_provider_available(self.active_provider):
+            logger.warning(f"Active provider {self.active_provider.value} failed to initialize")
+            self.active_provider = None
+            self.active_model_name = None
+            for provider in (ModelProvider.CLAUDE, ModelProvider.GEMINI, ModelProvider.OPENAI):
+                if self.set_active_provider(provider):
+                    break
+        
+        self.warmup_seconds = round(time.perf_counter() - start_time, 3)
+        self.ready = True
+        logger.info(f"LLM providers warmed up in {self.warmup_seconds}s: "
+                    f"{', '.join(p.value for p in providers if self._has_client(p)) or 'none'}")
     
     def set_active_provider(self, provider: ModelProvider, model_name: Optional[str] = None) -> bool:
         """
@@ -143,40 +339,198 @@ class UnifiedLLMClient:
         Returns:
             bool: True if successful, False otherwise
         """
-        if provider == ModelProvider.GEMINI and self.gemini_model:
+        if provider == ModelProvider.GEMINI and self.is_provider_available(provider):
             self.active_provider = ModelProvider.GEMINI
-            self.active_model_name = model_name or "gemini-1.5-pro-002"
+            self.active_model_name = model_name or self._gemini_model_name
             logger.info(f"Set active provider to Gemini: {self.active_model_name}")
             return True
             
-        elif provider == ModelProvider.CLAUDE and self.claude_client:
+        elif provider == ModelProvider.CLAUDE and self.is_provider_available(provider):
             self.active_provider = ModelProvider.CLAUDE
             self.active_model_name = model_name or "claude-3-7-sonnet-20250219"
             logger.info(f"Set active provider to Claude: {self.active_model_name}")
             return True
             
-        elif provider == ModelProvider.OPENAI and self.openai_client:
+        elif provider == ModelProvider.OPENAI and self.is_provider_available(provider):
             self.active_provider = ModelProvider.OPENAI
             self.active_model_name = model_name or "o3-mini"
             logger.info(f"Set active provider to OpenAI: {self.active_model_name}")
             return True
             
+        elif provider == ModelProvider.MOCK and self.is_provider_available(provider):
+            self.active_provider = ModelProvider.MOCK
+            self.active_model_name = model_name or "mock-standard"
+            logger.info(f"Set active provider to Mock: {self.active_model_name}")
+            return True
+            
         else:
             logger.error(f"Cannot set provider to {provider}: not initialized")
             return False
     
+    def set_auto_select(self, enabled: bool):
+        """Turn latency-aware automatic model selection on or off."""
+        self.auto_select = enabled
+        logger.info(f"Automatic model selection {'enabled' if enabled else 'disabled'}")
+    
+    def _auto_model(self, tier: ModelTier) -> Optional[ModelSpec]:
+        """Choose the fastest healthy configured model for a tier (see provider_health)."""
+        for candidate_tier in (tier,) + TIER_FALLBACKS[tier]:
+            candidates = [
+                spec
+                for provider in self._configured_providers
+                for spec in models_for_provider(provider.value)
+                if spec.tier == candidate_tier
+            ]
+            if candidates:
+                return health_tracker.choose(candidate_tier.value, candidates)
+        return None
+    
+    def is_provider_available(self, provider: ModelProvider) -> bool:
+        """Return True if the provider is configured; its client may still be loading."""
+        return provider in self._configured_providers
+    
+    def model_config_for(self,
+                         task: str,
+                         agent_name: Optional[str] = None,
+                         model: Optional[str] = None,
+                         temperature: float = 0.7,
+                         max_tokens: int = 1000,
+                         top_p: float = 0.95) -> ModelConfig:
+        """
+        Build a ModelConfig for a task using the model registry's tier policy.
+        
+        Args:
+            task: Task being performed (TASK_ROUTING, TASK_SHORT_CARD, TASK_LONG_CARD, TASK_SUMMARY)
+            agent_name: Calling agent; per-agent tier overrides take precedence
+            model: Explicit model preference, e.g. a custom agent's "model" field.
+                Accepts "provider:model", a bare model name or a tier name.
+                Otherwise, in auto mode the fastest healthy model of the tier is used.
+            temperature, max_tokens, top_p: Generation parameters
+        
+        Returns:
+            ModelConfig for the selected provider and model
+        """
+        provider = self.active_provider
+        model_name = None
+        tier = tier_for(task, agent_name)
+        
+        if model:
+            # Frontend sends "provider:model"; accept bare names and tiers too
+            requested = model.split(":", 1)[-1]
+            if requested in {t.value for t in ModelTier}:
+                tier = ModelTier(requested)
+            else:
+                requested_provider = provider_for_model(requested)
+                if requested_provider and self.is_provider_available(ModelProvider(requested_provider)):
+                    provider = ModelProvider(requested_provider)
+                    model_name = requested
+                else:
+                    logger.warning(f"Model '{model}' requested by {agent_name or task} is not available, using tier policy")
+        
+        if not model_name and self.auto_select:
+            spec = self._auto_model(tier)
+            if spec:
+                provider, model_name = ModelProvider(spec.provider), spec.name
+        
+        if not model_name and provider:
+            model_name = select_model(provider.value, tier, self.active_model_name) or self.active_model_name
+        
+        return ModelConfig(
+            provider=provider,
+            model_name=model_name,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            top_p=top_p
+        )
+    
+    def _get_gemini_model(self, model_name: str) -> Any:
+        """Return a cached GenerativeModel for the given Gemini model name."""
+        gemini_model = self._gemini_models.get(model_name)
+        if gemini_model is None:
+            from vertexai.generative_models import GenerativeModel
+            gemini_model = self._gemini_models[model_name] = GenerativeModel(model_name)
+            logger.info(f"Initialized Gemini model: {model_name}")
+        return gemini_model
+    
+    async def _get_gemini_cached_model(self, model_name: str, prefix: str) -> Optional[Any]:
+        """
+        Return a GenerativeModel bound to a CachedContent holding the prefix.
+        
+        Returns None when caching is disabled, the prefix is below Vertex AI's
+        minimum cacheable size, or cache creation failed for this prefix.
+        """
+        if not PROMPT_CACHING_ENABLED or estimate_tokens(prefix) < GEMINI_CACHE_MIN_TOKENS:
+            return None
+        
+        key = (model_name, hashlib.sha256(prefix.encode("utf-8")).hexdigest())
+        if key in self._gemini_cache_failures:
+            return None
+        
+        lock = self._gemini_cache_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            entry = self._gemini_cached_models.get(key)
+            if entry and entry[1] > time.time():
+                return entry[0]
+            try:
+                from vertexai.preview import caching
+                from vertexai.preview.generative_models import GenerativeModel as PreviewGenerativeModel
+                
+                # CachedContent.create is a blocking call; keep it off the event loop
+                cached_content = await asyncio.to_thread(
+                    caching.CachedContent.create,
+                    model_name=model_name,
+                    contents=[prefix],
+                    ttl=datetime.timedelta(seconds=GEMINI_CACHE_TTL_SECONDS)
+                )
+                cached_model = PreviewGenerativeModel.from_cached_content(cached_content=cached_content)
+                # Refresh a minute before the provider expires the cache
+                self._gemini_cached_models[key] = (cached_model, time.time() + GEMINI_CACHE_TTL_SECONDS - 60)
+                logger.info(f"Created Gemini context cache for {model_name} (~{estimate_tokens(prefix)} tokens)")
+                return cached_model
+            except Exception as e:
+                logger.warning(f"Gemini context caching unavailable for {model_name}, sending prefix inline: {e}")
+                self._gemini_cache_failures.add(key)
+                return None
+    
     async def generate_content(self, 
                               prompt: str, 
-                              config: Optional[ModelConfig] = None) -> ModelResponse:
+                              config: Optional[ModelConfig] = None,
+                              agent_name: Optional[str] = None,
+                              cacheable_prefix: Optional[str] = None,
+                              priority: Optional[CallPriority] = None,
+                              deadline: Optional[float] = None,
+                              response_schema: Optional[ResponseSchema] = None,
+                              early_abort: Optional[Callable[[str], bool]] = None) -> ModelResponse:
         """
-        Generate content from the active LLM provider.
+        Generate content from the provider named in the config.
         
         Args:
-            prompt: The prompt to send to the model
-            config: Optional model configuration
+            prompt: The prompt to send to the model, or its dynamic suffix when
+                cacheable_prefix is given
+            config: Optional model configuration; defaults to the active provider and model
+            agent_name: Optional name of the calling agent, used for usage accounting
+            cacheable_prefix: Optional static prompt prefix that is identical across
+                calls. It is sent ahead of the prompt and cached provider-side where
+                supported (Anthropic cache_control, Gemini CachedContent, OpenAI
+                automatic prefix caching).
+            priority: Queue priority for the provider's concurrency limit; defaults
+                to the priority of the current task (see current_call_priority)
+            deadline: Absolute time.monotonic() by which the call must finish, including
+                queue wait; defaults to the current segment's deadline (see
+                current_deadline), or SEGMENT_DEADLINE_SECONDS from now
+            response_schema: Optional JSON schema the response must follow, enforced
+                natively by the provider (Anthropic tool use, Gemini response_schema,
+                OpenAI json_schema). The decoded object is returned in
+                ModelResponse.parsed.
+            early_abort: Optional callable fed each streamed text chunk (see
+                utils.EarlyAbortCheck). When it returns True the stream is closed and
+                the response comes back with finish_reason "ABORTED" and the text so far.
         
         Returns:
             ModelResponse with standardized fields
+        
+        Raises:
+            DeadlineExceeded: if the call cannot finish before the deadline
         """
         if config is None:
             # Use default configuration
@@ -185,17 +539,141 @@ class UnifiedLLMClient:
                 model_name=self.active_model_name
             )
         
-        if self.active_provider == ModelProvider.GEMINI:
-            return await self._generate_with_gemini(prompt, config)
-        elif self.active_provider == ModelProvider.CLAUDE:
-            return await self._generate_with_claude(prompt, config)
-        elif self.active_provider == ModelProvider.OPENAI:
-            return await self._generate_with_openai(prompt, config)
+        if config.provider == ModelProvider.GEMINI:
+            generate = self._generate_with_gemini
+        elif config.provider == ModelProvider.CLAUDE:
+            generate = self._generate_with_claude
+        elif config.provider == ModelProvider.OPENAI:
+            generate = self._generate_with_openai
+        elif config.provider == ModelProvider.MOCK:
+            generate = self._generate_with_mock
         else:
-            raise ValueError(f"No active provider set or provider not supported: {self.active_provider}")
+            raise ValueError(f"No active provider set or provider not supported: {config.provider}")
+        
+        # Normally done by warm_up; covers calls that arrive before it finishes
+        if not self._has_client(config.provider):
+            if not await asyncio.to_thread(self._ensure_provider, config.provider):
+                raise ValueError(f"Provider {config.provider.value} is not available")
+        
+        if priority is None:
+            priority = current_call_priority.get()
+        if deadline is None:
+            deadline = current_deadline.get() or deadline_for_segment()
+        
+        # Set once the request has left the queue, so cancellation knows whether input was billed
+        progress = {"sent": False}
+        try:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            return await asyncio.wait_for(
+                self._generate_in_slot(generate, prompt, config, agent_name, cacheable_prefix,
+                                      response_schema, early_abort, priority, progress),
+                timeout=remaining
+            )
+        except asyncio.TimeoutError:
+            if time.monotonic() < deadline:
+                # Raised inside the provider call (e.g. an HTTP read timeout), not by the deadline:
+                # it is a provider error, already recorded as one by _generate_in_slot
+                raise
+            self._record_cancellation(prompt, config, agent_name, cacheable_prefix, progress, CANCEL_DEADLINE)
+            if progress["sent"]:
+                # A provider too slow to answer within the deadline counts against its health
+                health_tracker.record(config.provider, config.model_name, error=True)
+            raise DeadlineExceeded(
+                f"{config.provider.value} call for {agent_name or 'unknown agent'} missed its deadline"
+            ) from None
+        except asyncio.CancelledError as e:
+            self._record_cancellation(prompt, config, agent_name, cacheable_prefix, progress, cancel_reason(e))
+            raise
+    
+    async def _generate_in_slot(self, generate: Callable[..., Awaitable[ModelResponse]], prompt: str,
+                                config: ModelConfig, agent_name: Optional[str], cacheable_prefix: Optional[str],
+                                response_schema: Optional[ResponseSchema],
+                                early_abort: Optional[Callable[[str], bool]], priority: CallPriority,
+                                progress: Dict[str, bool]) -> ModelResponse:
+        """Wait for a concurrency slot, run the provider call and record its usage."""
+        # Latency is measured from when the slot is granted; queue wait is reported separately
+        async with self._limiters[config.provider].slot(priority) as queue_ms:
+            progress["sent"] = True
+            start_time = time.perf_counter()
+            try:
+                response = await generate(prompt, config, start_time, cacheable_prefix, response_schema, early_abort)
+            except Exception:
+                usage_tracker.record(
+                    agent_name,
+                    config.provider,
+                    config.model_name,
+                    latency_ms=(time.perf_counter() - start_time) * 1000,
+                    queue_ms=queue_ms,
+                    error=True
+                )
+                health_tracker.record(config.provider, config.model_name, error=True)
+                raise
+            response.latency_ms = (time.perf_counter() - start_time) * 1000
+        
+        # Aborted streams say nothing about how fast a full response would have been
+        if response.finish_reason != "ABORTED":
+            health_tracker.record(config.provider, config.model_name, response.latency_ms)
+        
+        response.queue_ms = queue_ms
+        if response.finish_reason == "ABORTED":
+            # The output budget the aborted stream did not use counts as saved
+            saved_tokens = max(0, config.max_tokens - response.usage["output_tokens"])
+            logger.info(f"[{agent_name or 'unknown agent'}] {config.provider.value} stream aborted early, "
+                        f"~{saved_tokens} tokens saved")
+            usage_tracker.record_cancellation(agent_name, config.provider, config.model_name,
+                                              CANCEL_EARLY_ABORT, saved_tokens)
+        elif response_schema is not None and response.parsed is None:
+            response.parsed = response_schema.parse(response.text)
+        usage_tracker.record(
+            agent_name,
+            response.model_provider,
+            response.model_name,
+            usage=response.usage,
+            latency_ms=response.latency_ms,
+            ttft_ms=response.ttft_ms,
+            queue_ms=queue_ms
+        )
+        return response
+    
+    def _record_cancellation(self, prompt: str, config: ModelConfig, agent_name: Optional[str],
+                             cacheable_prefix: Optional[str], progress: Dict[str, bool], reason: str):
+        """
+        Record an abandoned call with an estimate of the tokens it did not spend.
+        
+        Output is assumed to stop at the cancellation, so up to max_tokens are saved;
+        input tokens are only saved if the request never left the queue.
+        """
+        saved_tokens = config.max_tokens
+        if not progress["sent"]:
+            saved_tokens += estimate_tokens((cacheable_prefix or "") + prompt)
+        logger.info(f"[{agent_name or 'unknown agent'}] {config.provider.value} call cancelled ({reason}), "
+                    f"~{saved_tokens} tokens saved")
+        usage_tracker.record_cancellation(agent_name, config.provider, config.model_name, reason, saved_tokens)
+    
+    @staticmethod
+    def _aborted_usage(prompt: str, cacheable_prefix: Optional[str], text: str) -> Dict[str, int]:
+        """Estimated usage for a stream closed early, which never reports its own."""
+        return normalize_usage(
+            input_tokens=estimate_tokens((cacheable_prefix or "") + prompt),
+            output_tokens=estimate_tokens(text)
+        )
     
-    async def _generate_with_gemini(self, prompt: str, config: ModelConfig) -> ModelResponse:
-        """Generate content using Gemini."""
+    def concurrency_snapshot(self) -> Dict[str, Dict[str, int]]:
+        """Current limit, in-flight and queued calls for each available provider."""
+        return {
+            provider.value: limiter.to_dict()
+            for provider, limiter in self._limiters.items()
+            if self.is_provider_available(provider)
+        }
+    
+    async def _generate_with_gemini(self, prompt: str, config: ModelConfig, start_time: float,
+                                    cacheable_prefix: Optional[str] = None,
+                                    response_schema: Optional[ResponseSchema] = None,
+                                    early_abort: Optional[Callable[[str], bool]] = None) -> ModelResponse:
+        """Generate content using Gemini, streaming so time-to-first-token can be measured."""
+        import vertexai.generative_models as gm
         try:
             generation_config = {
                 "temperature": config.temperature,
@@ -203,6 +681,13 @@ class UnifiedLLMClient:
                 "top_p": config.top_p,
                 "top_k": config.top_k
             }
+            if response_schema is not None:
+                # GenerationConfig converts the JSON-schema dict to Gemini's Schema type
+                generation_config = gm.GenerationConfig(
+                    **generation_config,
+                    response_mime_type="application/json",
+                    response_schema=response_schema.for_gemini()
+                )
             
             safety_settings = {
                 gm.HarmCategory.HARM_CATEGORY_HARASSMENT: gm.HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
@@ -211,56 +696,163 @@ class UnifiedLLMClient:
                 gm.HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: gm.HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE
             }
             
-            response = await self.gemini_model.generate_content_async(
+            gemini_model = None
+            # The prefix, when the cached content holds it instead of the prompt
+            cached_prefix = None
+            if cacheable_prefix:
+                gemini_model = await self._get_gemini_cached_model(config.model_name, cacheable_prefix)
+                if gemini_model is None:
+                    prompt = cacheable_prefix + prompt
+                else:
+                    cached_prefix = cacheable_prefix
+            if gemini_model is None:
+                gemini_model = self._get_gemini_model(config.model_name)
+            
+            stream = await gemini_model.generate_content_async(
                 prompt,
                 generation_config=generation_config,
-                safety_settings=safety_settings
+                safety_settings=safety_settings,
+                stream=True
             )
             
-            # Extract finish reason
+            text_parts = []
+            ttft_ms = None
             finish_reason = "STOP"
-            if response.candidates and response.candidates[0].finish_reason:
-                finish_reason = str(response.candidates[0].finish_reason)
+            usage_metadata = None
+            async for chunk in stream:
+                if chunk.candidates:
+                    candidate = chunk.candidates[0]
+                    if candidate.finish_reason:
+                        # Normalize enum values such as FinishReason.SAFETY to "SAFETY"
+                        finish_reason = getattr(candidate.finish_reason, "name", str(candidate.finish_reason))
+                    for part in candidate.content.parts:
+                        if part.text:
+                            if ttft_ms is None:
+                                ttft_ms = (time.perf_counter() - start_time) * 1000
+                            text_parts.append(part.text)
+                            if early_abort and early_abort(part.text):
+                                finish_reason = "ABORTED"
+                if finish_reason == "ABORTED":
+                    break
+                # Usage is reported on the final chunk
+                if getattr(chunk, "usage_metadata", None):
+                    usage_metadata = chunk.usage_metadata
+            
+            if finish_reason == "ABORTED":
+                close = getattr(stream, "aclose", None)
+                if close:
+                    await close()
+                usage = self._aborted_usage(prompt, cached_prefix, "".join(text_parts))
+            else:
+                usage = normalize_usage(
+                    input_tokens=getattr(usage_metadata, "prompt_token_count", 0),
+                    output_tokens=getattr(usage_metadata, "candidates_token_count", 0),
+                    total_tokens=getattr(usage_metadata, "total_token_count", 0),
+                    cached_input_tokens=getattr(usage_metadata, "cached_content_token_count", 0)
+                )
             
             # Construct standardized response
             return ModelResponse(
-                text=response.text,
+                text="".join(text_parts),
                 finish_reason=finish_reason,
                 model_provider=ModelProvider.GEMINI,
-                model_name=config.model_name
+                model_name=config.model_name,
+                usage=usage,
+                ttft_ms=ttft_ms
             )
             
         except Exception as e:
             logger.error(f"Error generating content with Gemini: {e}")
             raise
     
-    async def _generate_with_claude(self, prompt: str, config: ModelConfig) -> ModelResponse:
-        """Generate content using Claude."""
+    async def _generate_with_claude(self, prompt: str, config: ModelConfig, start_time: float,
+                                    cacheable_prefix: Optional[str] = None,
+                                    response_schema: Optional[ResponseSchema] = None,
+                                    early_abort: Optional[Callable[[str], bool]] = None) -> ModelResponse:
+        """Generate content using Claude, streaming so time-to-first-token can be measured."""
         try:
-            # Create message request
-            response = await self.claude_client.messages.create(
+            min_tokens = CLAUDE_HAIKU_CACHE_MIN_TOKENS if "haiku" in config.model_name else CLAUDE_CACHE_MIN_TOKENS
+            if cacheable_prefix and PROMPT_CACHING_ENABLED and estimate_tokens(cacheable_prefix) >= min_tokens:
+                # Mark the static prefix as a cache breakpoint
+                content = [
+                    {"type": "text", "text": cacheable_prefix, "cache_control": {"type": "ephemeral"}},
+                    {"type": "text", "text": prompt}
+                ]
+            else:
+                content = (cacheable_prefix or "") + prompt
+            
+            request = {}
+            if response_schema is not None:
+                # Forcing a single tool call makes the tool input the structured response
+                request["tools"] = [{
+                    "name": response_schema.name,
+                    "description": response_schema.description,
+                    "input_schema": response_schema.schema
+                }]
+                request["tool_choice"] = {"type": "tool", "name": response_schema.name}
+            
+            text_parts = []
+            ttft_ms = None
+            # Create streaming message request
+            async with self.claude_client.messages.stream(
                 model=config.model_name,
                 max_tokens=config.max_tokens,
                 temperature=config.temperature,
                 system="You are an AI meeting assistant providing insights during meetings.",
                 messages=[
-                    {"role": "user", "content": prompt}
-                ]
-            )
+                    {"role": "user", "content": content}
+                ],
+                **request
+            ) as stream:
+                aborted = False
+                async for event in stream:
+                    # Tool input streams as partial JSON rather than text
+                    if event.type not in ("text", "input_json"):
+                        continue
+                    if ttft_ms is None:
+                        ttft_ms = (time.perf_counter() - start_time) * 1000
+                    delta = event.text if event.type == "text" else event.partial_json
+                    if event.type == "text":
+                        text_parts.append(delta)
+                    if early_abort and early_abort(delta):
+                        aborted = True
+                        break
+                # Leaving the context manager closes the HTTP stream
+                response = None if aborted else await stream.get_final_message()
+            
+            if aborted:
+                return ModelResponse(
+                    text="".join(text_parts),
+                    finish_reason="ABORTED",
+                    model_provider=ModelProvider.CLAUDE,
+                    model_name=config.model_name,
+                    usage=self._aborted_usage(prompt, cacheable_prefix, "".join(text_parts)),
+                    ttft_ms=ttft_ms
+                )
             
-            # Extract text from response
-            content = response.content[0].text if response.content else ""
+            parsed = None
+            for block in response.content:
+                if block.type == "tool_use":
+                    parsed = block.input
+                    text_parts = [json.dumps(parsed)]
+            
+            # Cache reads are reported separately from regular input tokens
+            cached_tokens = getattr(response.usage, "cache_read_input_tokens", 0) or 0
+            cache_writes = getattr(response.usage, "cache_creation_input_tokens", 0) or 0
             
             # Construct standardized response
             return ModelResponse(
-                text=content,
+                text="".join(text_parts),
                 finish_reason=response.stop_reason or "STOP",
                 model_provider=ModelProvider.CLAUDE,
                 model_name=config.model_name,
-                usage={
-                    "input_tokens": response.usage.input_tokens,
-                    "output_tokens": response.usage.output_tokens
-                }
+                usage=normalize_usage(
+                    input_tokens=response.usage.input_tokens + cached_tokens + cache_writes,
+                    output_tokens=response.usage.output_tokens,
+                    cached_input_tokens=cached_tokens
+                ),
+                ttft_ms=ttft_ms,
+                parsed=parsed
             )
             
         except Exception as e:
@@ -268,59 +860,118 @@ class UnifiedLLMClient:
             raise
     
     
-    async def _generate_with_openai(self, prompt: str, config: ModelConfig) -> ModelResponse:
-        """Generate content using OpenAI."""
+    async def _generate_with_openai(self, prompt: str, config: ModelConfig, start_time: float,
+                                    cacheable_prefix: Optional[str] = None,
+                                    response_schema: Optional[ResponseSchema] = None,
+                                    early_abort: Optional[Callable[[str], bool]] = None) -> ModelResponse:
+        """Generate content using OpenAI, streaming so time-to-first-token can be measured."""
         try:
-            response = await self.openai_client.chat.completions.create(
+            request = {}
+            if response_schema is not None:
+                request["response_format"] = {
+                    "type": "json_schema",
+                    "json_schema": {"name": response_schema.name, "schema": response_schema.schema, "strict": True}
+                }
+            
+            # OpenAI caches long shared prefixes automatically; keeping the static
+            # part first is all that is needed
+            stream = await self.openai_client.chat.completions.create(
                 model=config.model_name,
-                messages=[{"role": "user", "content": prompt}],
+                messages=[{"role": "user", "content": (cacheable_prefix or "") + prompt}],
                 temperature=config.temperature,
                 max_tokens=config.max_tokens,
+                stream=True,
+                stream_options={"include_usage": True},
+                **request
             )
             
-            content = response.choices[0].message.content if response.choices else ""
+            text_parts = []
+            ttft_ms = None
+            finish_reason = "unknown"
+            usage = normalize_usage()
+            async for chunk in stream:
+                if chunk.choices:
+                    choice = chunk.choices[0]
+                    if choice.delta and choice.delta.content:
+                        if ttft_ms is None:
+                            ttft_ms = (time.perf_counter() - start_time) * 1000
+                        text_parts.append(choice.delta.content)
+                        if early_abort and early_abort(choice.delta.content):
+                            finish_reason = "ABORTED"
+                            await stream.close()
+                            usage = self._aborted_usage(prompt, cacheable_prefix, "".join(text_parts))
+                            break
+                    if choice.finish_reason:
+                        finish_reason = choice.finish_reason
+                # With include_usage the final chunk carries usage and no choices
+                if chunk.usage:
+                    details = getattr(chunk.usage, "prompt_tokens_details", None)
+                    usage = normalize_usage(
+                        input_tokens=chunk.usage.prompt_tokens,
+                        output_tokens=chunk.usage.completion_tokens,
+                        total_tokens=chunk.usage.total_tokens,
+                        cached_input_tokens=getattr(details, "cached_tokens", 0)
+                    )
             
             return ModelResponse(
-                text=content,
-                finish_reason=response.choices[0].finish_reason if response.choices else "unknown",
+                text="".join(text_parts),
+                finish_reason=finish_reason,
                 model_provider=ModelProvider.OPENAI,
                 model_name=config.model_name,
-                usage={
-                    "prompt_tokens": response.usage.prompt_tokens,
-                    "completion_tokens": response.usage.completion_tokens,
-                    "total_tokens": response.usage.total_tokens
-                }
+                usage=usage,
+                ttft_ms=ttft_ms
             )
         except Exception as e:
             logger.error(f"Error generating content with OpenAI: {e}")
             raise
     
+    async def _generate_with_mock(self, prompt: str, config: ModelConfig, start_time: float,
+                                  cacheable_prefix: Optional[str] = None,
+                                  response_schema: Optional[ResponseSchema] = None,
+                                  early_abort: Optional[Callable[[str], bool]] = None) -> ModelResponse:
+        """Generate content with the local mock provider, streaming like the real ones."""
+        try:
+            text_parts = []
+            ttft_ms = None
+            finish_reason = "unknown"
+            usage = normalize_usage()
+            stream = self.mock_client.stream(prompt, config.max_tokens, cacheable_prefix, usage,
+                                             response_schema.schema if response_schema else None)
+            async for chunk in stream:
+                if chunk.text:
+                    if ttft_ms is None:
+                        ttft_ms = (time.perf_counter() - start_time) * 1000
+                    text_parts.append(chunk.text)
+                    if early_abort and early_abort(chunk.text):
+                        finish_reason = "ABORTED"
+                        await stream.aclose()
+                        usage["output_tokens"] = estimate_tokens("".join(text_parts))
+                        break
+                if chunk.finish_reason:
+                    finish_reason = chunk.finish_reason
+            usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"]
+            
+            return ModelResponse(
+                text="".join(text_parts),
+                finish_reason=finish_reason,
+                model_provider=ModelProvider.MOCK,
+                model_name=config.model_name,
+                usage=usage,
+                ttft_ms=ttft_ms
+            )
+        except Exception as e:
+            logger.error(f"Error generating content with Mock: {e}")
+            raise
+    
     def available_models(self) -> Dict[str, List[str]]:
         """
         Returns a dictionary of available models grouped by provider.
         """
         models = {}
         
-        if self.gemini_model:
-            models[ModelProvider.GEMINI] = [
-                "gemini-1.5-pro-002",
-                "gemini-1.5-flash-002"
-            ]
-            
-        if self.claude_client:
-            models[ModelProvider.CLAUDE] = [
-                "claude-3-7-sonnet-20250219", 
-                "claude-3-5-sonnet-20240620", 
-                "claude-3-opus-20240229"
-            ]
-            
-            
-        if self.openai_client:
-            models[ModelProvider.OPENAI] = [
-                "o3-mini",
-                "gpt-4o",
-                "gpt-4-turbo"
-            ]
+        for provider in ModelProvider:
+            if self.is_provider_available(provider):
+                models[provider] = [spec.name for spec in models_for_provider(provider.value)]
             
         return models
 
@@ -5,15 +5,28 @@ import logging
 import os
 import json
 import asyncio
-import collections # Import collections for deque
-
-# Import Google Cloud libraries
-from google.cloud import speech
-from google.cloud import aiplatform
-from vertexai.generative_models import GenerativeModel
-
-# Import unified LLM client
-from llm_providers import llm_client, ModelProvider
+import uuid
+import time
+import importlib
+from fastapi.responses import JSONResponse
+
+# Google Cloud Speech is imported during warm-up (see warm_up_services), not at module load
+
+# Import unified LLM client (provider SDKs are loaded lazily)
+from llm_providers import llm_client, ModelProvider, CallPriority, current_call_priority
+
+# Import usage accounting
+from usage_tracking import usage_tracker, current_session_id
+from generation_control import SessionWork, current_deadline, deadline_for_segment, CANCEL_SESSION_CLOSED
+from model_registry import MODEL_REGISTRY, TASK_TIERS, AGENT_TIERS
+from provider_health import health_tracker
+from knowledge_store import knowledge_store
+from relevance_gate import relevance_gate
+from meeting_memory import MeetingMemory, current_meeting_memory
+from insight_dedup import insight_dedup
+from storage import store
+from agent_catalog import agent_catalog
+from io_executor import io_executor, loop_lag_monitor
 
 # --- Configuration ---
 logging.basicConfig(level=logging.INFO)
@@ -29,21 +42,24 @@ CLAUDE_MODEL_NAME = os.getenv("CLAUDE_MODEL_NAME", "claude-3-7-sonnet-20250219")
 
 # Rate limit for Traffic Cop calls
 last_traffic_cop_call_time = 0.0
-MIN_TRAFFIC_COP_INTERVAL = 10.0 # Set to 10 seconds - balance between triggering frequency and avoiding rate limits
+MIN_TRAFFIC_COP_INTERVAL = float(os.getenv("MIN_TRAFFIC_COP_INTERVAL", "10.0")) # 10 seconds balances triggering frequency and rate limits; lower it for load tests
 
-# Context Buffer Configuration for Debate Agent
-# Store approx 60 seconds. If segments are ~5-10s, 6-12 segments. Let's use 10.
-CONTEXT_BUFFER_SIZE = 10
+# Set SPEECH_ENABLED=0 to run without Google Cloud Speech (e.g. offline with MOCK_LLM=1);
+# transcripts are then only received as "inject_transcript" WebSocket messages
+SPEECH_ENABLED = os.getenv("SPEECH_ENABLED", "1") != "0"
+
+# Longest a new WebSocket waits for an unfinished warm-up before it is rejected
+WARMUP_WAIT_SECONDS = float(os.getenv("WARMUP_WAIT_SECONDS", "30"))
 
 # --- Initialize Clients (Global within main) ---
+# Speech module and client are set by warm_up_services once the app has started
+speech = None
 speech_client = None
-gemini_model = None  # Keep for backward compatibility
-
-try:
-    speech_client = speech.SpeechAsyncClient()
-    logger.info("SpeechAsyncClient initialized successfully.")
-except Exception as e:
-    logger.error(f"Could not initialize Google Cloud SpeechAsyncClient: {e}")
+warmup_task = None
+warmup_seconds = None
+knowledge_watch_task = None
+store_watch_task = None
+loop_lag_task = None
 
 # Check if we have available LLM providers
 available_models = llm_client.available_models()
@@ -57,7 +73,9 @@ if available_models:
     default_provider = os.getenv("DEFAULT_LLM_PROVIDER", "claude").lower()
     OPENAI_MODEL_NAME = os.getenv("OPENAI_MODEL_NAME", "o3-mini")
     
-    if default_provider == "claude" and ModelProvider.CLAUDE in available_models:
+    if llm_client.active_provider == ModelProvider.MOCK:
+        logger.info(f"Using mock LLM provider with model {llm_client.active_model_name}")
+    elif default_provider == "claude" and ModelProvider.CLAUDE in available_models:
         llm_client.set_active_provider(ModelProvider.CLAUDE, CLAUDE_MODEL_NAME)
         logger.info(f"Using Claude as default provider with model {CLAUDE_MODEL_NAME}")
     elif default_provider == "gemini" and ModelProvider.GEMINI in available_models:
@@ -82,24 +100,137 @@ if available_models:
 else:
     logger.error("No LLM providers available. Please check your credentials and environment variables.")
 
-# For backward compatibility, still set gemini_model
-if llm_client.gemini_model:
-    gemini_model = llm_client.gemini_model
-
 # --- Import AI logic AFTER clients are potentially initialized ---
 try:
     # Import the functions we need from traffic_cop.py
-    from traffic_cop import route_to_traffic_cop, trigger_agent
+    from traffic_cop import route_to_traffic_cop, trigger_agent, route_to_agents, trigger_agents, EXPLICIT_AGENTS
     logger.info("Successfully imported from traffic_cop.py")
 except ImportError as e:
     logger.error(f"Could not import from traffic_cop.py: {e}. Using dummy functions.")
     # Define dummy functions if import fails, to prevent crashes later
     async def route_to_traffic_cop(transcript_text: str, model): logger.error("route_to_traffic_cop failed to import"); return None
-    async def trigger_agent(name: str, current_segment_text: str, model, broadcaster, context_buffer: str): logger.error("trigger_agent failed to import")
+    async def trigger_agent(name: str, current_segment_text: str, model, broadcaster, context_buffer: str = None): logger.error("trigger_agent failed to import")
+    async def route_to_agents(transcript_text: str, model): logger.error("route_to_agents failed to import"); return None
+    async def trigger_agents(names: list, current_segment_text: str, model, broadcaster, context_buffer: str = None): logger.error("trigger_agents failed to import")
+    EXPLICIT_AGENTS = set()
 
 
 app = FastAPI()
 
+# --- Startup Warm-Up ---
+async def warm_up_services():
+    """Import the Speech SDK, initialize LLM provider clients and start knowledge base indexing without blocking the event loop."""
+    global speech, speech_client, warmup_seconds, knowledge_watch_task, store_watch_task
+    start_time = time.perf_counter()
+    if SPEECH_ENABLED:
+        try:
+            speech = await asyncio.to_thread(importlib.import_module, "google.cloud.speech")
+            speech_client = speech.SpeechAsyncClient()
+            logger.info("SpeechAsyncClient initialized successfully.")
+        except Exception as e:
+            logger.error(f"Could not initialize Google Cloud SpeechAsyncClient: {e}")
+    else:
+        logger.info("Speech disabled (SPEECH_ENABLED=0); accepting injected text transcripts only.")
+    await llm_client.warm_up()
+    # Knowledge bases are indexed, and then watched, in the background: readiness
+    # does not wait for them, and each document is searchable once it is indexed
+    try:
+        from agents.registry import AGENT_SPECS
+        knowledge_dirs = [spec.knowledge_dir for spec in AGENT_SPECS.values() if spec.knowledge_dir]
+        knowledge_dirs += [agent["knowledge_dir"] for agent in agent_catalog.snapshot.agents if agent.get("knowledge_dir")]
+        for knowledge_dir in knowledge_dirs:
+            knowledge_store.get(knowledge_dir)
+        knowledge_watch_task = asyncio.create_task(knowledge_store.watch())
+    except Exception as e:
+        logger.error(f"Could not start knowledge base indexing: {e}")
+    # Pick up custom agents and versions changed by other workers sharing the store
+    store_watch_task = asyncio.create_task(store.watch())
+    warmup_seconds = round(time.perf_counter() - start_time, 3)
+    logger.info(f"Warm-up finished in {warmup_seconds}s")
+
+@app.on_event("startup")
+async def start_warm_up():
+    """Start warm-up in the background so the server accepts connections immediately."""
+    global warmup_task, loop_lag_task
+    warmup_task = asyncio.create_task(warm_up_services())
+    loop_lag_task = asyncio.create_task(loop_lag_monitor.run())
+
+@app.on_event("shutdown")
+async def flush_on_shutdown():
+    """Write out agent version changes still waiting for the journal or the database, and every queued write."""
+    from agent_versions import version_store
+    await version_store.close()
+    await io_executor.drain()
+
+# --- Readiness API ---
+@app.get("/ready")
+async def readiness():
+    """Readiness probe: 200 once warm-up has finished and clients are usable, 503 before."""
+    speech_ready = bool(speech_client) or not SPEECH_ENABLED
+    ready = bool(warmup_task and warmup_task.done() and speech_ready and llm_client.active_provider)
+    body = {
+        "ready": ready,
+        "speech": bool(speech_client),
+        "llm_provider": llm_client.active_provider.value if llm_client.active_provider else None,
+        "warmup_seconds": warmup_seconds,
+    }
+    return JSONResponse(status_code=200 if ready else 503, content=body)
+
+# --- Model Registry API ---
+@app.get("/models")
+async def get_models():
+    """Registered models, the task and per-agent tier policy, and rolling model health."""
+    return {
+        "models": {name: spec.to_dict() for name, spec in MODEL_REGISTRY.items()},
+        "task_tiers": {task: tier.value for task, tier in TASK_TIERS.items()},
+        "agent_tiers": {agent: tier.value for agent, tier in AGENT_TIERS.items()},
+        "available": llm_client.available_models(),
+        "auto_select": llm_client.auto_select,
+        "health": health_tracker.snapshot()
+    }
+
+# --- Knowledge Base API ---
+@app.get("/knowledge")
+async def get_knowledge():
+    """Registered knowledge bases with their index size and last refresh."""
+    # Stats take each base's index lock, which a refresh may be holding
+    return await asyncio.to_thread(knowledge_store.snapshot)
+
+# --- Relevance Gate API ---
+@app.get("/relevance")
+async def get_relevance():
+    """Relevance gate settings and, per agent, its readiness, precision, recall and calls saved."""
+    return relevance_gate.snapshot()
+
+# --- Insight Deduplication API ---
+@app.get("/insights/dedup")
+async def get_insight_dedup():
+    """Near-duplicate suppression settings, and cards broadcast, suppressed and skipped so far."""
+    return insight_dedup.snapshot()
+
+# --- Storage API ---
+@app.get("/store")
+async def get_store():
+    """Storage backend in use and, for the SQLite store, its row counts."""
+    return await asyncio.to_thread(store.stats)
+
+# --- Event Loop API ---
+@app.get("/loop")
+async def get_loop_lag():
+    """Event loop lag percentiles and stalls, and the backlog of the I/O thread."""
+    return loop_lag_monitor.stats()
+
+# --- Usage API ---
+@app.get("/usage")
+async def get_usage():
+    """Process-wide token usage, cost and latency, broken down by agent and model."""
+    return {**usage_tracker.snapshot(), "concurrency": llm_client.concurrency_snapshot()}
+
+@app.get("/usage/{session_id}")
+async def get_session_usage(session_id: str):
+    """Token usage, cost and latency for a single live session."""
+    return usage_tracker.snapshot(session_id)
+
 # --- WebSocket Manager ---
 class ConnectionManager:
     def __init__(self):
@@ -134,6 +265,9 @@ async def broadcast_insight(insight_data: dict):
     try:
         # Add agent name to log for clarity
         agent_name = insight_data.get("agent", "Unknown Agent")
+        # Cards that repeat one already sent in this session are dropped
+        if insight_data.get("type") == "insight" and not insight_dedup.admit(agent_name, insight_data.get("content", "")):
+            return
         logger.info(f"Broadcasting insight from {agent_name}...")
         message_str = json.dumps(insight_data)
         await manager.broadcast(message_str)
@@ -142,12 +276,72 @@ async def broadcast_insight(insight_data: dict):
 
 
 # --- Transcription Handling (Modified for Buffering) ---
-async def handle_transcript_response(response_stream, websocket: WebSocket):
-    """Handles responses from the Speech-to-Text API stream and triggers agents."""
+async def process_final_transcript(transcript: str, memory: MeetingMemory,
+                                   session_work: SessionWork, arrival_time: float = None):
+    """
+    Routes one finalized transcript segment and triggers the selected agents.
+
+    Every LLM call made for the segment must finish before its deadline
+    (SEGMENT_DEADLINE_SECONDS after arrival_time). The agents run as a
+    session_work pipeline, which the next routed segment supersedes.
+    """
+    deadline_token = current_deadline.set(deadline_for_segment(arrival_time))
+    try:
+        await _route_final_transcript(transcript, memory, session_work)
+    finally:
+        current_deadline.reset(deadline_token)
+
+
+async def _route_final_transcript(transcript: str, memory: MeetingMemory, session_work: SessionWork):
+    """Routing and triggering for process_final_transcript, run under the segment's deadline."""
     global last_traffic_cop_call_time
-    # Initialize context buffer for this connection using deque
-    transcript_buffer = collections.deque(maxlen=CONTEXT_BUFFER_SIZE)
-    logger.info(f">>> handle_transcript_response: Started (Buffer size: {CONTEXT_BUFFER_SIZE})")
+    logger.info(f"Final Transcript: {transcript}")
+    # Add the finalized transcript to the meeting memory
+    memory.add(transcript)
+
+    # Skip empty transcripts before calling Traffic Cop
+    if not transcript or len(transcript.strip()) < 2: # Very minimal check - almost any content will pass
+        logger.info("Transcript empty, skipping Traffic Cop call.")
+        return
+
+    current_time = asyncio.get_event_loop().time()
+    time_since_last_call = current_time - last_traffic_cop_call_time
+
+    if time_since_last_call >= MIN_TRAFFIC_COP_INTERVAL:
+        logger.info(f"Interval passed ({time_since_last_call:.1f}s >= {MIN_TRAFFIC_COP_INTERVAL}s). Calling Traffic Cop.")
+        last_traffic_cop_call_time = current_time
+
+        # Get the agent names from traffic cop (pass model)
+        # Route based on the *current* segment, but traffic cop might check keywords
+        agent_names = await route_to_agents(transcript, llm_client)
+
+        # Only trigger agents if routing succeeded and picked at least one
+        if agent_names:
+            # Call trigger_agents with the CURRENT segment; agents that read the meeting
+            # context take it from the session's meeting memory within their own budget.
+            # It runs in the background (inheriting the deadline) so transcription keeps
+            # flowing; a newer routed segment cancels it unless an explicit agent was picked.
+            session_work.start(
+                trigger_agents(
+                    names=agent_names,
+                    current_segment_text=transcript, # Pass current segment
+                    model=llm_client,
+                    broadcaster=broadcast_insight # Pass the broadcast function
+                ),
+                supersedable=not any(name in EXPLICIT_AGENTS for name in agent_names)
+            )
+        elif agent_names == []:
+            logger.info("Traffic Cop decided no agent is needed for this transcript.")
+        else: # Should mean route_to_agents returned None due to error
+            logger.warning("Traffic Cop returned no agent (likely due to an error), skipping trigger.")
+    else:
+        logger.info(f"Skipping Traffic Cop call (interval not met: {time_since_last_call:.1f}s < {MIN_TRAFFIC_COP_INTERVAL}s).")
+
+
+async def handle_transcript_response(response_stream, websocket: WebSocket, memory: MeetingMemory,
+                                     session_work: SessionWork):
+    """Handles responses from the Speech-to-Text API stream and triggers agents."""
+    logger.info(">>> handle_transcript_response: Started")
 
     try:
         async for response in response_stream:
@@ -158,44 +352,7 @@ async def handle_transcript_response(response_stream, websocket: WebSocket):
             transcript = result.alternatives[0].transcript
 
             if result.is_final:
-                logger.info(f"Final Transcript: {transcript}")
-                # Add the finalized transcript to the buffer
-                transcript_buffer.append(transcript)
-
-                # Skip empty transcripts before calling Traffic Cop
-                if not transcript or len(transcript.strip()) < 2: # Very minimal check - almost any content will pass
-                    logger.info("Transcript empty, skipping Traffic Cop call.")
-                    continue
-
-                current_time = asyncio.get_event_loop().time()
-                time_since_last_call = current_time - last_traffic_cop_call_time
-
-                if time_since_last_call >= MIN_TRAFFIC_COP_INTERVAL:
-                    logger.info(f"Interval passed ({time_since_last_call:.1f}s >= {MIN_TRAFFIC_COP_INTERVAL}s). Calling Traffic Cop.")
-                    last_traffic_cop_call_time = current_time
-
-                    # Get the agent name from traffic cop (pass model)
-                    # Route based on the *current* segment, but traffic cop might check keywords
-                    agent_name = await route_to_traffic_cop(transcript, gemini_model)
-
-                    # Only trigger agent if a valid one was returned and it's not "None"
-                    if agent_name and agent_name != "None":
-                        # Prepare the context buffer by joining recent segments
-                        current_context_buffer = " ".join(list(transcript_buffer))
-                        # Call trigger_agent, passing the CURRENT segment AND the context buffer
-                        await trigger_agent(
-                            name=agent_name,
-                            current_segment_text=transcript, # Pass current segment
-                            model=gemini_model,
-                            broadcaster=broadcast_insight, # Pass the broadcast function
-                            context_buffer=current_context_buffer # Pass joined buffer
-                        )
-                    elif agent_name == "None":
-                        logger.info("Traffic Cop decided no agent is needed for this transcript.")
-                    else: # Should mean route_to_traffic_cop returned None due to error
-                        logger.warning("Traffic Cop returned no agent (likely due to an error), skipping trigger.")
-                else:
-                    logger.info(f"Skipping Traffic Cop call (interval not met: {time_since_last_call:.1f}s < {MIN_TRAFFIC_COP_INTERVAL}s).")
+                await process_final_transcript(transcript, memory, session_work, time.monotonic())
             else:
                 # Log interim results less verbosely if desired
                 # logger.debug(f"Interim Transcript: {transcript}")
@@ -269,75 +426,160 @@ async def websocket_endpoint(websocket: WebSocket):
     audio_queue = asyncio.Queue()
     transcription_task = None
     response_stream = None # Initialize here for finally block
+    # Pipelines started for injected transcripts; cancelled on disconnect
+    injection_tasks = set()
+
+    # Each connection is a session for usage accounting. Tasks created below
+    # inherit the context variable, so agent calls are attributed to it.
+    session_id = uuid.uuid4().hex
+    # Agent pipelines for this session; cancelled on disconnect
+    session_work = SessionWork(session_id)
+    current_session_id.set(session_id)
+    usage_tracker.start_session(session_id)
+    insight_dedup.start_session(session_id)
+    # Meeting memory shared by the speech stream and injected transcripts; agents reach it through the context variable
+    memory = MeetingMemory(session_id)
+    current_meeting_memory.set(memory)
+    logger.info(f">>> websocket_endpoint: Started session {session_id}")
 
     try:
+        # A connection that arrives during a cold start waits for warm-up instead of failing
+        if warmup_task and not warmup_task.done():
+            logger.info(">>> websocket_endpoint: Waiting for warm-up to finish")
+            try:
+                await asyncio.wait_for(asyncio.shield(warmup_task), timeout=WARMUP_WAIT_SECONDS)
+            except asyncio.TimeoutError:
+                logger.error(f"Warm-up did not finish within {WARMUP_WAIT_SECONDS}s")
+
         # Log client status on connection for debugging
         logger.info(f"Speech client ready: {bool(speech_client)}")
-        logger.info(f"Gemini model ready: {bool(gemini_model)}")
+        logger.info(f"LLM provider ready: {llm_client.active_provider}")
 
         # Critical check: Ensure backend clients are ready before proceeding
-        if not speech_client or not gemini_model:
-            logger.error("Backend clients (Speech or Gemini) not ready during connection.")
+        if (SPEECH_ENABLED and not speech_client) or not llm_client.active_provider:
+            logger.error("Backend clients (Speech or LLM) not ready during connection.")
             await websocket.send_text(json.dumps({"type": "error", "message": "Backend AI/Speech services not ready. Please try again later."}))
             # Use code 1011 for internal server error
             await websocket.close(code=1011)
             manager.disconnect(websocket) # Ensure disconnect from manager
             return
 
-        logger.info(">>> websocket_endpoint: Creating audio request generator")
-        request_generator = audio_request_generator(audio_queue)
+        if speech_client:
+            logger.info(">>> websocket_endpoint: Creating audio request generator")
+            request_generator = audio_request_generator(audio_queue)
 
-        logger.info(">>> websocket_endpoint: Starting streaming_recognize")
-        # Make the API call
-        response_stream = await speech_client.streaming_recognize(requests=request_generator)
-        logger.info(">>> websocket_endpoint: streaming_recognize call returned, stream active.")
+            logger.info(">>> websocket_endpoint: Starting streaming_recognize")
+            # Make the API call
+            response_stream = await speech_client.streaming_recognize(requests=request_generator)
+            logger.info(">>> websocket_endpoint: streaming_recognize call returned, stream active.")
 
-        logger.info(">>> websocket_endpoint: Creating transcription task")
-        # Pass websocket only if handle_transcript_response needs it directly
-        transcription_task = asyncio.create_task(handle_transcript_response(response_stream, websocket))
-        logger.info(">>> websocket_endpoint: Transcription task created")
+            logger.info(">>> websocket_endpoint: Creating transcription task")
+            # Pass websocket only if handle_transcript_response needs it directly
+            transcription_task = asyncio.create_task(handle_transcript_response(response_stream, websocket, memory, session_work))
+            logger.info(">>> websocket_endpoint: Transcription task created")
+        else:
+            logger.info(">>> websocket_endpoint: Speech disabled, text transcripts only")
 
-        # --- Receive Audio Loop ---
+        # --- Receive Loop ---
         while True:
-            # Handle both binary audio data and text messages
+            # Audio arrives as binary frames, control messages as JSON text frames
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+
+            audio_data = message.get("bytes")
+            if audio_data is not None:
+                # Ignore empty packets and audio when speech is disabled
+                if audio_data and speech_client:
+                    await audio_queue.put(audio_data)
+                continue
+
+            message_data = message.get("text")
+            if message_data is None:
+                continue
             try:
-                # Try to receive as bytes first (audio data)
-                audio_data = await websocket.receive_bytes()
-                # Handle potential empty messages if necessary
-                if not audio_data:
-                    # logger.debug("Received empty audio data packet.")
-                    continue
-                await audio_queue.put(audio_data)
-            except WebSocketDisconnect:
-                # WebSocket disconnected
-                raise
-            except Exception as e:
-                # This could be a text message - try to receive as text
+                logger.info(f"Received text message: {message_data[:100]}...")
+                
+                # Parse the message
                 try:
-                    message_data = await websocket.receive_text()
-                    logger.info(f"Received text message: {message_data[:100]}...")
+                    message_json = json.loads(message_data)
+                    message_type = message_json.get("type")
                     
-                    # Parse the message
-                    try:
-                        message_json = json.loads(message_data)
-                        message_type = message_json.get("type")
+                    # Handle create_agent message
+                    if message_type == "create_agent":
+                        config = message_json.get("config", {})
+                        agent_name = config.get("name", "Custom Agent")
+                        agent_goal = config.get("goal", "")
+                        agent_prompt = config.get("prompt", "")
+                        agent_icon = config.get("icon", "fa-brain")
+                        agent_triggers = config.get("triggers", [])
+                        agent_model = config.get("model", "")  # Optional model specification
+                        agent_knowledge_dir = config.get("knowledge_dir", "")  # Optional directory under knowledge_base/
+                        
+                        logger.info(f"Creating custom agent: {agent_name}")
+                        
+                        # Create agent config
+                        agent_config = {
+                            "name": agent_name,
+                            "goal": agent_goal,
+                            "prompt": agent_prompt,
+                            "icon": agent_icon,
+                            "type": "custom",
+                            "triggers": agent_triggers
+                        }
+                        
+                        # Add model preference if specified
+                        if agent_model:
+                            agent_config["model"] = agent_model
+                            logger.info(f"Agent '{agent_name}' will use model: {agent_model}")
+
+                        # Attach a knowledge base and start indexing it now, before the agent's first call
+                        knowledge_base = knowledge_store.get(agent_knowledge_dir) if agent_knowledge_dir else None
+                        if knowledge_base:
+                            agent_config["knowledge_dir"] = agent_knowledge_dir
+                            knowledge_store.schedule_refresh(knowledge_base)
+                        
+                        # Swap in a catalog with the agent and persist it (off the event loop)
+                        agent_catalog.create(agent_config)
+                        await store.save_agent(agent_config)
                         
-                        # Handle create_agent message
-                        if message_type == "create_agent":
-                            config = message_json.get("config", {})
-                            agent_name = config.get("name", "Custom Agent")
-                            agent_goal = config.get("goal", "")
-                            agent_prompt = config.get("prompt", "")
-                            agent_icon = config.get("icon", "fa-brain")
-                            agent_triggers = config.get("triggers", [])
-                            agent_model = config.get("model", "")  # Optional model specification
-                            
-                            logger.info(f"Creating custom agent: {agent_name}")
-                            
-                            # Add agent to CUSTOM_AGENTS list in traffic_cop
-                            from traffic_cop import CUSTOM_AGENTS
-                            
-                            # Create agent config
+                        # Send confirmation
+                        await websocket.send_text(json.dumps({
+                            "type": "system_message",
+                            "message": f"Custom agent '{agent_name}' created successfully"
+                        }))
+                        
+                        logger.info(f"Custom agent created: {agent_name} with {len(agent_triggers)} triggers")
+                        
+                    # Handle inject_transcript message: a text segment treated as a final
+                    # transcript, for text-only clients and offline load tests
+                    elif message_type == "inject_transcript":
+                        transcript_text = str(message_json.get("text", "")).strip()
+                        if transcript_text:
+                            task = asyncio.create_task(process_final_transcript(
+                                transcript_text, memory, session_work, time.monotonic()
+                            ))
+                            injection_tasks.add(task)
+                            task.add_done_callback(injection_tasks.discard)
+                        else:
+                            logger.warning("Received inject_transcript message without text")
+
+                    elif message_type == "update_agent":
+                        old_name = message_json.get("old_name", "")
+                        config = message_json.get("config", {})
+                        agent_name = config.get("name", "Custom Agent")
+                        agent_goal = config.get("goal", "")
+                        agent_prompt = config.get("prompt", "")
+                        agent_icon = config.get("icon", "fa-brain")
+                        agent_triggers = config.get("triggers", [])
+                        agent_model = config.get("model", "")  # Optional model specification
+                        agent_knowledge_dir = config.get("knowledge_dir", "")  # Optional directory under knowledge_base/
+                        
+                        logger.info(f"Updating custom agent: {old_name} -> {agent_name}")
+                        
+                        # Find the agent by name
+                        if agent_catalog.snapshot.get(old_name) is not None:
+                            # Create updated agent config
                             agent_config = {
                                 "name": agent_name,
                                 "goal": agent_goal,
@@ -351,428 +593,355 @@ async def websocket_endpoint(websocket: WebSocket):
                             if agent_model:
                                 agent_config["model"] = agent_model
                                 logger.info(f"Agent '{agent_name}' will use model: {agent_model}")
+
+                            # Attach a knowledge base and start indexing it now, before the agent's next call
+                            knowledge_base = knowledge_store.get(agent_knowledge_dir) if agent_knowledge_dir else None
+                            if knowledge_base:
+                                agent_config["knowledge_dir"] = agent_knowledge_dir
+                                knowledge_store.schedule_refresh(knowledge_base)
                             
-                            # Add to global list and persist to disk
-                            CUSTOM_AGENTS.append(agent_config)
+                            # Swap in a catalog with the updated agent and persist it (off the event loop)
+                            agent_catalog.update(old_name, agent_config)
+                            await store.save_agent(agent_config, old_name=old_name)
                             
-                            # Save to file
-                            from traffic_cop import save_custom_agents
-                            save_custom_agents()
+                            # Send confirmation
+                            await websocket.send_text(json.dumps({
+                                "type": "system_message",
+                                "message": f"Custom agent updated: {old_name} -> {agent_name}"
+                            }))
+                            
+                            logger.info(f"Custom agent updated: {old_name} -> {agent_name}")
+                        else:
+                            # Agent not found
+                            await websocket.send_text(json.dumps({
+                                "type": "system_message",
+                                "message": f"Error: Agent '{old_name}' not found"
+                            }))
+                            
+                            logger.warning(f"Failed to update agent: {old_name} not found")
+                            
+                    elif message_type == "delete_agent":
+                        agent_name = message_json.get("name", "")
+                        
+                        logger.info(f"Deleting custom agent: {agent_name}")
+                        
+                        # Swap in a catalog without the agent
+                        if agent_catalog.delete(agent_name):
+                            # Persist the deletion (off the event loop)
+                            await store.delete_agent(agent_name)
                             
                             # Send confirmation
                             await websocket.send_text(json.dumps({
                                 "type": "system_message",
-                                "message": f"Custom agent '{agent_name}' created successfully"
+                                "message": f"Custom agent '{agent_name}' deleted successfully"
+                            }))
+                            
+                            logger.info(f"Custom agent deleted: {agent_name}")
+                        else:
+                            # Agent not found
+                            await websocket.send_text(json.dumps({
+                                "type": "system_message",
+                                "message": f"Error: Agent '{agent_name}' not found"
                             }))
                             
-                            logger.info(f"Custom agent created: {agent_name} with {len(agent_triggers)} triggers")
-                            
-                        elif message_type == "update_agent":
-                            old_name = message_json.get("old_name", "")
-                            config = message_json.get("config", {})
-                            agent_name = config.get("name", "Custom Agent")
-                            agent_goal = config.get("goal", "")
-                            agent_prompt = config.get("prompt", "")
-                            agent_icon = config.get("icon", "fa-brain")
-                            agent_triggers = config.get("triggers", [])
-                            agent_model = config.get("model", "")  # Optional model specification
-                            
-                            logger.info(f"Updating custom agent: {old_name} -> {agent_name}")
-                            
-                            # Add agent to CUSTOM_AGENTS list in traffic_cop
-                            from traffic_cop import CUSTOM_AGENTS
-                            
-                            # Find the agent by name
-                            agent_index = -1
-                            for i, agent in enumerate(CUSTOM_AGENTS):
-                                if agent.get("name") == old_name:
-                                    agent_index = i
-                                    break
-                            
-                            if agent_index >= 0:
-                                # Create updated agent config
-                                agent_config = {
-                                    "name": agent_name,
-                                    "goal": agent_goal,
-                                    "prompt": agent_prompt,
-                                    "icon": agent_icon,
-                                    "type": "custom",
-                                    "triggers": agent_triggers
+                            logger.warning(f"Failed to delete agent: {agent_name} not found")
+                    else:
+                        # Handle get_available_models request
+                        if message_type == "get_available_models":
+                            # Get available models from the LLM client
+                            available_models = llm_client.available_models()
+                            active_provider = llm_client.active_provider
+                            active_model = llm_client.active_model_name
+                            
+                            # Send response with available models
+                            await websocket.send_text(json.dumps({
+                                "type": "available_models",
+                                "data": {
+                                    "models": available_models,
+                                    "active_provider": str(active_provider) if active_provider else None,
+                                    "active_model": active_model
                                 }
-                                
-                                # Add model preference if specified
-                                if agent_model:
-                                    agent_config["model"] = agent_model
-                                    logger.info(f"Agent '{agent_name}' will use model: {agent_model}")
-                                
-                                # Update in the list
-                                CUSTOM_AGENTS[agent_index] = agent_config
-                                
-                                # Save to file
-                                from traffic_cop import save_custom_agents
-                                save_custom_agents()
-                                
-                                # Send confirmation
-                                await websocket.send_text(json.dumps({
-                                    "type": "system_message",
-                                    "message": f"Custom agent updated: {old_name} -> {agent_name}"
-                                }))
-                                
-                                logger.info(f"Custom agent updated: {old_name} -> {agent_name}")
-                            else:
-                                # Agent not found
-                                await websocket.send_text(json.dumps({
-                                    "type": "system_message",
-                                    "message": f"Error: Agent '{old_name}' not found"
-                                }))
-                                
-                                logger.warning(f"Failed to update agent: {old_name} not found")
-                                
-                        elif message_type == "delete_agent":
-                            agent_name = message_json.get("name", "")
-                            
-                            logger.info(f"Deleting custom agent: {agent_name}")
-                            
-                            # Remove from CUSTOM_AGENTS list in traffic_cop
-                            from traffic_cop import CUSTOM_AGENTS
-                            
-                            # Find and remove the agent by name
-                            agent_found = False
-                            for i, agent in enumerate(CUSTOM_AGENTS):
-                                if agent.get("name") == agent_name:
-                                    CUSTOM_AGENTS.pop(i)
-                                    agent_found = True
-                                    break
-                            
-                            if agent_found:
-                                # Save to file
-                                from traffic_cop import save_custom_agents
-                                save_custom_agents()
-                                
-                                # Send confirmation
-                                await websocket.send_text(json.dumps({
-                                    "type": "system_message",
-                                    "message": f"Custom agent '{agent_name}' deleted successfully"
-                                }))
-                                
-                                logger.info(f"Custom agent deleted: {agent_name}")
-                            else:
-                                # Agent not found
+                            }))
+                            logger.info("Sent available models to client")
+                        
+                        # Handle get_usage_stats request
+                        elif message_type == "get_usage_stats":
+                            await websocket.send_text(json.dumps({
+                                "type": "usage_stats",
+                                "data": {
+                                    "session": usage_tracker.snapshot(session_id),
+                                    "global": usage_tracker.snapshot()
+                                }
+                            }))
+                            logger.info(f"Sent usage stats for session {session_id}")
+                        
+                        # Handle set_model message for changing the active LLM
+                        elif message_type == "set_model":
+                            model_provider = message_json.get("provider", "").lower()
+                            model_name = message_json.get("model", "")
+                            
+                            if model_provider == "auto":
+                                # Let rolling latency/error stats pick the model for each tier
+                                llm_client.set_auto_select(True)
                                 await websocket.send_text(json.dumps({
                                     "type": "system_message",
-                                    "message": f"Error: Agent '{agent_name}' not found"
-                                }))
-                                
-                                logger.warning(f"Failed to delete agent: {agent_name} not found")
-                        else:
-                            # Handle get_available_models request
-                            if message_type == "get_available_models":
-                                # Get available models from the LLM client
-                                available_models = llm_client.available_models()
-                                active_provider = llm_client.active_provider
-                                active_model = llm_client.active_model_name
-                                
-                                # Send response with available models
-                                await websocket.send_text(json.dumps({
-                                    "type": "available_models",
-                                    "data": {
-                                        "models": available_models,
-                                        "active_provider": str(active_provider) if active_provider else None,
-                                        "active_model": active_model
-                                    }
+                                    "message": "Automatic model selection enabled: the fastest healthy model is used for each agent"
                                 }))
-                                logger.info(f"Sent available models to client")
                             
-                            # Handle set_model message for changing the active LLM
-                            elif message_type == "set_model":
-                                model_provider = message_json.get("provider", "").lower()
-                                model_name = message_json.get("model", "")
-                                
-                                if model_provider == "claude":
-                                    # Set Claude as active model
-                                    if llm_client.claude_client:
-                                        success = llm_client.set_active_provider(ModelProvider.CLAUDE, model_name)
-                                        if success:
-                                            await websocket.send_text(json.dumps({
-                                                "type": "system_message",
-                                                "message": f"Active model set to Claude: {llm_client.active_model_name}"
-                                            }))
-                                            logger.info(f"Changed active model to Claude: {llm_client.active_model_name}")
-                                        else:
-                                            await websocket.send_text(json.dumps({
-                                                "type": "system_message",
-                                                "message": "Failed to set Claude as active model"
-                                            }))
-                                    else:
+                            elif model_provider == "claude":
+                                # Set Claude as active model
+                                if llm_client.is_provider_available(ModelProvider.CLAUDE):
+                                    success = llm_client.set_active_provider(ModelProvider.CLAUDE, model_name)
+                                    if success:
+                                        # A manual choice turns automatic selection off
+                                        llm_client.set_auto_select(False)
                                         await websocket.send_text(json.dumps({
                                             "type": "system_message",
-                                            "message": "Claude is not available. Check your API key configuration."
+                                            "message": f"Active model set to Claude: {llm_client.active_model_name}"
                                         }))
-                                        
-                                elif model_provider == "gemini":
-                                    # Set Gemini as active model
-                                    if llm_client.gemini_model:
-                                        success = llm_client.set_active_provider(ModelProvider.GEMINI, model_name)
-                                        if success:
-                                            await websocket.send_text(json.dumps({
-                                                "type": "system_message",
-                                                "message": f"Active model set to Gemini: {llm_client.active_model_name}"
-                                            }))
-                                            logger.info(f"Changed active model to Gemini: {llm_client.active_model_name}")
-                                        else:
-                                            await websocket.send_text(json.dumps({
-                                                "type": "system_message",
-                                                "message": "Failed to set Gemini as active model"
-                                            }))
+                                        logger.info(f"Changed active model to Claude: {llm_client.active_model_name}")
                                     else:
                                         await websocket.send_text(json.dumps({
                                             "type": "system_message",
-                                            "message": "Gemini is not available. Check your Google Cloud configuration."
+                                            "message": "Failed to set Claude as active model"
                                         }))
-                                        
                                 else:
                                     await websocket.send_text(json.dumps({
                                         "type": "system_message",
-                                        "message": f"Unknown model provider: {model_provider}"
-                                    }))
-                            
-                            # Handle get_agent_prompt message to retrieve prompt from agent file
-                            elif message_type == "get_agent_prompt":
-                                agent_name = message_json.get("agent_name", "")
-                                if not agent_name:
-                                    await websocket.send_text(json.dumps({
-                                        "type": "system_message",
-                                        "message": "Error: Agent name is required"
-                                    }))
-                                    continue
-                                
-                                # Use the extract_agent_prompt utility function
-                                from utils import extract_agent_prompt
-                                result = extract_agent_prompt(agent_name)
-                                
-                                if "error" in result:
-                                    await websocket.send_text(json.dumps({
-                                        "type": "system_message",
-                                        "message": result["error"]
-                                    }))
-                                else:
-                                    # Send the prompt back to the client
-                                    await websocket.send_text(json.dumps({
-                                        "type": "agent_prompt",
-                                        "agent_name": agent_name,
-                                        "prompt": result["prompt_text"].strip(),
-                                        "is_original": True
+                                        "message": "Claude is not available. Check your API key configuration."
                                     }))
-                                    logger.info(f"Sent prompt for agent: {agent_name}")
                                     
-                            # Handle get_agent_versions message
-                            elif message_type == "get_agent_versions":
-                                agent_name = message_json.get("agent_name", "")
-                                if not agent_name:
+                            elif model_provider == "gemini":
+                                # Set Gemini as active model
+                                if llm_client.is_provider_available(ModelProvider.GEMINI):
+                                    success = llm_client.set_active_provider(ModelProvider.GEMINI, model_name)
+                                    if success:
+                                        # A manual choice turns automatic selection off
+                                        llm_client.set_auto_select(False)
+                                        await websocket.send_text(json.dumps({
+                                            "type": "system_message",
+                                            "message": f"Active model set to Gemini: {llm_client.active_model_name}"
+                                        }))
+                                        logger.info(f"Changed active model to Gemini: {llm_client.active_model_name}")
+                                    else:
+                                        await websocket.send_text(json.dumps({
+                                            "type": "system_message",
+                                            "message": "Failed to set Gemini as active model"
+                                        }))
+                                else:
                                     await websocket.send_text(json.dumps({
                                         "type": "system_message",
-                                        "message": "Error: Agent name is required"
+                                        "message": "Gemini is not available. Check your Google Cloud configuration."
                                     }))
-                                    continue
-                                
-                                # Get versions for this agent
-                                from agent_versions import get_agent_versions, extract_original_agent_prompt
-                                
-                                # Get the original prompt first
-                                original = extract_original_agent_prompt(agent_name)
-                                
-                                # Get all custom versions
-                                versions = get_agent_versions(agent_name)
-                                
-                                # Send the versions back to the client
+                                    
+                            else:
                                 await websocket.send_text(json.dumps({
-                                    "type": "agent_versions",
+                                    "type": "system_message",
+                                    "message": f"Unknown model provider: {model_provider}"
+                                }))
+                        
+                        # Handle get_agent_prompt message to retrieve an agent's current prompt
+                        elif message_type == "get_agent_prompt":
+                            agent_name = message_json.get("agent_name", "")
+                            if not agent_name:
+                                await websocket.send_text(json.dumps({
+                                    "type": "system_message",
+                                    "message": "Error: Agent name is required"
+                                }))
+                                continue
+                            
+                            # Use the extract_agent_prompt utility function
+                            from utils import extract_agent_prompt
+                            result = extract_agent_prompt(agent_name)
+                            
+                            if "error" in result:
+                                await websocket.send_text(json.dumps({
+                                    "type": "system_message",
+                                    "message": result["error"]
+                                }))
+                            else:
+                                # Send the prompt back to the client
+                                await websocket.send_text(json.dumps({
+                                    "type": "agent_prompt",
                                     "agent_name": agent_name,
-                                    "original": original,
-                                    "versions": versions
+                                    "prompt": result["prompt_text"].strip(),
+                                    "is_original": True
                                 }))
-                                logger.info(f"Sent {len(versions)} versions for agent: {agent_name}")
-                            
-                            # Handle create_agent_version message
-                            elif message_type == "create_agent_version":
-                                agent_name = message_json.get("agent_name", "")
-                                version_name = message_json.get("version_name", "")
-                                prompt_text = message_json.get("prompt_text", "")
-                                description = message_json.get("description", "")
+                                logger.info(f"Sent prompt for agent: {agent_name}")
                                 
-                                if not agent_name or not version_name or not prompt_text:
-                                    await websocket.send_text(json.dumps({
-                                        "type": "system_message",
-                                        "message": "Error: Agent name, version name, and prompt text are required"
-                                    }))
-                                    continue
-                                
-                                # Create new version
-                                from agent_versions import create_agent_version
-                                result = create_agent_version(agent_name, prompt_text, version_name, description)
-                                
-                                if "error" in result:
-                                    await websocket.send_text(json.dumps({
-                                        "type": "system_message",
-                                        "message": result["error"]
-                                    }))
-                                else:
-                                    await websocket.send_text(json.dumps({
-                                        "type": "system_message",
-                                        "message": f"Created new version '{version_name}' for agent '{agent_name}'"
-                                    }))
-                                    logger.info(f"Created new version '{version_name}' for agent '{agent_name}'")
+                        # Handle get_agent_versions message
+                        elif message_type == "get_agent_versions":
+                            agent_name = message_json.get("agent_name", "")
+                            if not agent_name:
+                                await websocket.send_text(json.dumps({
+                                    "type": "system_message",
+                                    "message": "Error: Agent name is required"
+                                }))
+                                continue
                             
-                            # Handle delete_agent_version message
-                            elif message_type == "delete_agent_version":
-                                agent_name = message_json.get("agent_name", "")
-                                version_name = message_json.get("version_name", "")
-                                
-                                if not agent_name or not version_name:
-                                    await websocket.send_text(json.dumps({
-                                        "type": "system_message",
-                                        "message": "Error: Agent name and version name are required"
-                                    }))
-                                    continue
-                                
-                                # Delete version
-                                from agent_versions import delete_agent_version
-                                result = delete_agent_version(agent_name, version_name)
-                                
-                                if "error" in result:
-                                    await websocket.send_text(json.dumps({
-                                        "type": "system_message",
-                                        "message": result["error"]
-                                    }))
-                                else:
-                                    await websocket.send_text(json.dumps({
-                                        "type": "system_message",
-                                        "message": f"Deleted version '{version_name}' of agent '{agent_name}'"
-                                    }))
-                                    logger.info(f"Deleted version '{version_name}' of agent '{agent_name}'")
+                            # Get versions for this agent
+                            from agent_versions import get_agent_versions, extract_original_agent_prompt
                             
-                            # Handle use_agent_version message
-                            elif message_type == "use_agent_version":
-                                agent_name = message_json.get("agent_name", "")
-                                version_name = message_json.get("version_name", "")
-                                text = message_json.get("text", "")
-                                
-                                if not agent_name or not text:
-                                    await websocket.send_text(json.dumps({
-                                        "type": "system_message",
-                                        "message": "Error: Agent name and text are required"
-                                    }))
-                                    continue
-                                
-                                # Create config for the agent
-                                agent_config = {
-                                    "name": agent_name,
-                                    "type": "versioned",
-                                }
-                                
-                                # Include version name if specified
-                                if version_name:
-                                    agent_config["version_name"] = version_name
-                                
-                                # Run the specified version of the agent
-                                from traffic_cop import run_dynamic_agent
+                            # Get the original prompt first
+                            original = extract_original_agent_prompt(agent_name)
+                            
+                            # Get all custom versions
+                            versions = get_agent_versions(agent_name)
+                            
+                            # Send the versions back to the client
+                            await websocket.send_text(json.dumps({
+                                "type": "agent_versions",
+                                "agent_name": agent_name,
+                                "original": original,
+                                "versions": versions
+                            }))
+                            logger.info(f"Sent {len(versions)} versions for agent: {agent_name}")
+                        
+                        # Handle create_agent_version message
+                        elif message_type == "create_agent_version":
+                            agent_name = message_json.get("agent_name", "")
+                            version_name = message_json.get("version_name", "")
+                            prompt_text = message_json.get("prompt_text", "")
+                            description = message_json.get("description", "")
+                            
+                            if not agent_name or not version_name or not prompt_text:
+                                await websocket.send_text(json.dumps({
+                                    "type": "system_message",
+                                    "message": "Error: Agent name, version name, and prompt text are required"
+                                }))
+                                continue
+                            
+                            # Create new version
+                            from agent_versions import create_agent_version
+                            result = create_agent_version(agent_name, prompt_text, version_name, description)
+                            
+                            if "error" in result:
+                                await websocket.send_text(json.dumps({
+                                    "type": "system_message",
+                                    "message": result["error"]
+                                }))
+                            else:
+                                await websocket.send_text(json.dumps({
+                                    "type": "system_message",
+                                    "message": f"Created new version '{version_name}' for agent '{agent_name}'"
+                                }))
+                                logger.info(f"Created new version '{version_name}' for agent '{agent_name}'")
+                        
+                        # Handle delete_agent_version message
+                        elif message_type == "delete_agent_version":
+                            agent_name = message_json.get("agent_name", "")
+                            version_name = message_json.get("version_name", "")
+                            
+                            if not agent_name or not version_name:
+                                await websocket.send_text(json.dumps({
+                                    "type": "system_message",
+                                    "message": "Error: Agent name and version name are required"
+                                }))
+                                continue
+                            
+                            # Delete version
+                            from agent_versions import delete_agent_version
+                            result = delete_agent_version(agent_name, version_name)
+                            
+                            if "error" in result:
+                                await websocket.send_text(json.dumps({
+                                    "type": "system_message",
+                                    "message": result["error"]
+                                }))
+                            else:
+                                await websocket.send_text(json.dumps({
+                                    "type": "system_message",
+                                    "message": f"Deleted version '{version_name}' of agent '{agent_name}'"
+                                }))
+                                logger.info(f"Deleted version '{version_name}' of agent '{agent_name}'")
+                        
+                        # Handle use_agent_version message
+                        elif message_type == "use_agent_version":
+                            agent_name = message_json.get("agent_name", "")
+                            version_name = message_json.get("version_name", "")
+                            text = message_json.get("text", "")
+                            
+                            if not agent_name or not text:
+                                await websocket.send_text(json.dumps({
+                                    "type": "system_message",
+                                    "message": "Error: Agent name and text are required"
+                                }))
+                                continue
+                            
+                            # Create config for the agent
+                            agent_config = {
+                                "name": agent_name,
+                                "type": "versioned",
+                            }
+                            
+                            # Include version name if specified
+                            if version_name:
+                                agent_config["version_name"] = version_name
+                            
+                            # Run the specified version of the agent; an explicit request gets queue priority
+                            from traffic_cop import run_dynamic_agent
+                            priority_token = current_call_priority.set(CallPriority.EXPLICIT)
+                            try:
                                 await run_dynamic_agent(
                                     text=text,
-                                    model=gemini_model,
+                                    model=llm_client,
                                     broadcaster=broadcast_insight,
                                     agent_config=agent_config
                                 )
-                                
+                            finally:
+                                current_call_priority.reset(priority_token)
+                            
+                            await websocket.send_text(json.dumps({
+                                "type": "system_message",
+                                "message": f"Running {agent_name} with version: {version_name or 'original'}"
+                            }))
+                            logger.info(f"Running {agent_name} with version: {version_name or 'original'}")
+                        
+                        # Handle update_agent_prompt message (legacy method)
+                        elif message_type == "update_agent_prompt":
+                            agent_name = message_json.get("agent_name", "")
+                            new_prompt = message_json.get("prompt", "")
+                            
+                            if not agent_name or not new_prompt:
                                 await websocket.send_text(json.dumps({
                                     "type": "system_message",
-                                    "message": f"Running {agent_name} with version: {version_name or 'original'}"
+                                    "message": "Error: Agent name and prompt are required"
                                 }))
-                                logger.info(f"Running {agent_name} with version: {version_name or 'original'}")
+                                continue
                             
-                            # Handle update_agent_prompt message (legacy method)
-                            elif message_type == "update_agent_prompt":
-                                agent_name = message_json.get("agent_name", "")
-                                new_prompt = message_json.get("prompt", "")
-                                
-                                if not agent_name or not new_prompt:
+                            # Swap the prompt in the in-memory prompt registry; the agent's next call uses it
+                            from agents.registry import get_agent_spec
+                            from prompt_registry import prompt_registry
+                            spec = get_agent_spec(agent_name)
+                            
+                            if spec and spec.name in prompt_registry.prompts:
+                                try:
+                                    prompt_registry.override(spec.name, new_prompt)
                                     await websocket.send_text(json.dumps({
                                         "type": "system_message",
-                                        "message": "Error: Agent name and prompt are required"
+                                        "message": f"Successfully updated prompt for {agent_name}"
                                     }))
-                                    continue
-                                
-                                # Map agent names to their file names
-                                agent_files = {
-                                    "Radical Expander": "radical_expander.py",
-                                    "Product Agent": "product_agent.py",
-                                    "Debate Agent": "debate_agent.py", 
-                                    "Skeptical Agent": "skeptical_agent.py",
-                                    "Next Step Agent": "one_small_thing_agent.py",
-                                    "Disruptor": "disruptor_agent.py"
-                                }
-                                
-                                if agent_name in agent_files:
-                                    try:
-                                        # Get the file content
-                                        file_path = os.path.join(os.path.dirname(__file__), "agents", agent_files[agent_name])
-                                        with open(file_path, "r") as f:
-                                            content = f.read()
-                                        
-                                        # Replace the prompt in the file
-                                        new_content = ""
-                                        if "direct_prompt = f\"\"\"" in content:
-                                            # Replace content between triple quotes after direct_prompt =
-                                            start_idx = content.find("direct_prompt = f\"\"\"", 0)
-                                            if start_idx > 0:
-                                                start_idx += len("direct_prompt = f\"\"\"")
-                                                end_idx = content.find("\"\"\"", start_idx)
-                                                if end_idx > start_idx:
-                                                    new_content = content[:start_idx] + new_prompt + content[end_idx:]
-                                        
-                                        # If not found with direct_prompt, try with prompt =
-                                        if not new_content and "prompt = f\"\"\"" in content:
-                                            start_idx = content.find("prompt = f\"\"\"", 0)
-                                            if start_idx > 0:
-                                                start_idx += len("prompt = f\"\"\"")
-                                                end_idx = content.find("\"\"\"", start_idx)
-                                                if end_idx > start_idx:
-                                                    new_content = content[:start_idx] + new_prompt + content[end_idx:]
-                                        
-                                        # If we successfully made a replacement, write it back
-                                        if new_content:
-                                            with open(file_path, "w") as f:
-                                                f.write(new_content)
-                                            
-                                            await websocket.send_text(json.dumps({
-                                                "type": "system_message",
-                                                "message": f"Successfully updated prompt for {agent_name}"
-                                            }))
-                                            logger.info(f"Updated prompt for agent: {agent_name}")
-                                        else:
-                                            await websocket.send_text(json.dumps({
-                                                "type": "system_message",
-                                                "message": f"Could not find prompt section in file for {agent_name}"
-                                            }))
-                                    except Exception as e:
-                                        logger.error(f"Error updating prompt for agent {agent_name}: {e}")
-                                        await websocket.send_text(json.dumps({
-                                            "type": "system_message",
-                                            "message": f"Error updating prompt for agent {agent_name}: {str(e)}"
-                                        }))
-                                else:
+                                    logger.info(f"Updated prompt for agent: {agent_name}")
+                                except ValueError as e:
+                                    logger.warning(f"Rejected prompt update for agent {agent_name}: {e}")
                                     await websocket.send_text(json.dumps({
                                         "type": "system_message",
-                                        "message": f"Agent not found or is a custom agent: {agent_name}"
+                                        "message": f"Error updating prompt for agent {agent_name}: {str(e)}"
                                     }))
                             else:
-                                logger.warning(f"Received unknown message type: {message_type}")
+                                await websocket.send_text(json.dumps({
+                                    "type": "system_message",
+                                    "message": f"Agent not found or is a custom agent: {agent_name}"
+                                }))
+                        else:
+                            logger.warning(f"Received unknown message type: {message_type}")
+                
+                except json.JSONDecodeError:
+                    logger.warning(f"Received non-JSON text message: {message_data[:100]}...")
                     
-                    except json.JSONDecodeError:
-                        logger.warning(f"Received non-JSON text message: {message_data[:100]}...")
-                        
-                except Exception as text_e:
-                    logger.error(f"Error handling message: {text_e}")
-                    # Continue the loop, don't break on message handling errors
+            except Exception as text_e:
+                logger.error(f"Error handling message: {text_e}")
+                # Continue the loop, don't break on message handling errors
 
     except WebSocketDisconnect:
         logger.info(f"Client {websocket.client} disconnected cleanly.")
@@ -794,7 +963,7 @@ async def websocket_endpoint(websocket: WebSocket):
         # Cancel the transcription task if it's still running
         if transcription_task and not transcription_task.done():
             logger.info("Cancelling transcription task...")
-            transcription_task.cancel()
+            transcription_task.cancel(CANCEL_SESSION_CLOSED)
             try:
                 # Wait briefly for cancellation to complete
                 await asyncio.wait_for(transcription_task, timeout=2.0)
@@ -807,8 +976,29 @@ async def websocket_endpoint(websocket: WebSocket):
         else:
              logger.info("Transcription task not running or already done.")
 
+        # Cancel routing still running for injected transcripts, then every agent pipeline,
+        # so closed sessions stop spending tokens and the cancellations land in their usage
+        for task in list(injection_tasks):
+            task.cancel(CANCEL_SESSION_CLOSED)
+        if injection_tasks:
+            await asyncio.wait(list(injection_tasks), timeout=2.0)
+        await session_work.cancel_all(CANCEL_SESSION_CLOSED)
+        await memory.close()
+
         # Ensure disconnection from the manager
         manager.disconnect(websocket)
+
+        # Persist this session's usage summary and the relevance gate's new outcomes
+        usage_summary = usage_tracker.end_session(session_id)
+        insight_stats = insight_dedup.end_session(session_id)
+        relevance_gate.flush()
+        # Keep the session's artifacts where the store supports it
+        if usage_summary:
+            await store.save_session(session_id, "usage", usage_summary)
+        if insight_stats:
+            await store.save_session(session_id, "insights", insight_stats)
+        if memory.summary:
+            await store.save_session(session_id, "meeting_notes", {"summary": memory.summary, "topics": memory.topics()})
         logger.info(f"Cleanup complete for {websocket.client}.")
 
 
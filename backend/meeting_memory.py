@@ -0,0 +1,213 @@
+"""
+Rolling memory of a meeting, for agents that need more than one segment.
+
+A MeetingMemory holds three bounded parts per session:
+
+- the raw tail: the most recent final segments, in a TranscriptWindow;
+- a rolling summary of everything said so far, updated in the background
+  by a fast-tier model once MEMORY_SUMMARY_MIN_CHARS of new text has
+  arrived, folding the new text into the previous summary;
+- the meeting's entities and topics, counted locally from every segment.
+
+context() renders all three within a token budget, which each agent can
+set for itself, and background() the summary and topics only. Both are
+bounded, so an agent's prompt stays the same size however long the
+meeting runs. Agents reach the memory of the session they are
+working for through current_meeting_memory.
+"""
+import os
+import re
+import time
+import asyncio
+import logging
+from collections import Counter
+from contextvars import ContextVar
+from typing import List, Optional
+
+from llm_providers import llm_client, CallPriority
+from model_registry import TASK_SUMMARY
+from knowledge_index import STOPWORDS, tokenize
+from usage_tracking import estimate_tokens
+from transcript_window import TranscriptWindow
+
+# Get the logger instance configured in main.py
+logger = logging.getLogger("main")
+
+# --- Meeting Memory Configuration ---
+# Token budget of context() when an agent does not set its own
+MEMORY_CONTEXT_TOKENS = int(os.getenv("MEMORY_CONTEXT_TOKENS", "700"))
+# Share of a context budget kept for the recent discussion, however long the background
+MEMORY_MIN_RECENT_SHARE = 0.5
+# New characters needed before the summary is updated, and its length limit
+MEMORY_SUMMARY_MIN_CHARS = int(os.getenv("MEMORY_SUMMARY_MIN_CHARS", "2000"))
+MEMORY_SUMMARY_MAX_TOKENS = int(os.getenv("MEMORY_SUMMARY_MAX_TOKENS", "300"))
+# Longest a summary update may take, and the wait before retrying a failed one
+MEMORY_SUMMARY_TIMEOUT_SECONDS = float(os.getenv("MEMORY_SUMMARY_TIMEOUT_SECONDS", "60"))
+MEMORY_SUMMARY_RETRY_SECONDS = float(os.getenv("MEMORY_SUMMARY_RETRY_SECONDS", "30"))
+# Unsummarised text kept while updates fail; older text is dropped
+MEMORY_MAX_PENDING_CHARS = 4 * MEMORY_SUMMARY_MIN_CHARS
+# Entities and topics listed in an agent's context
+MEMORY_MAX_TOPICS = int(os.getenv("MEMORY_MAX_TOPICS", "12"))
+# Add the summary and topics to every card agent's prompt (the Debate Agent always gets the full context)
+MEETING_MEMORY_FOR_AGENTS = os.getenv("MEETING_MEMORY_FOR_AGENTS", "1") != "0"
+
+# Appended to card prompts when the meeting has a summary or topics
+MEETING_MEMORY_PROMPT_SECTION = "\n\nMEETING BACKGROUND (earlier in this meeting; for context only, respond to the transcript above):\n{background}"
+
+# Runs of capitalised words are taken as named entities (see extract_entities)
+ENTITY_PATTERN = re.compile(r"\b[A-Z][a-zA-Z0-9&]*(?:\s+[A-Z][a-zA-Z0-9&]*)*")
+
+# The meeting memory of the session the current task is working for
+current_meeting_memory: ContextVar[Optional["MeetingMemory"]] = ContextVar("current_meeting_memory", default=None)
+
+
+def extract_entities(text: str) -> List[str]:
+    """
+    Named entities in a segment: runs of capitalised words.
+
+    A leading stopword ("The", "We") is dropped, and a single capitalised
+    word at the start of a sentence is ignored, as it is usually just the
+    sentence's first word.
+    """
+    entities = []
+    for match in ENTITY_PATTERN.finditer(text):
+        words = match.group().split()
+        if words[0].lower() in STOPWORDS:
+            words = words[1:]
+        elif len(words) == 1 and text[:match.start()].rstrip()[-1:] in ("", ".", "!", "?"):
+            continue
+        if words:
+            entities.append(" ".join(words))
+    return entities
+
+
+def build_summary_prompt(summary: str, new_text: str) -> str:
+    return f"""You maintain the running notes of a business meeting. Update the notes with the new part of the transcript.
+
+CURRENT NOTES:
+{summary or "(none yet - this is the start of the meeting)"}
+
+NEW TRANSCRIPT:
+"{new_text}"
+
+Rewrite the notes so they cover the whole meeting so far: the goals, the main points and positions, decisions, open questions and action items. Keep what still matters from the current notes, merge in the new transcript and drop detail that no longer matters. Write plain sentences, at most {MEMORY_SUMMARY_MAX_TOKENS * 3 // 5} words, with no headings or preamble."""
+
+
+class MeetingMemory:
+    """Raw tail, rolling summary and topic list of one session's meeting."""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.window = TranscriptWindow()
+        self.summary = ""
+        # Segments said since the last summary update
+        self.pending: List[str] = []
+        self.pending_chars = 0
+        self.segments = 0
+        self.summary_updates = 0
+        self.entities = Counter()
+        self.keywords = Counter()
+        self._summary_task: Optional[asyncio.Task] = None
+        self._retry_after = 0.0
+
+    def add(self, segment: str):
+        """Record a final segment, and start a summary update once enough new text has arrived."""
+        segment = segment.strip()
+        if not segment:
+            return
+        self.segments += 1
+        self.window.append(segment)
+        self.pending.append(segment)
+        self.pending_chars += len(segment) + 1
+        self.entities.update(extract_entities(segment))
+        self.keywords.update(token for token in tokenize(segment) if len(token) > 3 and not token.isdigit())
+        while len(self.pending) > 1 and self.pending_chars > MEMORY_MAX_PENDING_CHARS:
+            self.pending_chars -= len(self.pending.pop(0)) + 1
+        if (self.pending_chars >= MEMORY_SUMMARY_MIN_CHARS and time.monotonic() >= self._retry_after
+                and (self._summary_task is None or self._summary_task.done())):
+            self._summary_task = asyncio.create_task(self._update_summary())
+
+    async def _update_summary(self):
+        pending, self.pending = self.pending, []
+        pending_chars, self.pending_chars = self.pending_chars, 0
+        start_time = time.perf_counter()
+        try:
+            model_config = llm_client.model_config_for(
+                TASK_SUMMARY, agent_name="Meeting Memory", temperature=0.2, max_tokens=MEMORY_SUMMARY_MAX_TOKENS
+            )
+            model_response = await llm_client.generate_content(
+                build_summary_prompt(self.summary, " ".join(pending)),
+                model_config,
+                agent_name="Meeting Memory",
+                priority=CallPriority.AUTO,
+                deadline=time.monotonic() + MEMORY_SUMMARY_TIMEOUT_SECONDS,
+            )
+            summary = (model_response.text or "").strip()
+            if model_response.finish_reason in ("SAFETY", "BLOCKED") or not summary:
+                raise ValueError(f"no summary returned (finish reason {model_response.finish_reason})")
+            self.summary = summary
+            self.summary_updates += 1
+            logger.info(f"Session {self.session_id}: meeting summary updated with {pending_chars} new characters "
+                        f"in {time.perf_counter() - start_time:.1f}s")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Keep the text for the next attempt, after a pause
+            logger.warning(f"Session {self.session_id}: meeting summary update failed: {e}")
+            self.pending = pending + self.pending
+            self.pending_chars += pending_chars
+            self._retry_after = time.monotonic() + MEMORY_SUMMARY_RETRY_SECONDS
+
+    def topics(self, limit: int = MEMORY_MAX_TOPICS) -> List[str]:
+        """The most mentioned entities, then keywords, most frequent first."""
+        topics = [entity for entity, count in self.entities.most_common(limit) if count > 1]
+        covered = {word for topic in topics for word in tokenize(topic)}
+        for keyword, count in self.keywords.most_common(limit * 2):
+            if len(topics) >= limit:
+                break
+            if count > 1 and keyword not in covered:
+                topics.append(keyword)
+        return topics
+
+    def recent(self, max_tokens: int = MEMORY_CONTEXT_TOKENS) -> str:
+        """The most recent discussion verbatim, within max_tokens."""
+        return self.window.last_tokens(max_tokens)
+
+    def background(self) -> str:
+        """Summary and topics, for agents that already see the current segment; empty early in a meeting."""
+        sections = []
+        if self.summary:
+            sections.append(f"Summary so far: {self.summary}")
+        topics = self.topics()
+        if topics:
+            sections.append(f"Key topics: {', '.join(topics)}")
+        return "\n".join(sections)
+
+    def context(self, max_tokens: Optional[int] = None) -> str:
+        """
+        Meeting-wide context: summary, topics and the recent discussion verbatim.
+
+        The recent discussion gets whatever of max_tokens the background
+        leaves, but never less than MEMORY_MIN_RECENT_SHARE of it.
+        """
+        max_tokens = max_tokens or MEMORY_CONTEXT_TOKENS
+        background = self.background()
+        if not background:
+            return self.recent(max_tokens)
+        recent_tokens = max(max_tokens - estimate_tokens(background), int(max_tokens * MEMORY_MIN_RECENT_SHARE))
+        return f"{background}\n\nRecent discussion: {self.recent(recent_tokens)}"
+
+    def stats(self) -> dict:
+        return {
+            "segments": self.segments,
+            "summary_updates": self.summary_updates,
+            "pending_chars": self.pending_chars,
+            "window": self.window.stats(),
+            "context_tokens": estimate_tokens(self.context()),
+        }
+
+    async def close(self):
+        """Cancel a summary update still in flight."""
+        if self._summary_task is not None and not self._summary_task.done():
+            self._summary_task.cancel()
+            await asyncio.gather(self._summary_task, return_exceptions=True)
@@ -0,0 +1,249 @@
+"""
+Deterministic local mock LLM for the AI Meeting Assistant.
+
+Serves ModelProvider.MOCK so the whole WebSocket -> routing -> agent ->
+broadcast path can be exercised and benchmarked without network access or
+provider quota. Responses follow the formats the pipeline expects (agent
+names for routing, insight cards, JSON arrays for combined requests) and
+are derived from a hash of the prompt, so the same prompt always produces
+the same text. Latency, streaming rate and injected faults are drawn from
+a seeded random generator and configured through environment variables:
+
+    MOCK_LLM_SEED                 Seed for latency and fault sampling (default 0)
+    MOCK_LLM_LATENCY              Time-to-first-token distribution: fixed, uniform,
+                                  normal or lognormal (default lognormal)
+    MOCK_LLM_LATENCY_MS           Median time to first token in ms (default 300)
+    MOCK_LLM_LATENCY_SPREAD_MS    Spread of the distribution in ms (default 100)
+    MOCK_LLM_TOKENS_PER_SECOND    Output streaming rate (default 80, 0 = instant)
+    MOCK_LLM_CHUNK_TOKENS         Tokens per streamed chunk (default 8)
+    MOCK_LLM_RATE_LIMIT_RATE      Fraction of calls failing with a 429 (default 0)
+    MOCK_LLM_SERVER_ERROR_RATE    Fraction of calls failing with a 5xx (default 0)
+    MOCK_LLM_SAFETY_RATE          Fraction of calls blocked by safety (default 0)
+"""
+import os
+import re
+import json
+import math
+import random
+import asyncio
+import hashlib
+import logging
+from typing import AsyncIterator, Dict, List, Optional
+
+# Get the logger instance configured in main.py
+logger = logging.getLogger("main")
+
+# Prefixes shorter than this (in estimated tokens) are never cached, like Anthropic's minimum
+MOCK_CACHE_MIN_TOKENS = 1024
+
+# Prompt markers used to recognise the request type
+ROUTING_MARKER = "Which agent from the list above"
+COMBINED_MARKER = "=== OUTPUT ==="
+
+# Emojis used for mock card headlines
+CARD_EMOJIS = ["🚀", "🔮", "⚡", "📊", "🧩", "🎯", "💡", "🔧"]
+
+
+class MockProviderError(Exception):
+    """Injected provider failure. The message mirrors the real SDK errors the agents check for."""
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"{status_code} {message}")
+        self.status_code = status_code
+
+
+class MockChunk:
+    """One streamed piece of a mock response."""
+    __slots__ = ("text", "finish_reason")
+
+    def __init__(self, text: str = "", finish_reason: Optional[str] = None):
+        self.text = text
+        self.finish_reason = finish_reason
+
+
+class MockLLM:
+    """Seeded mock model that streams templated responses with simulated latency and faults."""
+
+    def __init__(
+        self,
+        seed: int = 0,
+        latency_distribution: str = "lognormal",
+        latency_ms: float = 300.0,
+        latency_spread_ms: float = 100.0,
+        tokens_per_second: float = 80.0,
+        chunk_tokens: int = 8,
+        rate_limit_rate: float = 0.0,
+        server_error_rate: float = 0.0,
+        safety_rate: float = 0.0
+    ):
+        self.latency_distribution = latency_distribution
+        self.latency_ms = latency_ms
+        self.latency_spread_ms = latency_spread_ms
+        self.tokens_per_second = tokens_per_second
+        self.chunk_tokens = max(1, chunk_tokens)
+        self.rate_limit_rate = rate_limit_rate
+        self.server_error_rate = server_error_rate
+        self.safety_rate = safety_rate
+        self._rng = random.Random(seed)
+        # Prefix hashes seen so far, to simulate provider-side prompt cache hits
+        self._cached_prefixes = set()
+
+    @classmethod
+    def from_env(cls) -> "MockLLM":
+        """Build a mock model from MOCK_LLM_* environment variables."""
+        return cls(
+            seed=int(os.getenv("MOCK_LLM_SEED", "0")),
+            latency_distribution=os.getenv("MOCK_LLM_LATENCY", "lognormal").lower(),
+            latency_ms=float(os.getenv("MOCK_LLM_LATENCY_MS", "300")),
+            latency_spread_ms=float(os.getenv("MOCK_LLM_LATENCY_SPREAD_MS", "100")),
+            tokens_per_second=float(os.getenv("MOCK_LLM_TOKENS_PER_SECOND", "80")),
+            chunk_tokens=int(os.getenv("MOCK_LLM_CHUNK_TOKENS", "8")),
+            rate_limit_rate=float(os.getenv("MOCK_LLM_RATE_LIMIT_RATE", "0")),
+            server_error_rate=float(os.getenv("MOCK_LLM_SERVER_ERROR_RATE", "0")),
+            safety_rate=float(os.getenv("MOCK_LLM_SAFETY_RATE", "0"))
+        )
+
+    # --- Sampling ---
+    def sample_latency_ms(self) -> float:
+        """Draw a time-to-first-token from the configured distribution."""
+        median, spread = self.latency_ms, self.latency_spread_ms
+        if self.latency_distribution == "fixed" or spread <= 0:
+            value = median
+        elif self.latency_distribution == "uniform":
+            value = self._rng.uniform(median - spread, median + spread)
+        elif self.latency_distribution == "normal":
+            value = self._rng.gauss(median, spread)
+        else:
+            # Lognormal with the given median; spread sets the typical deviation
+            sigma = math.log1p(spread / median) if median > 0 else 0.0
+            value = self._rng.lognormvariate(math.log(max(median, 1e-3)), sigma)
+        return max(0.0, value)
+
+    def _sample_fault(self) -> Optional[str]:
+        """Return "rate_limit", "server_error", "safety" or None for this call."""
+        roll = self._rng.random()
+        if roll < self.rate_limit_rate:
+            return "rate_limit"
+        roll -= self.rate_limit_rate
+        if roll < self.server_error_rate:
+            return "server_error"
+        roll -= self.server_error_rate
+        if roll < self.safety_rate:
+            return "safety"
+        return None
+
+    # --- Response Templates ---
+    @staticmethod
+    def _pick(options: List[str], digest: bytes, offset: int = 0) -> str:
+        return options[digest[offset % len(digest)] % len(options)]
+
+    def _card(self, digest: bytes, offset: int = 0) -> str:
+        emoji = self._pick(CARD_EMOJIS, digest, offset)
+        return (
+            f"{emoji} Teams That Share One Live Plan Ship Faster\n\n"
+            f"{emoji} A single shared planning surface removes the weekly status meeting entirely.\n\n"
+            "**Detailed Analysis:**\n"
+            "- Observation: the discussion points to duplicated coordination work.\n"
+            "- Opportunity: replace status updates with a continuously updated plan.\n"
+            "- First step: pilot it with one team for two weeks and compare cycle time."
+        )
+
+    def render(self, prompt: str) -> str:
+        """Return the deterministic response text for a prompt."""
+        digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+
+        if ROUTING_MARKER in prompt:
+            # Agent names are listed as "- Name: description" in the routing prompt
+            agents = re.findall(r"^- ([A-Z][\w ]+?):", prompt, re.MULTILINE) or ["None"]
+            return self._pick(agents + ["None"], digest)
+
+        if COMBINED_MARKER in prompt:
+            order = re.search(r"in this order: (.+)\.", prompt)
+            names = re.findall(r'"([^"]+)"', order.group(1)) if order else []
+            return json.dumps([
+                {"agent": name, "content": self._card(digest, index)}
+                for index, name in enumerate(names)
+            ], ensure_ascii=False)
+
+        return self._card(digest)
+
+    def render_structured(self, prompt: str, schema: Dict) -> str:
+        """Return a deterministic JSON object that satisfies a response schema."""
+        digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+        card_lines = self._card(digest).split("\n\n")
+        result = {}
+        strings = iter(card_lines)
+        for index, (key, spec) in enumerate(schema.get("properties", {}).items()):
+            if "enum" in spec:
+                result[key] = self._pick(spec["enum"], digest, index)
+            elif spec.get("type") == "boolean":
+                result[key] = True
+            elif spec.get("type") in ("integer", "number"):
+                result[key] = digest[index % len(digest)]
+            elif spec.get("type") == "array":
+                # Arrays of objects tagged with an enum (combined cards) get one item per enum value
+                items = spec.get("items", {})
+                tag = next((name for name, item in items.get("properties", {}).items() if "enum" in item), None)
+                result[key] = [
+                    {**json.loads(self.render_structured(f"{prompt}\n{value}", items)), tag: value}
+                    for value in items["properties"][tag]["enum"]
+                ] if tag else []
+            else:
+                # Fill string fields with successive parts of a card
+                result[key] = next(strings, "")
+        return json.dumps(result, ensure_ascii=False)
+
+    # --- Generation ---
+    async def stream(
+        self,
+        prompt: str,
+        max_tokens: int,
+        cacheable_prefix: Optional[str] = None,
+        usage: Optional[Dict[str, int]] = None,
+        response_schema: Optional[Dict] = None
+    ) -> AsyncIterator[MockChunk]:
+        """
+        Stream a mock response after a simulated time to first token.
+
+        Raises MockProviderError for injected 429/5xx faults. A safety fault
+        ends the stream with finish_reason "SAFETY" and no text. When a usage
+        dict is given it is filled with estimated token counts. With a
+        response_schema the text is a JSON object matching it.
+        """
+        fault = self._sample_fault()
+        await asyncio.sleep(self.sample_latency_ms() / 1000)
+
+        if fault == "rate_limit":
+            raise MockProviderError(429, "Resource exhausted (injected by mock provider)")
+        if fault == "server_error":
+            raise MockProviderError(503, "Service unavailable (injected by mock provider)")
+
+        full_prompt = (cacheable_prefix or "") + prompt
+        if fault == "safety":
+            text = ""
+        elif response_schema is not None:
+            text = self.render_structured(full_prompt, response_schema)
+        else:
+            text = self.render(full_prompt)
+        words = text.split(" ") if text else []
+        finish_reason = "SAFETY" if fault == "safety" else "STOP"
+        # Roughly one token per word; truncate to the requested budget like a real model
+        if len(words) > max_tokens:
+            words = words[:max_tokens]
+            finish_reason = "MAX_TOKENS"
+
+        if usage is not None:
+            usage["input_tokens"] = len(full_prompt) // 4
+            usage["output_tokens"] = len(words)
+            if cacheable_prefix and len(cacheable_prefix) // 4 >= MOCK_CACHE_MIN_TOKENS:
+                prefix_hash = hashlib.sha256(cacheable_prefix.encode("utf-8")).hexdigest()
+                if prefix_hash in self._cached_prefixes:
+                    usage["cached_input_tokens"] = len(cacheable_prefix) // 4
+                self._cached_prefixes.add(prefix_hash)
+
+        delay = self.chunk_tokens / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+        for start in range(0, len(words), self.chunk_tokens):
+            if start:
+                await asyncio.sleep(delay)
+            chunk = " ".join(words[start:start + self.chunk_tokens])
+            yield MockChunk(chunk if start == 0 else " " + chunk)
+        yield MockChunk(finish_reason=finish_reason)
@@ -0,0 +1,193 @@
+"""
+Model registry and selection policy for the AI Meeting Assistant.
+
+Describes every model we know how to call (provider, tier, latency class,
+context size and price) and maps tasks and individual agents to tiers, so
+a 50-token routing decision can run on a Flash/Haiku-class model while
+long-form agents get a large one.
+"""
+import os
+import re
+import json
+import logging
+from enum import Enum
+from typing import Dict, List, Optional, Tuple
+
+# Get the logger instance configured in main.py
+logger = logging.getLogger("main")
+
+class ModelTier(str, Enum):
+    """Capability/cost tiers a task or agent can ask for."""
+    FAST = "fast"          # Flash/Haiku/mini-class: routing, classification, summaries
+    STANDARD = "standard"  # Sonnet/Pro-class: regular insight cards
+    LARGE = "large"        # Largest models: long-form, knowledge-heavy agents
+
+class LatencyClass(str, Enum):
+    """Rough expected latency of a model."""
+    LOW = "low"
+    MEDIUM = "medium"
+    HIGH = "high"
+
+class ModelSpec:
+    """Static description of a model."""
+    def __init__(
+        self,
+        provider: str,
+        name: str,
+        tier: ModelTier,
+        latency_class: LatencyClass,
+        context_window: int,
+        input_price: float,
+        output_price: float,
+        cached_input_price: float
+    ):
+        self.provider = provider
+        self.name = name
+        self.tier = tier
+        self.latency_class = latency_class
+        self.context_window = context_window
+        # USD per 1M tokens
+        self.input_price = input_price
+        self.output_price = output_price
+        self.cached_input_price = cached_input_price
+
+    def to_dict(self) -> Dict:
+        return {
+            "provider": self.provider,
+            "name": self.name,
+            "tier": self.tier.value,
+            "latency_class": self.latency_class.value,
+            "context_window": self.context_window,
+            "input_price": self.input_price,
+            "output_price": self.output_price,
+            "cached_input_price": self.cached_input_price,
+        }
+
+# Providers are plain strings here (matching ModelProvider values) so this
+# module has no dependency on the provider SDKs.
+MODEL_REGISTRY: Dict[str, ModelSpec] = {spec.name: spec for spec in [
+    # Gemini
+    ModelSpec("gemini", "gemini-1.5-flash-002", ModelTier.FAST, LatencyClass.LOW, 1_048_576, 0.075, 0.30, 0.01875),
+    ModelSpec("gemini", "gemini-1.5-pro-002", ModelTier.LARGE, LatencyClass.MEDIUM, 2_097_152, 1.25, 5.00, 0.3125),
+    # Claude
+    ModelSpec("claude", "claude-3-5-haiku-20241022", ModelTier.FAST, LatencyClass.LOW, 200_000, 0.80, 4.00, 0.08),
+    ModelSpec("claude", "claude-3-7-sonnet-20250219", ModelTier.STANDARD, LatencyClass.MEDIUM, 200_000, 3.00, 15.00, 0.30),
+    ModelSpec("claude", "claude-3-5-sonnet-20240620", ModelTier.STANDARD, LatencyClass.MEDIUM, 200_000, 3.00, 15.00, 0.30),
+    ModelSpec("claude", "claude-3-opus-20240229", ModelTier.LARGE, LatencyClass.HIGH, 200_000, 15.00, 75.00, 1.50),
+    # OpenAI
+    ModelSpec("openai", "gpt-4o-mini", ModelTier.FAST, LatencyClass.LOW, 128_000, 0.15, 0.60, 0.075),
+    ModelSpec("openai", "o3-mini", ModelTier.STANDARD, LatencyClass.MEDIUM, 200_000, 1.10, 4.40, 0.55),
+    ModelSpec("openai", "gpt-4o", ModelTier.STANDARD, LatencyClass.MEDIUM, 128_000, 2.50, 10.00, 1.25),
+    ModelSpec("openai", "gpt-4-turbo", ModelTier.LARGE, LatencyClass.HIGH, 128_000, 10.00, 30.00, 10.00),
+    # Local mock (MOCK_LLM=1); free, latency set by MOCK_LLM_* variables
+    ModelSpec("mock", "mock-fast", ModelTier.FAST, LatencyClass.LOW, 1_000_000, 0.0, 0.0, 0.0),
+    ModelSpec("mock", "mock-standard", ModelTier.STANDARD, LatencyClass.LOW, 1_000_000, 0.0, 0.0, 0.0),
+    ModelSpec("mock", "mock-large", ModelTier.LARGE, LatencyClass.LOW, 1_000_000, 0.0, 0.0, 0.0),
+]}
+
+# --- Selection Policy ---
+# Tasks the runtime asks models to perform
+TASK_ROUTING = "routing"        # Traffic Cop agent choice (~50 output tokens)
+TASK_SHORT_CARD = "short_card"  # Regular insight card (300-600 output tokens)
+TASK_LONG_CARD = "long_card"    # Long-form, knowledge-heavy answer (~1000 output tokens)
+TASK_SUMMARY = "summary"        # Background meeting-memory update (~300 output tokens)
+
+TASK_TIERS: Dict[str, ModelTier] = {
+    TASK_ROUTING: ModelTier.FAST,
+    TASK_SHORT_CARD: ModelTier.STANDARD,
+    # Long cards stay on the standard tier (the default active model): the large Claude and
+    # OpenAI models cost several times as much and are slower. Opt in with TASK_MODEL_TIERS.
+    TASK_LONG_CARD: ModelTier.STANDARD,
+    TASK_SUMMARY: ModelTier.FAST,
+}
+
+# Per-agent overrides; take precedence over the task tier
+AGENT_TIERS: Dict[str, ModelTier] = {
+    "Ethan Mollick": ModelTier.STANDARD,
+}
+
+# Optional JSON overrides, e.g. AGENT_MODEL_TIERS='{"Disruptor": "large"}'
+try:
+    for _agent, _tier in json.loads(os.getenv("AGENT_MODEL_TIERS", "{}")).items():
+        AGENT_TIERS[_agent] = ModelTier(_tier)
+    for _task, _tier in json.loads(os.getenv("TASK_MODEL_TIERS", "{}")).items():
+        TASK_TIERS[_task] = ModelTier(_tier)
+except Exception as e:
+    logger.error(f"Invalid AGENT_MODEL_TIERS/TASK_MODEL_TIERS override: {e}")
+
+# When a provider has no model in the requested tier, try these next
+TIER_FALLBACKS: Dict[ModelTier, Tuple[ModelTier, ...]] = {
+    ModelTier.FAST: (ModelTier.STANDARD, ModelTier.LARGE),
+    ModelTier.STANDARD: (ModelTier.LARGE, ModelTier.FAST),
+    ModelTier.LARGE: (ModelTier.STANDARD, ModelTier.FAST),
+}
+
+# Model name prefixes used to infer the provider of unregistered models
+PROVIDER_PREFIXES = {
+    "gemini": "gemini",
+    "claude": "claude",
+    "gpt": "openai",
+    "o1": "openai",
+    "o3": "openai",
+    "mock": "mock",
+}
+
+
+def get_model_spec(model_name: str) -> Optional[ModelSpec]:
+    """Return the registry entry for a model, matching dated/aliased variants by prefix."""
+    if not model_name:
+        return None
+    spec = MODEL_REGISTRY.get(model_name)
+    if spec:
+        return spec
+    # e.g. "claude-3-7-sonnet-latest" or "gemini-1.5-pro-001" -> strip the version suffix
+    best_base, best_spec = "", None
+    for name, candidate in MODEL_REGISTRY.items():
+        for base in (name, re.sub(r"-\d{3,8}$", "", name)):
+            if (model_name.startswith(base)
+                    and (len(model_name) == len(base) or model_name[len(base)] == "-")
+                    and len(base) > len(best_base)):
+                best_base, best_spec = base, candidate
+    return best_spec
+
+
+def provider_for_model(model_name: str) -> Optional[str]:
+    """Return the provider that serves a model name, or None if unknown."""
+    spec = get_model_spec(model_name)
+    if spec:
+        return spec.provider
+    for prefix, provider in PROVIDER_PREFIXES.items():
+        if model_name and model_name.startswith(prefix):
+            return provider
+    return None
+
+
+def models_for_provider(provider: str) -> List[ModelSpec]:
+    """Return all registered models of a provider."""
+    return [spec for spec in MODEL_REGISTRY.values() if spec.provider == provider]
+
+
+def tier_for(task: str, agent_name: Optional[str] = None) -> ModelTier:
+    """Return the tier an agent (or, failing that, a task) should run on."""
+    if agent_name and agent_name in AGENT_TIERS:
+        return AGENT_TIERS[agent_name]
+    return TASK_TIERS.get(task, ModelTier.STANDARD)
+
+
+def select_model(provider: str, tier: ModelTier, active_model: Optional[str] = None) -> Optional[str]:
+    """
+    Pick a model of the given provider for a tier.
+
+    The active model (the one chosen with set_model) wins whenever it belongs
+    to the requested tier, so a manual choice is still honoured for its tier.
+    Falls back to neighbouring tiers when the provider has no model in the
+    requested one.
+    """
+    active_spec = get_model_spec(active_model)
+    for candidate_tier in (tier,) + TIER_FALLBACKS[tier]:
+        if active_spec and active_spec.provider == provider and active_spec.tier == candidate_tier:
+            return active_model
+        for spec in models_for_provider(provider):
+            if spec.tier == candidate_tier:
+                return spec.name
+    return None
@@ -0,0 +1,178 @@
+"""
+Registry of the built-in agents' prompts, with runtime overrides.
+
+Each agent module is parsed once, with ast, when the agent registry is
+built: the prompt is the f-string its prompt builder returns (or, for an
+agent with its own runner, the module's INSTRUCTIONS string), and its
+text is kept as written in the source, placeholders included, so it can
+be shown and edited. Reading a prompt is a dictionary lookup.
+
+An edited prompt is compiled like the original: its "{...}" placeholders
+must be the builder's input parameter or string constants of the agent's
+module. The compiled template replaces the agent's in the override layer
+in one assignment, so a call renders either the old prompt or the new
+one, and the next call uses the edit. Overrides live in memory only;
+agent source files are never rewritten.
+"""
+import ast
+import inspect
+import logging
+from types import ModuleType
+from typing import Dict, Iterable, Optional
+
+from prompt_templates import PromptTemplate, _CAPTURE_MARKER
+
+# Get the logger instance configured in main.py
+logger = logging.getLogger("main")
+
+# Module-level constant holding the prompt of an agent with its own runner
+RUNNER_PROMPT_CONSTANT = "INSTRUCTIONS"
+
+
+class PromptSource:
+    """The prompt of one agent as written in its module."""
+    __slots__ = ("agent_name", "module_file", "text", "parameter", "constants")
+
+    def __init__(self, agent_name: str, module_file: str, text: str, parameter: Optional[str], constants: Dict[str, str]):
+        self.agent_name = agent_name
+        self.module_file = module_file
+        # The f-string's body, e.g. 'You are ... "{text}" ... {OUTPUT_FORMAT}'
+        self.text = text
+        # The builder's input parameter; None when the prompt is built by a runner
+        self.parameter = parameter
+        # Module-level string constants the prompt may reference
+        self.constants = constants
+
+
+def find_prompt(tree: ast.Module, function_name: Optional[str]) -> Optional[ast.expr]:
+    """The f-string a prompt builder returns (or assigns), or the module's RUNNER_PROMPT_CONSTANT string."""
+    if not function_name:
+        for node in tree.body:
+            if (isinstance(node, ast.Assign) and isinstance(node.value, (ast.Constant, ast.JoinedStr))
+                    and any(isinstance(target, ast.Name) and target.id == RUNNER_PROMPT_CONSTANT
+                            for target in node.targets)):
+                return node.value
+        return None
+    scope = next((node for node in tree.body
+                  if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name == function_name), None)
+    if scope is None:
+        return None
+    for node in ast.walk(scope):
+        if isinstance(node, (ast.Assign, ast.Return)) and isinstance(node.value, ast.JoinedStr):
+            return node.value
+    return None
+
+
+def fstring_body(source: str, node: ast.expr) -> str:
+    """The text between a string's or f-string's quotes, exactly as written."""
+    segment = ast.get_source_segment(source, node)
+    prefix_length = len(segment) - len(segment.lstrip("fFrR"))
+    quote = segment[prefix_length:prefix_length + 3]
+    if quote not in ('"""', "'''"):
+        quote = segment[prefix_length]
+    return segment[prefix_length + len(quote):-len(quote)]
+
+
+def parse_prompt(agent_name: str, path: str, module: ModuleType, function_name: Optional[str]) -> Optional[PromptSource]:
+    with open(path, "r", encoding="utf-8") as f:
+        source = f.read()
+    tree = ast.parse(source, filename=path)
+    node = find_prompt(tree, function_name)
+    if node is None:
+        return None
+    parameter = None
+    if function_name:
+        function = getattr(module, function_name)
+        parameter = function.__code__.co_varnames[0] if function.__code__.co_argcount else None
+    constants = {name: value for name, value in vars(module).items()
+                 if name.isupper() and isinstance(value, str)}
+    return PromptSource(agent_name, path, fstring_body(source, node), parameter, constants)
+
+
+def compile_prompt(prompt: PromptSource, text: str) -> PromptTemplate:
+    """
+    Compile prompt text in its source form into a template with a "text" slot.
+
+    Raises ValueError for text that is not a valid f-string body, uses an
+    unknown placeholder or leaves out the input placeholder.
+    """
+    try:
+        node = ast.parse(f'f"""{text}"""', mode="eval").body
+    except SyntaxError as e:
+        raise ValueError(f"Prompt is not valid: {e.msg}") from None
+    if not isinstance(node, ast.JoinedStr):
+        raise ValueError("Prompt is not valid")
+    parts = []
+    used_input = False
+    for value in node.values:
+        if isinstance(value, ast.Constant):
+            parts.append(value.value)
+        elif (isinstance(value, ast.FormattedValue) and isinstance(value.value, ast.Name)
+              and value.conversion == -1 and value.format_spec is None):
+            name = value.value.id
+            if name == prompt.parameter:
+                parts.append(_CAPTURE_MARKER.format("text"))
+                used_input = True
+            elif name in prompt.constants:
+                parts.append(prompt.constants[name])
+            else:
+                raise ValueError(f"Unknown placeholder {{{name}}} in prompt for {prompt.agent_name}")
+        else:
+            raise ValueError(f"Placeholders in the prompt for {prompt.agent_name} must be plain names")
+    if not used_input:
+        raise ValueError(f"Prompt for {prompt.agent_name} must include {{{prompt.parameter}}}")
+    return PromptTemplate(prompt.agent_name, "".join(parts), ("text",), placeholder=_CAPTURE_MARKER)
+
+
+class PromptRegistry:
+    """Parsed prompts of the built-in agents and the runtime override layer."""
+
+    def __init__(self):
+        self.prompts: Dict[str, PromptSource] = {}
+        # agent name -> (edited text, compiled template)
+        self.overrides: Dict[str, tuple] = {}
+
+    def load(self, specs: Iterable):
+        """Parse every agent's module once; called when the agent registry is built."""
+        for spec in specs:
+            module = inspect.getmodule(spec.build_prompt or spec.runner)
+            function_name = spec.build_prompt.__name__ if spec.build_prompt else None
+            try:
+                prompt = parse_prompt(spec.name, module.__file__, module, function_name)
+            except Exception as e:
+                logger.error(f"Could not parse the prompt of {spec.name}: {e}")
+                continue
+            if prompt is not None:
+                self.prompts[spec.name] = prompt
+
+    def template_for(self, spec) -> PromptTemplate:
+        """The template an agent renders: its override if it has one, else its compiled builder."""
+        override = self.overrides.get(spec.name)
+        return override[1] if override is not None else spec.template
+
+    def original(self, agent_name: str) -> Optional[str]:
+        prompt = self.prompts.get(agent_name)
+        return prompt.text if prompt is not None else None
+
+    def current(self, agent_name: str) -> Optional[str]:
+        """The prompt an agent uses now, in source form."""
+        override = self.overrides.get(agent_name)
+        return override[0] if override is not None else self.original(agent_name)
+
+    def override(self, agent_name: str, text: str) -> PromptTemplate:
+        """
+        Replace an agent's prompt from its next call on.
+
+        Raises KeyError for agents without a parsed prompt and ValueError
+        for prompts that cannot be used (see compile_prompt).
+        """
+        prompt = self.prompts[agent_name]
+        if prompt.parameter is None:
+            raise ValueError(f"The prompt of {agent_name} is built by its runner and cannot be edited at runtime")
+        template = compile_prompt(prompt, text)
+        self.overrides[agent_name] = (text, template)
+        return template
+
+
+# Create singleton instance
+prompt_registry = PromptRegistry()
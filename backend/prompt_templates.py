@@ -0,0 +1,133 @@
+"""
+Precompiled prompt templates.
+
+A PromptTemplate is compiled once into static chunks and typed slots.
+Rendering fills the slots and joins the chunks in a single pass, so slot
+values are inserted verbatim: user text that happens to contain "{name}" is
+never substituted again. The static text ahead of the first slot is exposed
+as static_prefix, so a template that starts with long fixed instructions can
+send them as generate_content's cacheable_prefix.
+"""
+import os
+import re
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, Optional, Tuple, Union
+
+# Static prefixes shorter than this are sent inline; provider caches have a minimum
+# size (Anthropic: 1024 tokens, roughly 4 characters each)
+PROMPT_CACHE_MIN_PREFIX_CHARS = int(os.getenv("PROMPT_CACHE_MIN_PREFIX_CHARS", "4096"))
+
+# Compiled ad-hoc templates (custom agents, prompt versions) kept by compile_template
+PROMPT_TEMPLATE_CACHE_SIZE = int(os.getenv("PROMPT_TEMPLATE_CACHE_SIZE", "128"))
+
+# Marks slots while a template is captured from a prompt-building function
+_CAPTURE_MARKER = "\x00{}\x00"
+
+
+class PromptTemplate:
+    """
+    A prompt compiled into static chunks and named, typed slots.
+
+    Only "{slot}" placeholders for the declared slots are recognised; any
+    other braces in the source are ordinary text.
+    """
+    __slots__ = ("name", "slots", "static_prefix", "static_chars", "_parts", "_slot_parts", "_used")
+
+    def __init__(self, name: str, source: str, slots: Union[Dict[str, type], Iterable[str]],
+                 placeholder: str = "{{{}}}"):
+        """
+        Args:
+            name: Name used in error messages (usually the agent's)
+            source: Template text
+            slots: Slot names, or a mapping of slot name to the type its value must have
+            placeholder: Format of a slot marker in source; "{{{}}}" means "{slot}"
+        """
+        if not isinstance(slots, dict):
+            slots = {slot: str for slot in slots}
+        self.name = name
+        self.slots = dict(slots)
+        markers = {placeholder.format(slot): slot for slot in self.slots}
+        if markers:
+            pattern = re.compile("|".join(re.escape(marker) for marker in markers))
+            # Alternating static chunk, slot marker, static chunk, ...
+            pieces = pattern.split(source)
+            found = pattern.findall(source)
+        else:
+            pieces, found = [source], []
+        parts = []
+        for index, chunk in enumerate(pieces):
+            parts.append(chunk)
+            if index < len(found):
+                parts.append(markers[found[index]])
+        self._parts = parts
+        # Indices of the slot entries in _parts, with their slot names and types
+        self._slot_parts = tuple((index, parts[index], self.slots[parts[index]]) for index in range(1, len(parts), 2))
+        self._used = frozenset(slot for _, slot, _ in self._slot_parts)
+        self.static_prefix = parts[0]
+        self.static_chars = sum(len(parts[index]) for index in range(0, len(parts), 2))
+
+    @classmethod
+    def from_function(cls, name: str, build: Callable[..., str], slots: Iterable[str]) -> "PromptTemplate":
+        """
+        Compile a template from a prompt-building function.
+
+        The function is called once with a marker in place of each slot
+        (positionally, in slot order); its output becomes the template. This
+        keeps agent prompts as readable f-strings in their own modules.
+        """
+        slots = tuple(slots)
+        source = build(*(_CAPTURE_MARKER.format(slot) for slot in slots))
+        missing = [slot for slot in slots if _CAPTURE_MARKER.format(slot) not in source]
+        if missing:
+            raise ValueError(f"Prompt template '{name}' does not use slots {missing}")
+        return cls(name, source, slots, placeholder=_CAPTURE_MARKER)
+
+    def uses(self, slot: str) -> bool:
+        """Whether the template contains the slot at least once."""
+        return slot in self._used
+
+    def _filled_parts(self, values: Dict[str, object]) -> list:
+        parts = self._parts.copy()
+        try:
+            for index, slot, expected in self._slot_parts:
+                value = values[slot]
+                if expected is not str or value.__class__ is not str:
+                    value = self._check(slot, value)
+                parts[index] = value
+        except KeyError as e:
+            raise TypeError(f"Prompt template '{self.name}' is missing slot {e}") from None
+        return parts
+
+    def _check(self, slot: str, value: object) -> str:
+        expected = self.slots[slot]
+        if not isinstance(value, expected):
+            raise TypeError(f"Prompt template '{self.name}' slot '{slot}' expects "
+                            f"{expected.__name__}, got {type(value).__name__}")
+        return value if isinstance(value, str) else str(value)
+
+    def render(self, **values) -> str:
+        """Render the full prompt. Values for slots the template lacks are ignored."""
+        return "".join(self._filled_parts(values))
+
+    def render_split(self, **values) -> Tuple[str, str]:
+        """Render as (static prefix, remainder)."""
+        parts = self._filled_parts(values)
+        return parts[0], "".join(parts[1:])
+
+    def render_cacheable(self, **values) -> Tuple[Optional[str], str]:
+        """
+        Render as (cacheable_prefix, prompt) for generate_content.
+
+        The prefix is None, and the whole prompt is returned, when the static
+        prefix is too short to be worth caching provider-side.
+        """
+        prefix, remainder = self.render_split(**values)
+        if len(prefix) < PROMPT_CACHE_MIN_PREFIX_CHARS:
+            return None, prefix + remainder
+        return prefix, remainder
+
+
+@lru_cache(maxsize=PROMPT_TEMPLATE_CACHE_SIZE)
+def compile_template(source: str, slots: Tuple[str, ...], name: str = "template") -> PromptTemplate:
+    """Compile a template from runtime text (custom agents, prompt versions), reusing earlier compilations."""
+    return PromptTemplate(name, source, slots)
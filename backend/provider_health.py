@@ -0,0 +1,151 @@
+"""
+Rolling provider/model health for latency-aware model selection.
+
+Every LLM call feeds a short rolling window per provider:model with its
+latency and outcome. In auto mode UnifiedLLMClient asks HealthTracker to
+choose, among the configured models of the tier an agent needs, the one
+with the lowest recent p50 latency whose error rate is acceptable.
+Hysteresis keeps the choice stable: a healthy incumbent is only replaced
+by a clearly faster model, and not more often than every
+HEALTH_MIN_SWITCH_SECONDS.
+"""
+import os
+import time
+import logging
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from model_registry import LatencyClass, ModelSpec
+
+# Get the logger instance configured in main.py
+logger = logging.getLogger("main")
+
+# Samples kept per model, and how old a sample may be before it is ignored
+HEALTH_WINDOW_SIZE = int(os.getenv("HEALTH_WINDOW_SIZE", "50"))
+HEALTH_WINDOW_SECONDS = float(os.getenv("HEALTH_WINDOW_SECONDS", "300"))
+# Minimum samples before a model's measured latency is trusted over its prior
+HEALTH_MIN_SAMPLES = int(os.getenv("HEALTH_MIN_SAMPLES", "5"))
+# A model whose recent error rate exceeds this is unhealthy
+HEALTH_MAX_ERROR_RATE = float(os.getenv("HEALTH_MAX_ERROR_RATE", "0.25"))
+# A challenger must be this much faster (fraction of the incumbent's p50) to take over
+HEALTH_SWITCH_MARGIN = float(os.getenv("HEALTH_SWITCH_MARGIN", "0.2"))
+# Minimum time between switches for one tier, unless the incumbent is unhealthy
+HEALTH_MIN_SWITCH_SECONDS = float(os.getenv("HEALTH_MIN_SWITCH_SECONDS", "60"))
+
+# Assumed p50 latency of models without enough samples yet
+PRIOR_LATENCY_MS = {
+    LatencyClass.LOW: 1000.0,
+    LatencyClass.MEDIUM: 2500.0,
+    LatencyClass.HIGH: 5000.0,
+}
+
+
+class RollingWindow:
+    """The most recent calls of one provider:model, bounded by count and age."""
+    __slots__ = ("samples",)
+
+    def __init__(self):
+        # (timestamp, latency_ms, error)
+        self.samples = deque(maxlen=HEALTH_WINDOW_SIZE)
+
+    def add(self, latency_ms: Optional[float], error: bool):
+        self.samples.append((time.monotonic(), latency_ms, error))
+
+    def _recent(self):
+        cutoff = time.monotonic() - HEALTH_WINDOW_SECONDS
+        while self.samples and self.samples[0][0] < cutoff:
+            self.samples.popleft()
+        return self.samples
+
+    def stats(self) -> Dict[str, Any]:
+        samples = self._recent()
+        latencies = sorted(latency for _, latency, error in samples if not error and latency is not None)
+        errors = sum(1 for _, _, error in samples if error)
+
+        def percentile(pct: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(pct / 100 * len(latencies)))], 1)
+
+        return {
+            "samples": len(samples),
+            "p50_ms": percentile(50),
+            "p95_ms": percentile(95),
+            "error_rate": round(errors / len(samples), 3) if samples else 0.0,
+        }
+
+
+class HealthTracker:
+    """Rolling latency/error stats per provider:model and the auto-mode choice per tier."""
+
+    def __init__(self):
+        self.windows: Dict[str, RollingWindow] = {}
+        # tier -> (model key, time of the switch to it)
+        self.choices: Dict[str, tuple] = {}
+
+    @staticmethod
+    def _key(provider: Any, model_name: str) -> str:
+        return f"{getattr(provider, 'value', provider)}:{model_name}"
+
+    def record(self, provider: Any, model_name: str, latency_ms: Optional[float] = None, error: bool = False):
+        """Record the outcome of one call."""
+        key = self._key(provider, model_name)
+        window = self.windows.get(key)
+        if window is None:
+            window = self.windows[key] = RollingWindow()
+        window.add(latency_ms, error)
+
+    def stats(self, provider: Any, model_name: str) -> Dict[str, Any]:
+        window = self.windows.get(self._key(provider, model_name))
+        return window.stats() if window else RollingWindow().stats()
+
+    def _score(self, spec: ModelSpec) -> tuple:
+        """Return (healthy, expected p50 latency) for a model."""
+        stats = self.stats(spec.provider, spec.name)
+        healthy = stats["error_rate"] <= HEALTH_MAX_ERROR_RATE or stats["samples"] < HEALTH_MIN_SAMPLES
+        p50 = stats["p50_ms"]
+        if p50 is None or stats["samples"] < HEALTH_MIN_SAMPLES:
+            p50 = PRIOR_LATENCY_MS[spec.latency_class]
+        return healthy, p50
+
+    def choose(self, tier: str, candidates: List[ModelSpec]) -> Optional[ModelSpec]:
+        """
+        Pick the model to use for a tier from the candidates.
+
+        Returns the fastest healthy candidate, keeping the current choice
+        unless it became unhealthy, or a challenger is faster by more than
+        HEALTH_SWITCH_MARGIN and HEALTH_MIN_SWITCH_SECONDS have passed.
+        """
+        if not candidates:
+            return None
+        scores = {self._key(spec.provider, spec.name): (spec, *self._score(spec)) for spec in candidates}
+        healthy = [entry for entry in scores.values() if entry[1]] or list(scores.values())
+        best_spec, _, best_p50 = min(healthy, key=lambda entry: entry[2])
+        best_key = self._key(best_spec.provider, best_spec.name)
+
+        now = time.monotonic()
+        current_key, switched_at = self.choices.get(tier, (None, 0.0))
+        current = scores.get(current_key)
+        if current is not None and current_key != best_key:
+            current_spec, current_healthy, current_p50 = current
+            recently_switched = now - switched_at < HEALTH_MIN_SWITCH_SECONDS
+            clearly_faster = best_p50 < current_p50 * (1 - HEALTH_SWITCH_MARGIN)
+            if current_healthy and (recently_switched or not clearly_faster):
+                return current_spec
+
+        if current_key != best_key:
+            if current_key:
+                logger.info(f"Auto model selection ({tier}): switching {current_key} -> {best_key} "
+                            f"(p50 {best_p50:.0f} ms)")
+            self.choices[tier] = (best_key, now)
+        return best_spec
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "models": {key: window.stats() for key, window in self.windows.items()},
+            "auto_choices": {tier: key for tier, (key, _) in self.choices.items()},
+        }
+
+
+# Create singleton instance
+health_tracker = HealthTracker()
@@ -0,0 +1,375 @@
+"""
+Local relevance gate in front of card agents' LLM calls.
+
+Most automatically routed calls that end without a card are the agent
+answering "no context" for a segment outside its remit, and each costs a
+full request. The gate predicts that outcome locally, with one logistic
+model per agent over hashed unigram and bigram features, and skips calls
+whose predicted probability of producing a card is below
+RELEVANCE_SKIP_THRESHOLD.
+
+Models learn online from every call's outcome (a card was broadcast, or
+the agent answered with its no-context marker, an apology or an empty
+card). Outcomes are also appended to RELEVANCE_OUTCOMES_FILE so models
+can be retrained offline: python relevance_gate.py --help. An agent is
+only gated once its model has seen enough examples of both outcomes, and
+explicitly requested agents are never gated.
+
+To measure the gate, a fraction (RELEVANCE_EXPLORE_RATE) of the calls it
+would skip run anyway. Their outcomes give its precision (skipped calls
+that really had no context) and, scaled by the exploration rate, its
+recall (no-context calls it skips).
+"""
+import os
+import json
+import math
+import time
+import zlib
+import random
+import logging
+import argparse
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from knowledge_index import tokenize
+from io_executor import io_executor, JsonLinesWriter
+
+try:
+    import numpy as np
+except ImportError:  # Without NumPy the gate stays open and every call runs
+    np = None
+
+# Get the logger instance configured in main.py
+logger = logging.getLogger("main")
+
+# --- Relevance Gate Configuration ---
+RELEVANCE_GATE_ENABLED = os.getenv("RELEVANCE_GATE_ENABLED", "1") != "0" and np is not None
+# Calls whose predicted probability of producing a card is below this are skipped
+RELEVANCE_SKIP_THRESHOLD = float(os.getenv("RELEVANCE_SKIP_THRESHOLD", "0.15"))
+# Outcomes of each kind an agent's model needs before it may skip calls
+RELEVANCE_MIN_OUTCOMES = int(os.getenv("RELEVANCE_MIN_OUTCOMES", "20"))
+# Fraction of would-be-skipped calls that run anyway to measure the gate
+RELEVANCE_EXPLORE_RATE = float(os.getenv("RELEVANCE_EXPLORE_RATE", "0.1"))
+# Hashed feature dimensions, and online SGD step size and L2 penalty
+RELEVANCE_FEATURE_DIM = int(os.getenv("RELEVANCE_FEATURE_DIM", "16384"))
+RELEVANCE_LEARNING_RATE = float(os.getenv("RELEVANCE_LEARNING_RATE", "0.5"))
+RELEVANCE_L2 = float(os.getenv("RELEVANCE_L2", "0.0001"))
+# Outcomes buffered before they, and the models, are written to disk
+RELEVANCE_FLUSH_EVERY = int(os.getenv("RELEVANCE_FLUSH_EVERY", "25"))
+
+RELEVANCE_MODEL_FILE = os.path.join(os.path.dirname(__file__), 'relevance_model.json')
+RELEVANCE_OUTCOMES_FILE = os.path.join(os.path.dirname(__file__), 'relevance_outcomes.jsonl')
+# Logged transcript text is truncated to this many characters
+MAX_LOGGED_TEXT_CHARS = 2000
+
+
+def text_features(text: str) -> Tuple["np.ndarray", "np.ndarray"]:
+    """
+    Hashed, L2-normalised unigram and bigram features of a text.
+
+    Returns (indices, values); indices are unique, so the features can be
+    used directly as a sparse row for scoring and gradient steps.
+    """
+    tokens = tokenize(text)
+    counts = Counter(zlib.crc32(token.encode("utf-8")) % RELEVANCE_FEATURE_DIM for token in tokens)
+    counts.update(
+        zlib.crc32(f"{first} {second}".encode("utf-8")) % RELEVANCE_FEATURE_DIM
+        for first, second in zip(tokens, tokens[1:])
+    )
+    indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+    values = 1.0 + np.log(np.fromiter(counts.values(), dtype=np.float64, count=len(counts)))
+    norm = np.linalg.norm(values)
+    return indices, (values / norm if norm else values)
+
+
+def sigmoid(score: float) -> float:
+    return 1.0 / (1.0 + math.exp(-max(min(score, 30.0), -30.0)))
+
+
+class GateDecision:
+    """The gate's verdict on one agent call, and what is needed to learn from its outcome."""
+    __slots__ = ("agent_name", "features", "probability", "predicted_skip", "run", "explored")
+
+    def __init__(self, agent_name: str, features, probability: Optional[float], predicted_skip: bool,
+                 run: bool, explored: bool):
+        self.agent_name = agent_name
+        self.features = features
+        # None while the agent's model is still warming up
+        self.probability = probability
+        self.predicted_skip = predicted_skip
+        self.run = run
+        self.explored = explored
+
+
+class AgentRelevanceModel:
+    """Logistic model of whether an agent's call produces a card, with its outcome counts and gate statistics."""
+
+    def __init__(self, weights=None, bias: float = 0.0, accepted: int = 0, rejected: int = 0):
+        self.weights = weights if weights is not None else np.zeros(RELEVANCE_FEATURE_DIM, dtype=np.float64)
+        self.bias = bias
+        # Outcomes the model has learned from
+        self.accepted = accepted
+        self.rejected = rejected
+        # Gate statistics since startup; a positive is a predicted skip
+        self.true_skips = 0       # explored skips that had no context
+        self.false_skips = 0      # explored skips that produced a card
+        self.missed_skips = 0     # calls run on the gate's advice that had no context
+        self.skipped = 0          # calls actually skipped
+
+    @property
+    def ready(self) -> bool:
+        return self.accepted >= RELEVANCE_MIN_OUTCOMES and self.rejected >= RELEVANCE_MIN_OUTCOMES
+
+    def predict(self, features) -> float:
+        indices, values = features
+        return sigmoid(self.bias + float(self.weights[indices] @ values))
+
+    def learn(self, features, accepted: bool):
+        """One SGD step on a single outcome."""
+        indices, values = features
+        error = self.predict(features) - (1.0 if accepted else 0.0)
+        self.weights[indices] -= RELEVANCE_LEARNING_RATE * (error * values + RELEVANCE_L2 * self.weights[indices])
+        self.bias -= RELEVANCE_LEARNING_RATE * error
+        if accepted:
+            self.accepted += 1
+        else:
+            self.rejected += 1
+
+    def stats(self) -> Dict[str, object]:
+        explored = self.true_skips + self.false_skips
+        # Explored skips are a RELEVANCE_EXPLORE_RATE sample of all predicted skips
+        estimated_true_skips = self.true_skips / RELEVANCE_EXPLORE_RATE if RELEVANCE_EXPLORE_RATE > 0 else 0.0
+        recall_base = estimated_true_skips + self.missed_skips
+        return {
+            "ready": self.ready,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "calls_saved": self.skipped,
+            "explored_skips": explored,
+            "precision": round(self.true_skips / explored, 3) if explored else None,
+            "recall": round(estimated_true_skips / recall_base, 3) if recall_base and explored else None,
+        }
+
+    def to_dict(self) -> Dict[str, object]:
+        nonzero = np.flatnonzero(self.weights)
+        return {
+            "bias": self.bias,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "weights": {str(int(index)): float(self.weights[index]) for index in nonzero},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, object]) -> "AgentRelevanceModel":
+        weights = np.zeros(RELEVANCE_FEATURE_DIM, dtype=np.float64)
+        for index, weight in data.get("weights", {}).items():
+            if int(index) < RELEVANCE_FEATURE_DIM:
+                weights[int(index)] = weight
+        return cls(weights, data.get("bias", 0.0), data.get("accepted", 0), data.get("rejected", 0))
+
+
+class RelevanceGate:
+    """Per-agent relevance models, the skip decision and the outcome log."""
+
+    def __init__(self, model_file: str = RELEVANCE_MODEL_FILE, outcomes_file: str = RELEVANCE_OUTCOMES_FILE):
+        self.model_file = model_file
+        self.outcomes_file = outcomes_file
+        self.models: Dict[str, AgentRelevanceModel] = {}
+        self._pending: List[dict] = []
+        self.outcomes_log = JsonLinesWriter(outcomes_file)
+        if RELEVANCE_GATE_ENABLED:
+            self._load()
+
+    def _load(self):
+        if not os.path.exists(self.model_file):
+            return
+        try:
+            with open(self.model_file, 'r') as f:
+                data = json.load(f)
+            if data.get("feature_dim") != RELEVANCE_FEATURE_DIM:
+                logger.warning(f"Ignoring relevance models in {self.model_file}: built for another feature size")
+                return
+            self.models = {name: AgentRelevanceModel.from_dict(model) for name, model in data["agents"].items()}
+            logger.info(f"Loaded relevance models for {len(self.models)} agents from {self.model_file}")
+        except Exception as e:
+            logger.error(f"Error loading relevance models from {self.model_file}: {e}")
+
+    def _model(self, agent_name: str) -> AgentRelevanceModel:
+        model = self.models.get(agent_name)
+        if model is None:
+            model = self.models[agent_name] = AgentRelevanceModel()
+        return model
+
+    def check(self, agent_name: str, text: str, gated: bool = True) -> Optional[GateDecision]:
+        """
+        Decide whether an agent's LLM call should run. None when the gate is disabled.
+
+        With gated=False (explicit requests) the call always runs, but its
+        outcome is still learned from.
+        """
+        return self.check_many([agent_name], text, gated)[0]
+
+    def check_many(self, agent_names: List[str], text: str, gated: bool = True) -> List[Optional[GateDecision]]:
+        """check() for several agents reading the same text; the text is featurized once."""
+        if not RELEVANCE_GATE_ENABLED:
+            return [None] * len(agent_names)
+        features = text_features(text)
+        decisions = []
+        for agent_name in agent_names:
+            model = self._model(agent_name)
+            if not model.ready:
+                decisions.append(GateDecision(agent_name, features, None, False, True, False))
+                continue
+            probability = model.predict(features)
+            predicted_skip = probability < RELEVANCE_SKIP_THRESHOLD
+            explored = predicted_skip and random.random() < RELEVANCE_EXPLORE_RATE
+            run = not predicted_skip or explored or not gated
+            if not run:
+                model.skipped += 1
+            decisions.append(GateDecision(agent_name, features, probability, predicted_skip, run, explored))
+        return decisions
+
+    def record(self, decision: Optional[GateDecision], text: str, accepted: bool):
+        """Learn from the outcome of a call the gate let run: accepted means a card was broadcast."""
+        if decision is None or not decision.run:
+            return
+        model = self._model(decision.agent_name)
+        if decision.probability is not None:
+            if decision.explored:
+                if accepted:
+                    model.false_skips += 1
+                else:
+                    model.true_skips += 1
+            elif not decision.predicted_skip and not accepted:
+                model.missed_skips += 1
+        model.learn(decision.features, accepted)
+        self._pending.append({
+            "time": time.time(),
+            "agent": decision.agent_name,
+            "accepted": accepted,
+            "probability": decision.probability,
+            "text": text[:MAX_LOGGED_TEXT_CHARS],
+        })
+        if len(self._pending) >= RELEVANCE_FLUSH_EVERY:
+            self.flush()
+
+    def flush(self):
+        """Append buffered outcomes to the outcome log and save the models, on the I/O thread."""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        self.outcomes_log.extend(pending)
+        self.save()
+
+    def save(self):
+        """Save the models as they are now; the file is written on the I/O thread."""
+        io_executor.submit(self._write_models, {
+            "feature_dim": RELEVANCE_FEATURE_DIM,
+            "agents": {name: model.to_dict() for name, model in self.models.items()},
+        })
+
+    def _write_models(self, data: dict):
+        try:
+            with open(self.model_file, 'w') as f:
+                json.dump(data, f)
+        except Exception as e:
+            logger.error(f"Error saving relevance models to {self.model_file}: {e}")
+
+    def snapshot(self) -> Dict[str, object]:
+        models = self.models.values()
+        return {
+            "enabled": RELEVANCE_GATE_ENABLED,
+            "skip_threshold": RELEVANCE_SKIP_THRESHOLD,
+            "explore_rate": RELEVANCE_EXPLORE_RATE,
+            "calls_saved": sum(model.skipped for model in models),
+            "agents": {name: model.stats() for name, model in self.models.items()},
+        }
+
+
+def load_outcomes(outcomes_file: str) -> List[dict]:
+    outcomes = []
+    with open(outcomes_file, 'r') as f:
+        for line in f:
+            if line.strip():
+                outcomes.append(json.loads(line))
+    return outcomes
+
+
+def train_offline(outcomes: List[dict], epochs: int, holdout: float, seed: int) -> Tuple[Dict[str, AgentRelevanceModel], dict]:
+    """
+    Train fresh models from logged outcomes and evaluate them on a held-out share.
+
+    Returns the models (trained on every outcome) and, per agent, the
+    precision and recall of skip decisions on the holdout and the share
+    of its calls that would have been saved.
+    """
+    rng = random.Random(seed)
+    by_agent: Dict[str, List[Tuple[object, bool]]] = {}
+    for outcome in outcomes:
+        by_agent.setdefault(outcome["agent"], []).append((text_features(outcome["text"]), bool(outcome["accepted"])))
+
+    models, report = {}, {}
+    for agent_name, examples in by_agent.items():
+        rng.shuffle(examples)
+        split = int(len(examples) * (1 - holdout))
+        train, test = examples[:split], examples[split:]
+        model = AgentRelevanceModel()
+        for _ in range(epochs):
+            for features, accepted in train:
+                model.learn(features, accepted)
+            rng.shuffle(train)
+        true_skips = false_skips = missed_skips = 0
+        for features, accepted in test:
+            skip = model.predict(features) < RELEVANCE_SKIP_THRESHOLD
+            if skip and not accepted:
+                true_skips += 1
+            elif skip:
+                false_skips += 1
+            elif not accepted:
+                missed_skips += 1
+        report[agent_name] = {
+            "examples": len(examples),
+            "holdout": len(test),
+            "precision": round(true_skips / (true_skips + false_skips), 3) if true_skips + false_skips else None,
+            "recall": round(true_skips / (true_skips + missed_skips), 3) if true_skips + missed_skips else None,
+            "calls_saved": round((true_skips + false_skips) / len(test), 3) if test else None,
+        }
+        # The saved model learns from every outcome
+        final = AgentRelevanceModel()
+        for _ in range(epochs):
+            for features, accepted in examples:
+                final.learn(features, accepted)
+        models[agent_name] = final
+    return models, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrain the relevance gate from logged outcomes")
+    parser.add_argument("--outcomes", default=RELEVANCE_OUTCOMES_FILE, help="Outcome log (JSON lines)")
+    parser.add_argument("--output", default=RELEVANCE_MODEL_FILE, help="Where to write the models")
+    parser.add_argument("--epochs", type=int, default=5, help="Passes over the outcomes")
+    parser.add_argument("--holdout", type=float, default=0.2, help="Share of outcomes held out for evaluation")
+    parser.add_argument("--seed", type=int, default=0, help="Shuffle seed")
+    parser.add_argument("--dry-run", action="store_true", help="Report only; do not write the models")
+    args = parser.parse_args()
+    if np is None:
+        parser.error("the relevance gate requires NumPy")
+
+    models, report = train_offline(load_outcomes(args.outcomes), args.epochs, args.holdout, args.seed)
+    print(f"{'agent':<24} {'examples':>8} {'precision':>9} {'recall':>7} {'saved':>6}")
+    for agent_name, entry in sorted(report.items()):
+        print(f"{agent_name:<24} {entry['examples']:>8} {str(entry['precision']):>9} "
+              f"{str(entry['recall']):>7} {str(entry['calls_saved']):>6}")
+    if not args.dry_run:
+        gate = RelevanceGate(args.output, args.outcomes)
+        gate.models = models
+        gate.save()
+        print(f"Saved models for {len(models)} agents to {args.output}")
+
+
+# Create singleton instance
+relevance_gate = RelevanceGate()
+
+
+if __name__ == "__main__":
+    main()
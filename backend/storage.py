@@ -0,0 +1,374 @@
+"""
+Pluggable persistence for custom agents, agent versions and session artifacts.
+
+STORE_BACKEND selects the implementation:
+
+- "json" (default): custom agents in custom_agents.json, rewritten
+  atomically in a worker thread; agent versions in agent_versions.json and
+  its journal (see agent_versions.py); session artifacts are not kept
+  beyond the usage log. Suitable for a single worker.
+- "sqlite": one SQLite database in WAL mode (STORE_SQLITE_PATH) with
+  indexed tables for agents, their triggers, agent versions and session
+  artifacts. Any number of workers can share it. Every write is also
+  appended to a change log; watch() polls the log and hands other
+  workers' changes to subscribers, which refresh their in-process caches
+  (the custom agent catalog, the version index). A new database imports the
+  JSON files the first time it is opened.
+
+Reads on the hot path come from those caches. The stores themselves are
+read once at import; every write runs on the I/O thread (see
+io_executor.py), in the order it was made, and change polls in a worker
+thread, all off the event loop.
+"""
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+import sqlite3
+import threading
+from typing import Callable, Dict, List, Optional
+
+from io_executor import io_executor
+
+# Get the logger instance configured in main.py
+logger = logging.getLogger("main")
+
+# --- Storage Configuration ---
+STORE_BACKEND = os.getenv("STORE_BACKEND", "json").lower()
+STORE_SQLITE_PATH = os.getenv("STORE_SQLITE_PATH", os.path.join(os.path.dirname(__file__), 'meeting_assistant.db'))
+# Seconds between polls for changes made by other workers
+STORE_WATCH_INTERVAL = float(os.getenv("STORE_WATCH_INTERVAL", "2"))
+# Seconds a write waits for another worker's write to finish
+STORE_BUSY_TIMEOUT = float(os.getenv("STORE_BUSY_TIMEOUT", "5"))
+# Change log entries older than this are pruned; a worker that has not polled for that long misses them
+STORE_CHANGE_RETENTION_SECONDS = 3600
+
+# Path to store custom agents JSON file (the "json" backend, and the import source for a new database)
+CUSTOM_AGENTS_FILE = os.path.join(os.path.dirname(__file__), 'custom_agents.json')
+
+# What change notifications are about
+ENTITY_AGENTS = "agents"
+ENTITY_VERSIONS = "versions"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS agents (
+    name TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    config TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS agents_position ON agents (position);
+CREATE TABLE IF NOT EXISTS agent_triggers (
+    agent_name TEXT NOT NULL REFERENCES agents (name) ON DELETE CASCADE ON UPDATE CASCADE,
+    trigger TEXT NOT NULL,
+    PRIMARY KEY (agent_name, trigger)
+);
+CREATE INDEX IF NOT EXISTS agent_triggers_trigger ON agent_triggers (trigger);
+CREATE TABLE IF NOT EXISTS agent_versions (
+    agent_name TEXT NOT NULL,
+    version_name TEXT NOT NULL,
+    prompt_text TEXT NOT NULL,
+    description TEXT NOT NULL DEFAULT '',
+    timestamp INTEGER NOT NULL,
+    PRIMARY KEY (agent_name, version_name)
+);
+CREATE INDEX IF NOT EXISTS agent_versions_timestamp ON agent_versions (agent_name, timestamp);
+CREATE TABLE IF NOT EXISTS session_artifacts (
+    session_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    data TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (session_id, kind)
+);
+CREATE INDEX IF NOT EXISTS session_artifacts_created ON session_artifacts (created_at);
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    entity TEXT NOT NULL,
+    origin TEXT NOT NULL,
+    changed_at REAL NOT NULL
+);
+"""
+
+
+class JsonStore:
+    """The original file-based storage, for a single worker."""
+
+    backend = "json"
+
+    def __init__(self, agents_file: str = CUSTOM_AGENTS_FILE):
+        self.agents_file = agents_file
+        # name -> config, in creation order
+        self._agents: Dict[str, dict] = {}
+
+    def load_agents(self) -> List[dict]:
+        """Load custom agents from file if it exists, otherwise start with none."""
+        try:
+            if os.path.exists(self.agents_file):
+                with open(self.agents_file, 'r') as f:
+                    agents = json.load(f)
+                logger.info(f"Loaded {len(agents)} custom agents from {self.agents_file}")
+            else:
+                logger.info(f"No custom agents file found at {self.agents_file}, initializing empty list")
+                agents = []
+        except Exception as e:
+            logger.error(f"Error loading custom agents from {self.agents_file}: {e}")
+            agents = []
+        self._agents = {agent.get("name"): agent for agent in agents}
+        return list(self._agents.values())
+
+    def _write_agents(self, agents: List[dict]):
+        temp_file = f"{self.agents_file}.tmp"
+        with open(temp_file, 'w') as f:
+            json.dump(agents, f, indent=2)
+        os.replace(temp_file, self.agents_file)
+
+    async def _save_agents(self):
+        agents = list(self._agents.values())
+        try:
+            # Writes run on the I/O thread in order, so an older list never overwrites a newer one
+            await io_executor.run(self._write_agents, agents)
+            logger.info(f"Saved {len(agents)} custom agents to {self.agents_file}")
+        except Exception as e:
+            logger.error(f"Error saving custom agents to {self.agents_file}: {e}")
+
+    async def save_agent(self, config: dict, old_name: Optional[str] = None):
+        """Add or replace a custom agent; a renamed agent keeps its place."""
+        if old_name and old_name != config["name"] and old_name in self._agents:
+            self._agents = {config["name"] if name == old_name else name: config if name == old_name else agent
+                            for name, agent in self._agents.items()}
+        else:
+            self._agents[config["name"]] = config
+        await self._save_agents()
+
+    async def delete_agent(self, name: str):
+        if self._agents.pop(name, None) is not None:
+            await self._save_agents()
+
+    def load_versions(self) -> Optional[Dict[str, List[dict]]]:
+        """None: agent_versions.py keeps its own journal for this backend."""
+        return None
+
+    async def save_version(self, agent_name: str, version: dict):
+        pass
+
+    async def delete_version(self, agent_name: str, version_name: str):
+        pass
+
+    async def save_session(self, session_id: str, kind: str, data: dict):
+        pass
+
+    def subscribe(self, entity: str, callback: Callable):
+        pass
+
+    async def watch(self, interval: float = STORE_WATCH_INTERVAL):
+        pass
+
+    def stats(self) -> dict:
+        return {"backend": self.backend, "agents_file": self.agents_file}
+
+
+class SQLiteStore:
+    """
+    Shared storage in one SQLite database in WAL mode.
+
+    Each worker thread gets its own connection. Writes take the database
+    lock up front (BEGIN IMMEDIATE), so concurrent workers queue for up to
+    STORE_BUSY_TIMEOUT instead of failing halfway through a transaction.
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, path: str = STORE_SQLITE_PATH):
+        self.path = path
+        # Identifies this process's entries in the change log
+        self.origin = uuid.uuid4().hex
+        self.last_seq = 0
+        self.subscribers: Dict[str, List[Callable]] = {}
+        self._local = threading.local()
+        created = not os.path.exists(path)
+        with self._connection() as connection:
+            connection.executescript(SCHEMA)
+        self.last_seq = self._query_one("SELECT COALESCE(MAX(seq), 0) FROM changes")[0]
+        if created:
+            self._import_json()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=STORE_BUSY_TIMEOUT, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA foreign_keys=ON")
+            self._local.connection = connection
+        return connection
+
+    def _query(self, sql: str, parameters: tuple = ()) -> List[tuple]:
+        return self._connection().execute(sql, parameters).fetchall()
+
+    def _query_one(self, sql: str, parameters: tuple = ()) -> Optional[tuple]:
+        return self._connection().execute(sql, parameters).fetchone()
+
+    def _write(self, entity: str, statements: List[tuple]):
+        """Run statements in one transaction and log the change for other workers."""
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            for sql, parameters in statements:
+                connection.execute(sql, parameters)
+            if entity:
+                now = time.time()
+                connection.execute("INSERT INTO changes (entity, origin, changed_at) VALUES (?, ?, ?)",
+                                   (entity, self.origin, now))
+                connection.execute("DELETE FROM changes WHERE changed_at < ?", (now - STORE_CHANGE_RETENTION_SECONDS,))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def _import_json(self):
+        """Seed a new database with the custom agents file; agent versions are imported by agent_versions.py."""
+        agents = JsonStore().load_agents() if os.path.exists(CUSTOM_AGENTS_FILE) else []
+        for agent in agents:
+            self._write(ENTITY_AGENTS, self._agent_statements(agent, None))
+        if agents:
+            logger.info(f"Imported {len(agents)} custom agents into {self.path}")
+
+    # --- Agents ---
+    def load_agents(self) -> List[dict]:
+        rows = self._query("SELECT config FROM agents ORDER BY position")
+        logger.info(f"Loaded {len(rows)} custom agents from {self.path}")
+        return [json.loads(config) for config, in rows]
+
+    def _agent_statements(self, config: dict, old_name: Optional[str]) -> List[tuple]:
+        name = config["name"]
+        statements = []
+        if old_name and old_name != name:
+            # Renaming keeps the agent's position; its triggers follow through the cascade
+            statements.append(("DELETE FROM agents WHERE name = ?", (name,)))
+            statements.append(("UPDATE agents SET name = ? WHERE name = ?", (name, old_name)))
+        statements += [
+            ("INSERT INTO agents (name, position, config, updated_at) "
+             "VALUES (?, (SELECT COALESCE(MAX(position), 0) + 1 FROM agents), ?, ?) "
+             "ON CONFLICT (name) DO UPDATE SET config = excluded.config, updated_at = excluded.updated_at",
+             (name, json.dumps(config), time.time())),
+            ("DELETE FROM agent_triggers WHERE agent_name = ?", (name,)),
+        ]
+        statements += [
+            ("INSERT OR IGNORE INTO agent_triggers (agent_name, trigger) VALUES (?, ?)", (name, trigger.lower()))
+            for trigger in config.get("triggers", []) if trigger
+        ]
+        return statements
+
+    async def save_agent(self, config: dict, old_name: Optional[str] = None):
+        """Add or replace a custom agent; a renamed agent keeps its place."""
+        try:
+            await io_executor.run(self._write, ENTITY_AGENTS, self._agent_statements(config, old_name))
+        except Exception as e:
+            logger.error(f"Error saving custom agent '{config.get('name')}' to {self.path}: {e}")
+
+    async def delete_agent(self, name: str):
+        try:
+            await io_executor.run(self._write, ENTITY_AGENTS, [("DELETE FROM agents WHERE name = ?", (name,))])
+        except Exception as e:
+            logger.error(f"Error deleting custom agent '{name}' from {self.path}: {e}")
+
+    # --- Agent versions ---
+    def load_versions(self) -> Dict[str, List[dict]]:
+        versions: Dict[str, List[dict]] = {}
+        for agent_name, version_name, prompt_text, description, timestamp in self._query(
+            "SELECT agent_name, version_name, prompt_text, description, timestamp FROM agent_versions "
+            "ORDER BY agent_name, timestamp, rowid"
+        ):
+            versions.setdefault(agent_name, []).append({
+                "version_name": version_name,
+                "prompt_text": prompt_text,
+                "timestamp": timestamp,
+                "description": description,
+            })
+        return versions
+
+    def _version_statement(self, agent_name: str, version: dict) -> tuple:
+        return (
+            "INSERT OR REPLACE INTO agent_versions (agent_name, version_name, prompt_text, description, timestamp) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (agent_name, version["version_name"], version.get("prompt_text", ""),
+             version.get("description", ""), int(version.get("timestamp", time.time()))),
+        )
+
+    def import_versions(self, versions: Dict[str, List[dict]]):
+        """Bulk-load versions into an empty table (used once, when the database is new)."""
+        self._write(ENTITY_VERSIONS, [
+            self._version_statement(agent_name, version)
+            for agent_name, agent_versions in versions.items() for version in agent_versions
+        ])
+
+    async def save_version(self, agent_name: str, version: dict):
+        try:
+            await io_executor.run(self._write, ENTITY_VERSIONS, [self._version_statement(agent_name, version)])
+        except Exception as e:
+            logger.error(f"Error saving version '{version.get('version_name')}' of {agent_name} to {self.path}: {e}")
+
+    async def delete_version(self, agent_name: str, version_name: str):
+        try:
+            await io_executor.run(self._write, ENTITY_VERSIONS, [(
+                "DELETE FROM agent_versions WHERE agent_name = ? AND version_name = ?", (agent_name, version_name)
+            )])
+        except Exception as e:
+            logger.error(f"Error deleting version '{version_name}' of {agent_name} from {self.path}: {e}")
+
+    # --- Session artifacts ---
+    async def save_session(self, session_id: str, kind: str, data: dict):
+        """Keep one artifact of a session (its usage summary, meeting notes, ...), replacing any earlier one."""
+        try:
+            await io_executor.run(self._write, None, [(
+                "INSERT OR REPLACE INTO session_artifacts (session_id, kind, data, created_at) VALUES (?, ?, ?, ?)",
+                (session_id, kind, json.dumps(data), time.time()),
+            )])
+        except Exception as e:
+            logger.error(f"Error saving {kind} of session {session_id} to {self.path}: {e}")
+
+    # --- Change notifications ---
+    def subscribe(self, entity: str, callback: Callable):
+        """Call callback(records) with the entity's reloaded records whenever another worker changes it."""
+        self.subscribers.setdefault(entity, []).append(callback)
+
+    def _poll(self) -> Dict[str, object]:
+        """Entities other workers changed since the last poll, with their reloaded records."""
+        rows = self._query("SELECT seq, entity, origin FROM changes WHERE seq > ? ORDER BY seq", (self.last_seq,))
+        if not rows:
+            return {}
+        self.last_seq = rows[-1][0]
+        changed = {entity for _, entity, origin in rows if origin != self.origin}
+        loaders = {ENTITY_AGENTS: self.load_agents, ENTITY_VERSIONS: self.load_versions}
+        return {entity: loaders[entity]() for entity in changed if entity in loaders and self.subscribers.get(entity)}
+
+    async def watch(self, interval: float = STORE_WATCH_INTERVAL):
+        """Poll the change log and refresh subscribers' caches with other workers' changes."""
+        while True:
+            try:
+                for entity, records in (await asyncio.to_thread(self._poll)).items():
+                    logger.info(f"Store: reloading {entity} changed by another worker")
+                    for callback in self.subscribers.get(entity, ()):
+                        callback(records)
+            except Exception as e:
+                logger.error(f"Error polling {self.path} for changes: {e}")
+            await asyncio.sleep(interval)
+
+    def stats(self) -> dict:
+        counts = {table: self._query_one(f"SELECT COUNT(*) FROM {table}")[0]
+                  for table in ("agents", "agent_triggers", "agent_versions", "session_artifacts")}
+        return {"backend": self.backend, "path": self.path, "last_change": self.last_seq, **counts}
+
+
+def create_store():
+    if STORE_BACKEND == "sqlite":
+        return SQLiteStore()
+    if STORE_BACKEND != "json":
+        logger.warning(f"Unknown STORE_BACKEND '{STORE_BACKEND}', using json")
+    return JsonStore()
+
+
+# Create singleton instance
+store = create_store()
@@ -0,0 +1,184 @@
+"""
+Structured (JSON-schema) outputs for routing decisions and insight cards.
+
+When STRUCTURED_OUTPUT=1, routing, card and combined card requests pass a ResponseSchema
+to UnifiedLLMClient.generate_content, which enforces it with each
+provider's native mechanism (Anthropic forced tool use, Gemini
+response_schema, OpenAI json_schema response format). Routing then returns
+an agent name from a fixed enum and cards return typed fields, instead of
+free text that has to be cleaned up and matched against sentinel strings.
+"""
+import os
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+# Get the logger instance configured in main.py
+logger = logging.getLogger("main")
+
+STRUCTURED_OUTPUT_ENABLED = os.getenv("STRUCTURED_OUTPUT", "0") == "1"
+
+
+class ResponseSchema:
+    """A named JSON schema for a model response. The top level must be an object."""
+    def __init__(self, name: str, schema: Dict[str, Any], description: str = ""):
+        self.name = name
+        self.schema = schema
+        self.description = description or f"Return the {name} result."
+
+    def for_gemini(self) -> Dict[str, Any]:
+        """
+        The schema without keywords Gemini's OpenAPI subset rejects.
+
+        Gemini otherwise generates object fields in alphabetical order, so
+        every object also lists its properties in declared order.
+        """
+        return _with_property_ordering(_strip_keys(self.schema, {"additionalProperties", "$schema"}))
+
+    def parse(self, text: str) -> Optional[Dict[str, Any]]:
+        """Parse a JSON response against this schema's top-level shape; None if malformed."""
+        text = text.strip()
+        if text.startswith("```"):
+            # Some models still fence JSON output
+            text = text.strip("`").removeprefix("json").strip()
+        try:
+            parsed = json.loads(text)
+        except json.JSONDecodeError as e:
+            logger.warning(f"Structured output for '{self.name}' is not valid JSON: {e}")
+            return None
+        if not isinstance(parsed, dict):
+            logger.warning(f"Structured output for '{self.name}' is not a JSON object")
+            return None
+        missing = [key for key in self.schema.get("required", []) if key not in parsed]
+        if missing:
+            logger.warning(f"Structured output for '{self.name}' is missing fields: {missing}")
+            return None
+        return parsed
+
+
+def _strip_keys(value: Any, keys: set) -> Any:
+    if isinstance(value, dict):
+        return {k: _strip_keys(v, keys) for k, v in value.items() if k not in keys}
+    if isinstance(value, list):
+        return [_strip_keys(v, keys) for v in value]
+    return value
+
+
+def _with_property_ordering(value: Any) -> Any:
+    if isinstance(value, dict):
+        ordered = {k: _with_property_ordering(v) for k, v in value.items()}
+        if isinstance(value.get("properties"), dict) and "property_ordering" not in value:
+            ordered["property_ordering"] = list(value["properties"])
+        return ordered
+    if isinstance(value, list):
+        return [_with_property_ordering(v) for v in value]
+    return value
+
+
+# --- Routing ---
+def routing_schema(agent_names: List[str]) -> ResponseSchema:
+    """Schema for a routing decision: one of the given agents, or "None"."""
+    return ResponseSchema(
+        "routing_decision",
+        {
+            "type": "object",
+            "properties": {
+                "agent": {"type": "string", "enum": list(agent_names) + ["None"]},
+            },
+            "required": ["agent"],
+            "additionalProperties": False,
+        },
+        "Return the agent that should respond to the transcript segment, or None."
+    )
+
+
+# --- Insight Cards ---
+# "relevant" comes first so a negative decision ends the response early
+# (Gemini gets the order from for_gemini's property_ordering)
+CARD_SCHEMA = ResponseSchema(
+    "insight_card",
+    {
+        "type": "object",
+        "properties": {
+            "relevant": {"type": "boolean", "description": "False if the transcript gives you nothing to work with"},
+            "headline": {"type": "string", "description": "Headline, starting with its emoji"},
+            "summary": {"type": "string", "description": "Summary, starting with its emoji"},
+            "analysis": {"type": "string", "description": "Remaining sections, formatted as instructed"},
+        },
+        "required": ["relevant", "headline", "summary", "analysis"],
+        "additionalProperties": False,
+    },
+    "Return the insight card."
+)
+
+CARD_SCHEMA_INSTRUCTIONS = """
+
+OUTPUT FIELDS:
+Return the card through the response schema instead of plain text: the headline (with its emoji) in "headline", the summary in "summary", and every remaining section, formatted exactly as instructed above, in "analysis".
+Wherever the instructions above tell you to respond only with a marker such as "NO_BUSINESS_CONTEXT" or "NO_RELEVANT_CONTEXT", set "relevant" to false and leave the other fields empty instead."""
+
+
+def with_card_schema(prompt: str) -> Tuple[str, Optional[ResponseSchema]]:
+    """Return the prompt and schema for a card request, adapted for structured output when enabled."""
+    if not STRUCTURED_OUTPUT_ENABLED:
+        return prompt, None
+    return prompt + CARD_SCHEMA_INSTRUCTIONS, CARD_SCHEMA
+
+
+def card_text(model_response, response_schema: Optional[ResponseSchema], no_context_marker: str) -> str:
+    """
+    Return a card response as the text layout agents broadcast.
+
+    Structured cards are rendered back to headline / summary / analysis
+    text, and an irrelevant card becomes no_context_marker, so agents keep
+    a single post-processing path. A malformed structured response becomes
+    an empty string. Unstructured responses pass through.
+    """
+    if response_schema is None:
+        return model_response.text
+    parsed = model_response.parsed
+    if parsed is None:
+        return ""
+    return render_card(parsed, no_context_marker)
+
+
+def render_card(card: Dict[str, Any], no_context_marker: str) -> str:
+    """Render structured card fields as headline / summary / analysis text."""
+    if not card.get("relevant", True):
+        return no_context_marker
+    sections = [str(card.get(key, "")).strip() for key in ("headline", "summary", "analysis")]
+    return "\n\n".join(section for section in sections if section)
+
+
+# --- Combined Cards ---
+def combined_card_schema(agent_names: List[str]) -> ResponseSchema:
+    """Schema for a combined request: an array of insight cards, each tagged with its agent."""
+    card = CARD_SCHEMA.schema
+    return ResponseSchema(
+        "combined_insight_cards",
+        {
+            "type": "object",
+            "properties": {
+                "cards": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "agent": {"type": "string", "enum": list(agent_names)},
+                            **card["properties"],
+                        },
+                        "required": ["agent"] + card["required"],
+                        "additionalProperties": False,
+                    },
+                },
+            },
+            "required": ["cards"],
+            "additionalProperties": False,
+        },
+        "Return one insight card per agent."
+    )
+
+
+COMBINED_CARD_SCHEMA_INSTRUCTIONS = """Return the cards through the response schema instead of plain text: one entry in "cards" per agent, in this order: {agent_list}, with the agent's name in "agent".
+For each card put the headline (with its emoji) in "headline", the summary in "summary", and every remaining section, formatted exactly as that agent's instructions say, in "analysis".
+Wherever an agent's instructions tell it to respond only with a marker such as "NO_BUSINESS_CONTEXT", set that card's "relevant" to false and leave its other fields empty instead."""
@@ -3,11 +3,13 @@ import asyncio
 import logging
 import json
 import random
-from vertexai.generative_models import GenerativeModel, Part, FinishReason
-import vertexai.generative_models as generative_models
+from typing import Optional
 
 # Import unified LLM client
-from llm_providers import llm_client, ModelConfig, ModelProvider
+from llm_providers import llm_client, ModelConfig, ModelProvider, CallPriority, current_call_priority
+from model_registry import TASK_ROUTING
+from structured_output import STRUCTURED_OUTPUT_ENABLED, routing_schema
+from meeting_memory import current_meeting_memory
 
 # Get the logger instance configured in main.py
 logger = logging.getLogger("main")
@@ -15,93 +17,149 @@ logger = logging.getLogger("main")
 # --- Import Agent Functions using ABSOLUTE paths from /app ---
 try:
     # Assumes agents folder is directly under the WORKDIR (/app)
-    from agents.radical_expander import run_radical_expander
-    from agents.product_agent import run_product_agent
-    from agents.debate_agent import run_debate_agent
-    from agents.skeptical_agent import run_skeptical_agent
-    from agents.one_small_thing_agent import run_one_small_thing_agent
-    from agents.disruptor_agent import run_disruptor_agent
+    from agents.registry import AGENT_SPECS, INPUT_CONTEXT, get_agent_spec, canonical_agent_name, run_agent
+    from agents.ethan_mollick_agent import NAME_VARIATIONS as ETHAN_NAME_VARIATIONS, HELP_PHRASES as ETHAN_HELP_PHRASES
     from agents.dynamic_agent import run_dynamic_agent  # Import the dynamic agent
-    from agents.ethan_mollick_agent import run_ethan_mollick_agent  # Import the Ethan Mollick agent
-    # Import other agents here if/when added
+    from agents.combined_agent import run_combined_agents, is_combinable  # Multi-agent single-call mode
     logger.info("Successfully imported agent functions using absolute paths.")
 except ImportError as e:
     logger.error(f"Failed to import one or more agent functions using absolute paths: {e}")
-    # Define dummies or raise error depending on desired behavior
-    async def run_radical_expander(*args, **kwargs): logger.error("Radical Expander not loaded"); await args[-1]({"type":"error", "agent": "Radical Expander", "message":"Not loaded"}) # Assume broadcaster is last arg
-    async def run_product_agent(*args, **kwargs): logger.error("Product Agent not loaded"); await args[-1]({"type":"error", "agent": "Product Agent", "message":"Not loaded"})
-    async def run_debate_agent(*args, **kwargs): logger.error("Debate Agent not loaded"); await args[-1]({"type":"error", "agent": "Debate Agent", "message":"Not loaded"})
-    async def run_skeptical_agent(*args, **kwargs): logger.error("Skeptical Agent not loaded"); await args[-1]({"type":"error", "agent": "Skeptical Agent", "message":"Not loaded"})
-    async def run_one_small_thing_agent(*args, **kwargs): logger.error("Next Step Agent not loaded"); await args[-1]({"type":"error", "agent": "Next Step Agent", "message":"Not loaded"})
-    async def run_disruptor_agent(*args, **kwargs): logger.error("Disruptor Agent not loaded"); await args[-1]({"type":"error", "agent": "Disruptor", "message":"Not loaded"})
+    # Without the registry no built-in agent is known; custom agents still fail loudly below
+    AGENT_SPECS, INPUT_CONTEXT = {}, "context"
+    ETHAN_NAME_VARIATIONS, ETHAN_HELP_PHRASES = (), ()
+    def get_agent_spec(name): return None
+    def canonical_agent_name(name): return name
+    async def run_agent(*args, **kwargs): logger.error("Agent registry not loaded")
     async def run_dynamic_agent(*args, **kwargs): logger.error("Dynamic Agent not loaded"); await args[-1]({"type":"error", "agent": "Custom Agent", "message":"Not loaded"})
-    async def run_ethan_mollick_agent(*args, **kwargs): logger.error("Ethan Mollick Agent not loaded"); await args[-1]({"type":"error", "agent": "Ethan Mollick", "message":"Not loaded"})
+    async def run_combined_agents(*args, **kwargs): logger.error("Combined Agents not loaded")
+    def is_combinable(name): return False
 
-# Store custom agents with persistence
+# Custom agents, persisted through the store (see storage.py) and read from
+# copy-on-write snapshots (see agent_catalog.py)
 import json
 import os
+from agent_catalog import agent_catalog
 
-# Path to store custom agents JSON file
-CUSTOM_AGENTS_FILE = os.path.join(os.path.dirname(__file__), 'custom_agents.json')
 
-# Load custom agents from file if it exists, otherwise initialize empty list
-def load_custom_agents():
-    try:
-        if os.path.exists(CUSTOM_AGENTS_FILE):
-            with open(CUSTOM_AGENTS_FILE, 'r') as f:
-                agents = json.load(f)
-                logger.info(f"Loaded {len(agents)} custom agents from {CUSTOM_AGENTS_FILE}")
-                return agents
-        else:
-            logger.info(f"No custom agents file found at {CUSTOM_AGENTS_FILE}, initializing empty list")
-            return []
-    except Exception as e:
-        logger.error(f"Error loading custom agents from {CUSTOM_AGENTS_FILE}: {e}")
-        return []
+# --- Agent Routing Configuration ---
+# Everything below is derived from the agent registry (agents/registry.py)
+def _triggers(agent_name: str) -> tuple:
+    spec = AGENT_SPECS.get(agent_name)
+    return spec.triggers if spec else ()
 
-# Save custom agents to file
-def save_custom_agents():
-    try:
-        with open(CUSTOM_AGENTS_FILE, 'w') as f:
-            json.dump(CUSTOM_AGENTS, f, indent=2)
-        logger.info(f"Saved {len(CUSTOM_AGENTS)} custom agents to {CUSTOM_AGENTS_FILE}")
-    except Exception as e:
-        logger.error(f"Error saving custom agents to {CUSTOM_AGENTS_FILE}: {e}")
+# Agents routable by LLM content analysis
+LLM_ROUTABLE_AGENTS = {name: spec for name, spec in AGENT_SPECS.items() if spec.routable}
 
-# Initialize custom agents
-CUSTOM_AGENTS = load_custom_agents()
+# Explicit trigger phrases, already lowercased
+DEBATE_AGENT_TRIGGERS = _triggers("Debate Agent")
+SKEPTICAL_AGENT_TRIGGERS = _triggers("Skeptical Agent")
+ONE_SMALL_THING_TRIGGERS = _triggers("Next Step Agent")
+DISRUPTOR_TRIGGERS = _triggers("Disruptor")
+ETHAN_MOLLICK_TRIGGERS = _triggers("Ethan Mollick")  # Special case - exact phrase needed
 
+# Agents that only run when explicitly asked for; their calls get queue priority
+EXPLICIT_AGENTS = {name for name, spec in AGENT_SPECS.items() if spec.explicit}
 
-# --- Agent Routing Configuration ---
-# Agents routable by LLM content analysis
-LLM_ROUTABLE_AGENTS = {
-    "Radical Expander": run_radical_expander,
-    "Product Agent": run_product_agent,
-    "Skeptical Agent": run_skeptical_agent,
-    "Next Step Agent": run_one_small_thing_agent,
-    "Disruptor": run_disruptor_agent,
-    # Add other LLM-routable agents here
-}
+# --- Multi-Agent Fan-Out Configuration ---
+# Maximum number of agents that respond to one segment. With the default of 1 only the
+# routed agent runs; higher values add agents whose explicit triggers also match.
+MAX_AGENTS_PER_SEGMENT = int(os.getenv("MAX_AGENTS_PER_SEGMENT", "1"))
+
+# When several combinable agents respond to the same segment, ask for all of their
+# cards in one request instead of one request per agent
+COMBINED_AGENT_MODE = os.getenv("COMBINED_AGENT_MODE", "true").lower() in ("1", "true", "yes")
+
+# Explicit triggers that pull additional agents into a fan-out
+FANOUT_TRIGGERS = {name: spec.triggers for name, spec in AGENT_SPECS.items() if spec.combinable and spec.triggers}
+
+# Static routing instructions. Only the transcript segment changes between calls,
+# so this is sent as a cacheable prefix ahead of it.
+ROUTING_PROMPT_PREFIX = """
+You are a "Traffic Cop" AI analyzing meeting transcript segments. Your job is to determine which specialized AI agent should process each segment next. You should PREFER to select an agent rather than returning "None" if there's any reasonable connection. Do NOT choose 'Debate Agent' or any agents not listed below.
+
+IMPORTANT CONTEXT INSTRUCTIONS:
+1. Be VERY LENIENT about what constitutes business-related content - almost any topic can have a business angle.
+2. Only return "None" if the segment is completely unrelated to any possible business context.
+3. Be creative in finding business relevance in ambiguous or general conversations.
+4. You should aim for a balanced distribution of agents over time - all five agents should be given EQUAL CONSIDERATION.
+5. STRONGLY PREFER selecting an agent over returning "None" - even with minimal context.
+
+Available Agents (Choose ONE or None):
+
+- Skeptical Agent: Triggered by BUSINESS discussions where ideas, plans, or solutions are proposed that warrant critical examination. Look for:
+    - New business initiatives, projects, or strategies being discussed
+    - Business claims that seem overly optimistic or ambitious
+    - Business decisions that involve significant resource allocation or risk
+    - Business proposals that might overlook potential challenges or downsides
+    - Business assumptions that could benefit from deeper questioning
+
+- One Small Thing: Triggered by discussions about implementing AI or technology in BUSINESS contexts where practical next steps would be valuable. Look for:
+    - Questions about where to start with AI implementation in business
+    - Expressions of interest in AI capabilities for specific business use cases
+    - Concerns about complexity, cost, or risk in business technology adoption
+    - Opportunities for quick wins or immediate business value from AI
+    - Business discussions that would benefit from practical, actionable advice
+
+- Disruptor: Triggered by a WIDE RANGE of business discussions about industry dynamics, innovation, competition, or technology. STRONGLY PREFER this agent for discussions about:
+    - ANY mentions of business industry challenges, competition, or market shifts
+    - ANY discussions about business models, industry practices, or technology trends
+    - ANY conversations mentioning competition, future business direction, or emerging threats
+    - ANYTHING related to startups, innovation, or industry evolution
+    - Words like: market, disruption, trend, tech, innovation, evolve, compete, startup, revolution, transform, business
+
+- Radical Expander: Triggered by discussions about business internal operations, processes, or organizational structure. Look for:
+    - Talk about business workflows, meetings, or collaboration methods
+    - Discussions of business information sharing or reporting processes
+    - Mentions of business team structures, project management, or work allocation
+    - Topics related to business decision-making or governance
+    - Questions about efficiency, effectiveness, or optimization of business processes
 
-# Define explicit trigger phrases for Debate Agent
-DEBATE_AGENT_TRIGGERS = ["debate agent", "analyze conflict"] # Case-insensitive check later
+- Wild Product Agent: Triggered by discussions about business offerings, customer needs, or product/service innovation. Look for:
+    - Conversations about existing or potential business products and services
+    - Business customer pain points, needs, or feedback
+    - Ideas for new business offerings or features
+    - Questions about business market opportunities or customer value
+    - Topics related to business product strategy, development, or enhancement
 
-# Define explicit trigger phrases for Skeptical Agent
-SKEPTICAL_AGENT_TRIGGERS = ["skeptical agent", "devil's advocate", "critique this", "what could go wrong"] # Case-insensitive check later
+Examples of Routing Decisions (NOTICE THE BALANCE between all agent types):
 
-# Define explicit trigger phrases for One Small Thing Agent
-ONE_SMALL_THING_TRIGGERS = ["one small thing", "first step", "where to start", "how to begin", "quick win"] # Case-insensitive check later
+SKEPTICAL AGENT EXAMPLES:
+- "We could implement this new system across all departments by next quarter." -> Skeptical Agent (ambitious business timeline that needs critical examination)
+- "Our AI solution will definitely increase sales by at least 50%." -> Skeptical Agent (overly optimistic business claim)
+- "The plan is to completely restructure our team organization based on this new model." -> Skeptical Agent (significant business change with potential risks)
+
+ONE SMALL THING EXAMPLES:
+- "I'm interested in using AI for our marketing, but I'm not sure where we should start." -> One Small Thing (needs practical business first step)
+- "How can we begin incorporating AI into our customer service without a huge investment?" -> One Small Thing (seeking accessible business entry point)
+- "What's a simple way we could start using AI in our daily operations?" -> One Small Thing (looking for quick business implementation)
 
-# Define explicit trigger phrases for Disruptor Agent
-DISRUPTOR_TRIGGERS = ["disruptor", "disrupt", "disruption", "ai startup", "startup disruption", "industry disruptor"] # Case-insensitive check later
+DISRUPTOR EXAMPLES:
+- "Our industry has been doing things the same way for decades." -> Disruptor (opportunity to reimagine business industry practices)
+- "We're worried about new startups entering our market with AI-first approaches." -> Disruptor (competitive business threat discussion)
+- "How might our competitive landscape change with these emerging technologies?" -> Disruptor (business market evolution question)
 
-# Define explicit trigger phrase for Ethan Mollick Agent
-ETHAN_MOLLICK_TRIGGER = "Ethan Mollick, I need your help" # Special case - exact phrase needed
+RADICAL EXPANDER EXAMPLES:
+- "Our weekly team meetings take too much time and don't accomplish enough." -> Radical Expander (business process inefficiency)
+- "How should we structure our development teams for the next phase?" -> Radical Expander (business organization question)
+- "Our current project management approach isn't scaling well." -> Radical Expander (business workflow challenge)
+
+WILD PRODUCT AGENT EXAMPLES:
+- "What new features could we add to our product to better serve customers?" -> Wild Product Agent (business product enhancement)
+- "Our users are struggling with this aspect of our service." -> Wild Product Agent (business customer pain point)
+- "Could we create a subscription service for this customer segment?" -> Wild Product Agent (new business offering concept)
+
+NONE EXAMPLES:
+- "..." -> None (empty or unintelligible content)
+- "Um, ah, hmm..." -> None (only filler words with no substance)
+
+Note: Almost any other content, even if not explicitly business-focused, should be routed to an agent as it might be part of a broader business conversation.
+
+"""
 
 # --- Traffic Cop Core Logic ---
 
 # Note: Removed the type hint fix here as it should be done by changing Python version
-async def route_to_traffic_cop(transcript_text: str, model: GenerativeModel):
+async def route_to_traffic_cop(transcript_text: str, model):
     """
     Determines which agent to run. Checks for explicit triggers first,
     then uses the Gemini model for content-based routing for other agents.
@@ -110,46 +168,34 @@ async def route_to_traffic_cop(transcript_text: str, model: GenerativeModel):
     logger.info(">>> route_to_traffic_cop: Analyzing transcript for routing...")
 
     # 0. Check for Ethan Mollick trigger first (highest priority) with multiple variations
-    ethan_variations = [
-        "ethan mollick",
-        "ethan malik",
-        "ethan, malik",
-        "ethan molick",
-        "ethan mall",
-        "ethan mole",
-        "ethan malek"
-    ]
-    
+    lowered_text = transcript_text.lower()
+
     # First check the main trigger phrase
-    if ETHAN_MOLLICK_TRIGGER.lower() in transcript_text.lower():
+    if any(trigger in lowered_text for trigger in ETHAN_MOLLICK_TRIGGERS):
         logger.info(f"--- Explicit full trigger detected for Ethan Mollick Agent")
-        return "Ethan Mollick"  # Return specific name to trigger run_ethan_mollick_agent
+        return "Ethan Mollick"  # Return specific name to trigger the Ethan Mollick agent
     
     # Then check for name variations
-    for variation in ethan_variations:
-        if variation.lower() in transcript_text.lower():
+    for variation in ETHAN_NAME_VARIATIONS:
+        if variation in lowered_text:
             # Look for help-seeking language nearby
-            help_phrases = ["i need your help", "can you help", "help me", "i need help"]
-            has_help_context = any(phrase in transcript_text.lower() for phrase in help_phrases)
+            has_help_context = any(phrase in lowered_text for phrase in ETHAN_HELP_PHRASES)
             
             if has_help_context:
                 logger.info(f"--- Alternative trigger detected for Ethan Mollick Agent: '{variation}' with help context")
-                return "Ethan Mollick"  # Return specific name to trigger run_ethan_mollick_agent
+                return "Ethan Mollick"  # Return specific name to trigger the Ethan Mollick agent
     
-    # 1. Check for Custom Agent triggers (if any exist)
-    for agent in CUSTOM_AGENTS:
-        agent_name = agent.get("name", "Custom Agent")
-        agent_triggers = agent.get("triggers", [])
-        
-        # Check if any of the trigger words appear in the transcript
-        if agent_triggers and any(trigger.lower() in transcript_text.lower() for trigger in agent_triggers):
-            logger.info(f"--- Explicit trigger detected for custom agent: {agent_name}")
-            return agent_name  # Return the name to be matched with dynamic_agent function
+    # 1. Check for Custom Agent triggers (if any exist), all in one pass over the text
+    custom_agent = agent_catalog.snapshot.match_trigger(lowered_text)
+    if custom_agent is not None:
+        agent_name = custom_agent.get("name", "Custom Agent")
+        logger.info(f"--- Explicit trigger detected for custom agent: {agent_name}")
+        return agent_name  # Return the name to be matched with dynamic_agent function
     
     # 1. Check for Explicit Triggers - Disruptor gets checked FIRST for meetings about disruption
     # Using lower() for case-insensitive matching
     # Add broader patterns for disruption-related concepts for Disruptor Agent
-    disruption_patterns = DISRUPTOR_TRIGGERS + ["market", "trend", "industry", "threat", "compete", "startup", "innovation", "evolve", "shift"]
+    disruption_patterns = list(DISRUPTOR_TRIGGERS) + ["market", "trend", "industry", "threat", "compete", "startup", "innovation", "evolve", "shift"]
     if any(phrase in transcript_text.lower() for phrase in disruption_patterns):
         logger.info(f"--- Explicit trigger detected for Disruptor Agent (high priority)")
         return "Disruptor" # Return specific name
@@ -205,140 +251,51 @@ async def route_to_traffic_cop(transcript_text: str, model: GenerativeModel):
         selected_agent = random.choice(weighted_pool)
         logger.info(f"--- Forced rotation: Selected agent: {selected_agent}")
         return selected_agent
-    
-    possible_agents_str = ", ".join(llm_agent_names)
-
-    prompt = f"""
-You are a "Traffic Cop" AI analyzing meeting transcript segments. Your job is to determine which specialized AI agent should process each segment next. You should PREFER to select an agent rather than returning "None" if there's any reasonable connection. Do NOT choose 'Debate Agent' or any agents not listed below.
-
-IMPORTANT CONTEXT INSTRUCTIONS:
-1. Be VERY LENIENT about what constitutes business-related content - almost any topic can have a business angle.
-2. Only return "None" if the segment is completely unrelated to any possible business context.
-3. Be creative in finding business relevance in ambiguous or general conversations.
-4. You should aim for a balanced distribution of agents over time - all five agents should be given EQUAL CONSIDERATION.
-5. STRONGLY PREFER selecting an agent over returning "None" - even with minimal context.
 
-Available Agents (Choose ONE or None):
-
-- Skeptical Agent: Triggered by BUSINESS discussions where ideas, plans, or solutions are proposed that warrant critical examination. Look for:
-    - New business initiatives, projects, or strategies being discussed
-    - Business claims that seem overly optimistic or ambitious
-    - Business decisions that involve significant resource allocation or risk
-    - Business proposals that might overlook potential challenges or downsides
-    - Business assumptions that could benefit from deeper questioning
-
-- One Small Thing: Triggered by discussions about implementing AI or technology in BUSINESS contexts where practical next steps would be valuable. Look for:
-    - Questions about where to start with AI implementation in business
-    - Expressions of interest in AI capabilities for specific business use cases
-    - Concerns about complexity, cost, or risk in business technology adoption
-    - Opportunities for quick wins or immediate business value from AI
-    - Business discussions that would benefit from practical, actionable advice
-
-- Disruptor: Triggered by a WIDE RANGE of business discussions about industry dynamics, innovation, competition, or technology. STRONGLY PREFER this agent for discussions about:
-    - ANY mentions of business industry challenges, competition, or market shifts
-    - ANY discussions about business models, industry practices, or technology trends
-    - ANY conversations mentioning competition, future business direction, or emerging threats
-    - ANYTHING related to startups, innovation, or industry evolution
-    - Words like: market, disruption, trend, tech, innovation, evolve, compete, startup, revolution, transform, business
-
-- Radical Expander: Triggered by discussions about business internal operations, processes, or organizational structure. Look for:
-    - Talk about business workflows, meetings, or collaboration methods
-    - Discussions of business information sharing or reporting processes
-    - Mentions of business team structures, project management, or work allocation
-    - Topics related to business decision-making or governance
-    - Questions about efficiency, effectiveness, or optimization of business processes
-
-- Wild Product Agent: Triggered by discussions about business offerings, customer needs, or product/service innovation. Look for:
-    - Conversations about existing or potential business products and services
-    - Business customer pain points, needs, or feedback
-    - Ideas for new business offerings or features
-    - Questions about business market opportunities or customer value
-    - Topics related to business product strategy, development, or enhancement
-
-Transcript Segment:
+    # Dynamic suffix: the transcript segment and the final instruction
+    routing_prompt = f"""Transcript Segment:
 "{transcript_text}"
 
-Examples of Routing Decisions (NOTICE THE BALANCE between all agent types):
-
-SKEPTICAL AGENT EXAMPLES:
-- "We could implement this new system across all departments by next quarter." -> Skeptical Agent (ambitious business timeline that needs critical examination)
-- "Our AI solution will definitely increase sales by at least 50%." -> Skeptical Agent (overly optimistic business claim)
-- "The plan is to completely restructure our team organization based on this new model." -> Skeptical Agent (significant business change with potential risks)
-
-ONE SMALL THING EXAMPLES:
-- "I'm interested in using AI for our marketing, but I'm not sure where we should start." -> One Small Thing (needs practical business first step)
-- "How can we begin incorporating AI into our customer service without a huge investment?" -> One Small Thing (seeking accessible business entry point)
-- "What's a simple way we could start using AI in our daily operations?" -> One Small Thing (looking for quick business implementation)
-
-DISRUPTOR EXAMPLES:
-- "Our industry has been doing things the same way for decades." -> Disruptor (opportunity to reimagine business industry practices)
-- "We're worried about new startups entering our market with AI-first approaches." -> Disruptor (competitive business threat discussion)
-- "How might our competitive landscape change with these emerging technologies?" -> Disruptor (business market evolution question)
-
-RADICAL EXPANDER EXAMPLES:
-- "Our weekly team meetings take too much time and don't accomplish enough." -> Radical Expander (business process inefficiency)
-- "How should we structure our development teams for the next phase?" -> Radical Expander (business organization question)
-- "Our current project management approach isn't scaling well." -> Radical Expander (business workflow challenge)
-
-WILD PRODUCT AGENT EXAMPLES:
-- "What new features could we add to our product to better serve customers?" -> Wild Product Agent (business product enhancement)
-- "Our users are struggling with this aspect of our service." -> Wild Product Agent (business customer pain point)
-- "Could we create a subscription service for this customer segment?" -> Wild Product Agent (new business offering concept)
-
-NONE EXAMPLES:
-- "..." -> None (empty or unintelligible content)
-- "Um, ah, hmm..." -> None (only filler words with no substance)
-
-Note: Almost any other content, even if not explicitly business-focused, should be routed to an agent as it might be part of a broader business conversation.
-
 Which agent from the list above is the MOST relevant for this specific business segment? Output ONLY the name of the chosen agent or the word "None". Remember to consider ALL agents equally and avoid consistently favoring any particular agent type.
 """
+    # In structured mode the provider constrains the answer to the agent names
+    response_schema = routing_schema(llm_agent_names) if STRUCTURED_OUTPUT_ENABLED else None
 
     try:
         logger.info("Sending content-based routing request to LLM...")
         
-        # Check if using legacy Gemini model directly or unified client
-        if isinstance(model, GenerativeModel):
-            # Legacy path - use directly provided Gemini model
-            response = await model.generate_content_async(
-                prompt,
-                generation_config={"temperature": 0.5, "max_output_tokens": 50},
-                safety_settings={
-                    generative_models.HarmCategory.HARM_CATEGORY_HARASSMENT: generative_models.HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
-                    generative_models.HarmCategory.HARM_CATEGORY_HATE_SPEECH: generative_models.HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
-                }
-            )
-            
-            if response.candidates and response.candidates[0].finish_reason == FinishReason.SAFETY:
-                logger.warning("Routing decision blocked by safety settings. Defaulting to None.")
-                return "None"
-                
-            if response.text:
-                raw_text = response.text
-            else:
-                logger.warning("Empty response from legacy model")
-                return "None"
-                
-        else:
-            # Use unified client
-            model_config = ModelConfig(
-                provider=llm_client.active_provider,
-                model_name=llm_client.active_model_name,
-                temperature=0.5,
-                max_tokens=50
-            )
-            
-            model_response = await llm_client.generate_content(prompt, model_config)
-            
-            # Log which model was used
-            logger.info(f"Routing using {model_response.model_provider} model: {model_response.model_name}")
-            
-            if model_response.finish_reason == "SAFETY" or model_response.finish_reason == "BLOCKED":
-                logger.warning("Routing decision blocked by safety settings. Defaulting to None.")
-                return "None"
-                
-            raw_text = model_response.text
-            
+        # Routing is a tiny classification task; run it on the fast tier
+        model_config = llm_client.model_config_for(
+            TASK_ROUTING,
+            temperature=0.5,
+            max_tokens=50
+        )
+
+        model_response = await llm_client.generate_content(
+            routing_prompt,
+            model_config,
+            agent_name="Traffic Cop",
+            cacheable_prefix=ROUTING_PROMPT_PREFIX,
+            priority=CallPriority.ROUTING,
+            response_schema=response_schema
+        )
+
+        # Log which model was used
+        logger.info(f"Routing using {model_response.model_provider} model: {model_response.model_name}")
+
+        if model_response.finish_reason == "SAFETY" or model_response.finish_reason == "BLOCKED":
+            logger.warning("Routing decision blocked by safety settings. Defaulting to None.")
+            return "None"
+
+        if model_response.parsed is not None:
+            choice = model_response.parsed["agent"]
+            if choice in llm_agent_names or choice == "None":
+                logger.info(f"Routing decision (LLM - Structured): Trigger '{choice}'")
+                return choice
+            logger.warning(f"Structured routing returned an unknown agent '{choice}'. Falling back to text matching.")
+
+        raw_text = model_response.text
+
         # Process the response regardless of which path was used
         raw_choice = raw_text.strip().replace('"', '').replace("'", '').replace('.', '').replace('`', '')
 
@@ -368,84 +325,135 @@ Which agent from the list above is the MOST relevant for this specific business
         logger.exception("Traceback:")
         return None
 
+async def route_to_agents(transcript_text: str, model):
+    """
+    Determines which agents should respond to a segment.
+    The routed agent comes first; when MAX_AGENTS_PER_SEGMENT allows, agents whose
+    explicit triggers also appear in the segment are added after it.
+    Returns a list of agent names (empty when no agent is needed) or None on routing error.
+    """
+    primary = await route_to_traffic_cop(transcript_text, model)
+    if primary is None:
+        return None
+    if primary == "None":
+        return []
+
+    agent_names = [primary]
+    if MAX_AGENTS_PER_SEGMENT > 1 and is_combinable(primary):
+        lowered = transcript_text.lower()
+        selected = {canonical_agent_name(primary)}
+        for agent_name, triggers in FANOUT_TRIGGERS.items():
+            if len(agent_names) >= MAX_AGENTS_PER_SEGMENT:
+                break
+            if agent_name not in selected and any(phrase in lowered for phrase in triggers):
+                agent_names.append(agent_name)
+                selected.add(agent_name)
+        if len(agent_names) > 1:
+            logger.info(f"--- Fan-out: {agent_names} will respond to this segment")
+    return agent_names
+
 # --- Agent Trigger Dispatcher ---
 async def trigger_agent(
     name: str,
     current_segment_text: str,
-    model,  # Can be GenerativeModel or None (when using unified client)
+    model,  # The unified LLM client
     broadcaster: callable,
-    context_buffer: str
+    context_buffer: Optional[str] = None
 ):
     """
     Triggers the specified agent function, passing the appropriate context.
+
+    Agents reading the meeting context get it from the session's meeting
+    memory within their own token budget; context_buffer is used only
+    when there is no meeting memory.
     """
     logger.info(f">>> trigger_agent: Attempting to trigger agent '{name}'")
 
-    # Combine all known agent functions for lookup using corrected absolute imports
-    all_agent_functions = {
-        "Radical Expander": run_radical_expander,
-        "Wild Product Agent": run_product_agent,
-        "Debate Agent": run_debate_agent,
-        "Skeptical Agent": run_skeptical_agent,
-        "One Small Thing": run_one_small_thing_agent,
-        "Disruptor": run_disruptor_agent,
-        "Ethan Mollick": run_ethan_mollick_agent,  # Add Ethan Mollick agent
-        # Add mappings for other agents if/when imported
-    }
-
-    # Check if this is a custom agent
-    is_custom_agent = False
-    custom_agent_config = None
-    for agent in CUSTOM_AGENTS:
-        if agent.get("name") == name:
-            is_custom_agent = True
-            custom_agent_config = agent
-            break
-
-    if is_custom_agent:
-        logger.info(f"--- Triggering custom agent: '{name}'")
-        try:
-            # Run the dynamic agent with the custom config
-            await run_dynamic_agent(
-                text=current_segment_text,
-                model=model,
-                broadcaster=broadcaster,
-                agent_config=custom_agent_config
-            )
-            logger.info(f"Custom agent '{name}' execution initiated successfully.")
-        except Exception as e:
-            logger.error(f"Error executing custom agent '{name}': {e}")
-            logger.exception("Traceback:")
-            if "429 Resource exhausted" in str(e):
-                logger.error(f"RATE LIMITING ERROR: API quota exceeded for custom agent '{name}'.")
-    else:
-        # Handle built-in agents
-        agent_function = all_agent_functions.get(name)
-
-        if agent_function:
-            try:
-                if name == "Debate Agent":
-                    logger.info(f"--- Passing context buffer (len: {len(context_buffer)}) to {name}")
-                    await agent_function(recent_context=context_buffer, model=model, broadcaster=broadcaster)
-                # Check if the agent is one of the content-routable ones expecting 'text'
-                elif name in LLM_ROUTABLE_AGENTS:
-                    logger.info(f"--- Passing current segment (len: {len(current_segment_text)}) to {name}")
-                    await agent_function(text=current_segment_text, model=model, broadcaster=broadcaster)
-                else:
-                    # Fallback for safety, though ideally all called agents should be categorized
-                    logger.warning(f"Agent '{name}' triggered but not explicitly categorized for context. Passing current segment.")
-                    await agent_function(text=current_segment_text, model=model, broadcaster=broadcaster)
-
-                logger.info(f"Agent '{name}' execution initiated successfully.")
+    # Explicitly requested agents jump the provider queues ahead of automatic ones
+    priority = CallPriority.EXPLICIT if name in EXPLICIT_AGENTS else CallPriority.AUTO
+    priority_token = current_call_priority.set(priority)
+    try:
+        # Check if this is a custom agent
+        custom_agent_config = agent_catalog.snapshot.get(name)
 
+        if custom_agent_config is not None:
+            logger.info(f"--- Triggering custom agent: '{name}'")
+            try:
+                # Run the dynamic agent with the custom config
+                await run_dynamic_agent(
+                    text=current_segment_text,
+                    model=model,
+                    broadcaster=broadcaster,
+                    agent_config=custom_agent_config
+                )
+                logger.info(f"Custom agent '{name}' execution initiated successfully.")
             except Exception as e:
-                logger.error(f"Error executing agent '{name}': {e}")
+                logger.error(f"Error executing custom agent '{name}': {e}")
                 logger.exception("Traceback:")
-                # Don't send error cards to the frontend
-                # If there's a rate limiting error (429), log it specifically
                 if "429 Resource exhausted" in str(e):
-                    logger.error(f"RATE LIMITING ERROR: API quota exceeded for agent '{name}'. Consider increasing MIN_TRAFFIC_COP_INTERVAL.")
+                    logger.error(f"RATE LIMITING ERROR: API quota exceeded for custom agent '{name}'.")
         else:
-            logger.warning(f"Attempted to trigger unknown agent: '{name}'")
-            # Don't send error cards to the frontend
-            logger.error(f"Unknown agent requested: '{name}'")
\ No newline at end of file
+            # Handle built-in agents
+            spec = get_agent_spec(name)
+
+            if spec:
+                try:
+                    if spec.input == INPUT_CONTEXT:
+                        memory = current_meeting_memory.get()
+                        if memory is not None:
+                            context_buffer = memory.context(spec.context_tokens)
+                        context_buffer = context_buffer or ""
+                        logger.info(f"--- Passing context buffer (len: {len(context_buffer)}) to {spec.name}")
+                        await run_agent(spec, context_buffer, model, broadcaster)
+                    else:
+                        logger.info(f"--- Passing current segment (len: {len(current_segment_text)}) to {spec.name}")
+                        await run_agent(spec, current_segment_text, model, broadcaster)
+
+                    logger.info(f"Agent '{name}' execution initiated successfully.")
+
+                except Exception as e:
+                    logger.error(f"Error executing agent '{name}': {e}")
+                    logger.exception("Traceback:")
+                    # Don't send error cards to the frontend
+                    # If there's a rate limiting error (429), log it specifically
+                    if "429 Resource exhausted" in str(e):
+                        logger.error(f"RATE LIMITING ERROR: API quota exceeded for agent '{name}'. Consider increasing MIN_TRAFFIC_COP_INTERVAL.")
+            else:
+                logger.warning(f"Attempted to trigger unknown agent: '{name}'")
+                # Don't send error cards to the frontend
+                logger.error(f"Unknown agent requested: '{name}'")
+    finally:
+        current_call_priority.reset(priority_token)
+
+async def trigger_agents(
+    names: list,
+    current_segment_text: str,
+    model,
+    broadcaster: callable,
+    context_buffer: Optional[str] = None
+):
+    """
+    Triggers several agents for the same segment. Combinable agents share a single
+    request when COMBINED_AGENT_MODE is on; the rest are triggered individually.
+    """
+    if len(names) == 1:
+        await trigger_agent(names[0], current_segment_text, model, broadcaster, context_buffer)
+        return
+
+    combined = [name for name in names if is_combinable(name)] if COMBINED_AGENT_MODE else []
+    if len(combined) < 2:
+        combined = []
+    individual = [name for name in names if name not in combined]
+
+    tasks = [
+        trigger_agent(name, current_segment_text, model, broadcaster, context_buffer)
+        for name in individual
+    ]
+    if combined:
+        logger.info(f">>> trigger_agents: Combining {combined} into one request")
+        tasks.append(run_combined_agents(combined, current_segment_text, model, broadcaster))
+
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            logger.error(f"Error executing agents {names}: {result}")
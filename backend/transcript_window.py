@@ -0,0 +1,143 @@
+"""
+Recent transcript kept as one string, sliced by token budget or by time.
+
+The window joins final segments into a single buffer as they arrive and
+records where each segment starts, its running token count and when it
+was said. "The last N tokens" and "the last T seconds" are then a single
+slice of that buffer, found by arithmetic or a binary search, instead of a
+re-join of every segment per call, and costs only the length of what it
+returns. Old segments fall off the front by moving a start index; the
+buffer and the per-segment records are compacted only once the dropped
+part outweighs the kept part, so eviction is amortized O(1) and the
+buffer never grows past twice the window.
+
+Token counts use estimate_tokens, the estimate used for budgets elsewhere.
+"""
+import os
+import time
+import bisect
+from typing import List, Optional
+
+from usage_tracking import estimate_tokens
+
+# --- Transcript Window Configuration ---
+# The most recent transcript kept, in characters and in seconds; the latest segment is always kept
+TRANSCRIPT_WINDOW_MAX_CHARS = int(os.getenv("TRANSCRIPT_WINDOW_MAX_CHARS", "16000"))
+TRANSCRIPT_WINDOW_MAX_SECONDS = float(os.getenv("TRANSCRIPT_WINDOW_MAX_SECONDS", "1800"))
+# Characters per token, matching estimate_tokens
+CHARS_PER_TOKEN = 4
+
+
+class TranscriptWindow:
+    """
+    Bounded, append-only window over a session's final segments.
+
+    Offsets are absolute: they count every character appended since the
+    window was created, so compaction never has to rewrite them.
+    """
+    __slots__ = ("max_chars", "max_seconds", "_text", "_origin", "_head",
+                 "_starts", "_tokens_before", "_times", "_tokens_total")
+
+    def __init__(self, max_chars: int = TRANSCRIPT_WINDOW_MAX_CHARS,
+                 max_seconds: float = TRANSCRIPT_WINDOW_MAX_SECONDS):
+        self.max_chars = max_chars
+        self.max_seconds = max_seconds
+        # Joined segments; _text[0] is at absolute offset _origin
+        self._text = ""
+        self._origin = 0
+        # Index of the oldest kept segment in the per-segment lists
+        self._head = 0
+        # Per segment: absolute start offset, tokens appended before it and when it was added
+        self._starts: List[int] = []
+        self._tokens_before: List[int] = []
+        self._times: List[float] = []
+        self._tokens_total = 0
+
+    def __len__(self) -> int:
+        return len(self._starts) - self._head
+
+    @property
+    def _end(self) -> int:
+        return self._origin + len(self._text)
+
+    @property
+    def chars(self) -> int:
+        """Characters kept, separators included."""
+        return self._end - self._starts[self._head] if len(self) else 0
+
+    @property
+    def tokens(self) -> int:
+        """Estimated tokens kept."""
+        return self._tokens_total - self._tokens_before[self._head] if len(self) else 0
+
+    def append(self, segment: str, timestamp: Optional[float] = None):
+        """Add a final segment, said at timestamp (time.monotonic() by default)."""
+        segment = segment.strip()
+        if not segment:
+            return
+        timestamp = time.monotonic() if timestamp is None else timestamp
+        if self._text:
+            self._text += " "
+        self._starts.append(self._end)
+        self._tokens_before.append(self._tokens_total)
+        self._times.append(timestamp)
+        self._text += segment
+        self._tokens_total += estimate_tokens(segment)
+
+        # Drop the oldest segments past either limit, always keeping the latest
+        last = len(self._starts) - 1
+        while self._head < last and (self._end - self._starts[self._head] > self.max_chars
+                                     or timestamp - self._times[self._head] > self.max_seconds):
+            self._head += 1
+        self._compact()
+
+    def _compact(self):
+        """Release dropped text and records once they outweigh what is kept."""
+        dropped = self._starts[self._head] - self._origin
+        if dropped > len(self._text) - dropped:
+            self._text = self._text[dropped:]
+            self._origin += dropped
+        if self._head > len(self._starts) - self._head:
+            del self._starts[:self._head]
+            del self._tokens_before[:self._head]
+            del self._times[:self._head]
+            self._head = 0
+
+    def _slice_from(self, offset: int) -> str:
+        return self._text[offset - self._origin:]
+
+    def text(self) -> str:
+        """Everything kept, oldest first."""
+        return self._slice_from(self._starts[self._head]) if len(self) else ""
+
+    def last_tokens(self, max_tokens: int) -> str:
+        """
+        The most recent transcript within max_tokens.
+
+        Cut at a word boundary, so a single long final is trimmed from the
+        front rather than sent whole.
+        """
+        if not len(self) or max_tokens <= 0:
+            return ""
+        first = self._starts[self._head]
+        start = self._end - max_tokens * CHARS_PER_TOKEN
+        if start <= first:
+            return self._slice_from(first)
+        space = self._text.find(" ", start - self._origin - 1)
+        if space < 0:
+            # The budget ends inside the last word
+            return self._slice_from(start)
+        return self._text[space + 1:]
+
+    def last_seconds(self, seconds: float, now: Optional[float] = None) -> str:
+        """Segments added in the last seconds (relative to now, time.monotonic() by default)."""
+        if not len(self):
+            return ""
+        cutoff = (time.monotonic() if now is None else now) - seconds
+        index = bisect.bisect_left(self._times, cutoff, lo=self._head)
+        if index >= len(self._starts):
+            return ""
+        return self._slice_from(self._starts[index])
+
+    def stats(self) -> dict:
+        return {"segments": len(self), "chars": self.chars, "tokens": self.tokens}
@@ -0,0 +1,350 @@
+"""
+Usage accounting for the AI Meeting Assistant.
+
+Collects normalized token usage, estimated cost and latency for every LLM
+call and rolls them up per session, per agent and per model. All counters
+are fixed-size, so memory stays bounded no matter how many calls are made.
+"""
+import os
+import time
+import bisect
+import logging
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Dict, Optional, Any
+
+from model_registry import get_model_spec
+from io_executor import JsonLinesWriter
+
+# Get the logger instance configured in main.py
+logger = logging.getLogger("main")
+
+# File that receives one JSON line per finished session
+USAGE_LOG_FILE = os.path.join(os.path.dirname(__file__), 'usage_log.jsonl')
+
+# Upper bound on sessions held in memory (oldest are flushed to disk first)
+MAX_TRACKED_SESSIONS = int(os.getenv("MAX_TRACKED_SESSIONS", "256"))
+
+# Upper bound on distinct agent / model keys per rollup; extra keys share one bucket
+MAX_TRACKED_KEYS = 128
+OVERFLOW_KEY = "(other)"
+
+# Session the current task belongs to. Set by the WebSocket handler so that
+# tasks it spawns inherit it without threading the id through every agent.
+current_session_id: ContextVar[Optional[str]] = ContextVar("current_session_id", default=None)
+
+# Latency histogram bucket upper bounds in milliseconds
+LATENCY_BUCKETS_MS = (
+    50, 100, 200, 300, 500, 750, 1000, 1500, 2000,
+    3000, 5000, 7500, 10000, 15000, 30000, 60000
+)
+
+
+def empty_usage() -> Dict[str, int]:
+    """Return a usage dict with every normalized key set to zero."""
+    return {
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "total_tokens": 0,
+        "cached_input_tokens": 0,
+    }
+
+
+def normalize_usage(input_tokens: Optional[int] = None,
+                    output_tokens: Optional[int] = None,
+                    total_tokens: Optional[int] = None,
+                    cached_input_tokens: Optional[int] = None) -> Dict[str, int]:
+    """
+    Build a usage dict with the same keys for every provider.
+
+    Missing values are treated as zero and ``total_tokens`` is derived
+    when the provider does not report it.
+    """
+    usage = empty_usage()
+    usage["input_tokens"] = int(input_tokens or 0)
+    usage["output_tokens"] = int(output_tokens or 0)
+    usage["cached_input_tokens"] = int(cached_input_tokens or 0)
+    usage["total_tokens"] = int(total_tokens or (usage["input_tokens"] + usage["output_tokens"]))
+    return usage
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) for budgeting decisions."""
+    return len(text) // 4 if text else 0
+
+
+def estimate_cost(model_name: str, usage: Dict[str, int]) -> float:
+    """Estimate the USD cost of a call from its normalized usage."""
+    spec = get_model_spec(model_name)
+    if not spec or not usage:
+        return 0.0
+    cached = usage.get("cached_input_tokens", 0)
+    uncached = max(usage.get("input_tokens", 0) - cached, 0)
+    return (
+        uncached * spec.input_price
+        + cached * spec.cached_input_price
+        + usage.get("output_tokens", 0) * spec.output_price
+    ) / 1_000_000
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram; memory does not grow with call volume."""
+    __slots__ = ("counts", "count", "total_ms", "max_ms")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, value_ms: float):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS_MS, value_ms)] += 1
+        self.count += 1
+        self.total_ms += value_ms
+        if value_ms > self.max_ms:
+            self.max_ms = value_ms
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """Return the bucket upper bound that contains the given percentile."""
+        if not self.count:
+            return None
+        rank = pct / 100.0 * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                if index < len(LATENCY_BUCKETS_MS):
+                    return float(min(LATENCY_BUCKETS_MS[index], self.max_ms))
+                return self.max_ms
+        return self.max_ms
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total_ms / self.count, 1) if self.count else None,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "max_ms": round(self.max_ms, 1) if self.count else None,
+        }
+
+
+class UsageCounter:
+    """Running totals for one rollup key (a session, an agent or a model)."""
+    __slots__ = ("calls", "errors", "input_tokens", "output_tokens",
+                 "cached_input_tokens", "cost_usd", "latency", "ttft", "queue_wait",
+                 "cancelled", "saved_tokens")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cached_input_tokens = 0
+        self.cost_usd = 0.0
+        self.latency = LatencyHistogram()
+        self.ttft = LatencyHistogram()
+        self.queue_wait = LatencyHistogram()
+        # Cancellation reason -> count; reasons are a small fixed set
+        self.cancelled: Dict[str, int] = {}
+        self.saved_tokens = 0
+
+    def add(self, usage: Dict[str, int], cost_usd: float, latency_ms: Optional[float],
+            ttft_ms: Optional[float], queue_ms: Optional[float], error: bool):
+        self.calls += 1
+        if error:
+            self.errors += 1
+        self.input_tokens += usage.get("input_tokens", 0)
+        self.output_tokens += usage.get("output_tokens", 0)
+        self.cached_input_tokens += usage.get("cached_input_tokens", 0)
+        self.cost_usd += cost_usd
+        if latency_ms is not None:
+            self.latency.add(latency_ms)
+        if ttft_ms is not None:
+            self.ttft.add(ttft_ms)
+        if queue_ms is not None:
+            self.queue_wait.add(queue_ms)
+
+    def add_cancellation(self, reason: str, saved_tokens: int):
+        self.cancelled[reason] = self.cancelled.get(reason, 0) + 1
+        self.saved_tokens += saved_tokens
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "cached_input_tokens": self.cached_input_tokens,
+            "total_tokens": self.input_tokens + self.output_tokens,
+            "cache_hit_ratio": round(self.cached_input_tokens / self.input_tokens, 3) if self.input_tokens else 0.0,
+            "cost_usd": round(self.cost_usd, 6),
+            "latency": self.latency.to_dict(),
+            "time_to_first_token": self.ttft.to_dict(),
+            "queue_wait": self.queue_wait.to_dict(),
+            "cancelled": sum(self.cancelled.values()),
+            "cancelled_by_reason": dict(self.cancelled),
+            "saved_tokens_estimate": self.saved_tokens,
+        }
+
+
+class UsageRollup:
+    """Totals plus per-agent and per-model breakdowns."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.totals = UsageCounter()
+        self.by_agent: Dict[str, UsageCounter] = {}
+        self.by_model: Dict[str, UsageCounter] = {}
+
+    @staticmethod
+    def _counter(table: Dict[str, UsageCounter], key: str) -> UsageCounter:
+        counter = table.get(key)
+        if counter is None:
+            if len(table) >= MAX_TRACKED_KEYS:
+                key = OVERFLOW_KEY
+                counter = table.get(key)
+            if counter is None:
+                counter = table[key] = UsageCounter()
+        return counter
+
+    def add(self, agent_name: str, model_key: str, *args):
+        self.totals.add(*args)
+        self._counter(self.by_agent, agent_name).add(*args)
+        self._counter(self.by_model, model_key).add(*args)
+
+    def add_cancellation(self, agent_name: str, model_key: str, *args):
+        self.totals.add_cancellation(*args)
+        self._counter(self.by_agent, agent_name).add_cancellation(*args)
+        self._counter(self.by_model, model_key).add_cancellation(*args)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "started_at": self.started_at,
+            "duration_s": round(time.time() - self.started_at, 1),
+            "totals": self.totals.to_dict(),
+            "by_agent": {name: counter.to_dict() for name, counter in self.by_agent.items()},
+            "by_model": {name: counter.to_dict() for name, counter in self.by_model.items()},
+        }
+
+
+class UsageTracker:
+    """
+    Aggregates LLM usage for the whole process and for each live session.
+
+    Every call is counted in the process-wide rollup and, when the call
+    belongs to a session, in that session's rollup too. Session rollups are
+    written to USAGE_LOG_FILE when the session ends.
+    """
+    def __init__(self):
+        self.global_rollup = UsageRollup()
+        self.sessions: "OrderedDict[str, UsageRollup]" = OrderedDict()
+        self.usage_log = JsonLinesWriter(USAGE_LOG_FILE)
+
+    def start_session(self, session_id: str):
+        """Begin tracking a new session."""
+        self.sessions[session_id] = UsageRollup()
+        while len(self.sessions) > MAX_TRACKED_SESSIONS:
+            # Flush the oldest session rather than dropping its numbers
+            oldest_id = next(iter(self.sessions))
+            self.end_session(oldest_id)
+
+    def record(self,
+               agent_name: Optional[str],
+               provider: Any,
+               model_name: str,
+               usage: Optional[Dict[str, int]] = None,
+               latency_ms: Optional[float] = None,
+               ttft_ms: Optional[float] = None,
+               queue_ms: Optional[float] = None,
+               error: bool = False,
+               session_id: Optional[str] = None):
+        """
+        Record one LLM call.
+
+        Args:
+            agent_name: Agent that made the call (None for unattributed calls)
+            provider: Provider that served the call
+            model_name: Model that served the call
+            usage: Normalized usage dict (see normalize_usage)
+            latency_ms: Wall-clock latency of the provider call, excluding queue wait
+            ttft_ms: Time until the first output token arrived
+            queue_ms: Time spent waiting for a provider concurrency slot
+            error: Whether the call failed
+            session_id: Session to attribute the call to; defaults to the
+                session of the current task
+        """
+        usage = usage or empty_usage()
+        agent_key = agent_name or "(unattributed)"
+        provider_name = getattr(provider, "value", provider) or "unknown"
+        model_key = f"{provider_name}:{model_name}"
+        cost_usd = estimate_cost(model_name, usage)
+        args = (usage, cost_usd, latency_ms, ttft_ms, queue_ms, error)
+
+        self.global_rollup.add(agent_key, model_key, *args)
+
+        if session_id is None:
+            session_id = current_session_id.get()
+        session = self.sessions.get(session_id) if session_id else None
+        if session is not None:
+            session.add(agent_key, model_key, *args)
+
+    def record_cancellation(self,
+                            agent_name: Optional[str],
+                            provider: Any,
+                            model_name: str,
+                            reason: str,
+                            saved_tokens: int = 0,
+                            session_id: Optional[str] = None):
+        """
+        Record an LLM call abandoned before it completed.
+
+        Args:
+            agent_name: Agent that made the call (None for unattributed calls)
+            provider: Provider the call was sent or queued for
+            model_name: Model the call was for
+            reason: Why it was cancelled, e.g. "deadline", "superseded" or "session_closed"
+            saved_tokens: Estimated tokens not spent because of the cancellation
+            session_id: Session to attribute the call to; defaults to the
+                session of the current task
+        """
+        agent_key = agent_name or "(unattributed)"
+        provider_name = getattr(provider, "value", provider) or "unknown"
+        model_key = f"{provider_name}:{model_name}"
+
+        self.global_rollup.add_cancellation(agent_key, model_key, reason, saved_tokens)
+
+        if session_id is None:
+            session_id = current_session_id.get()
+        session = self.sessions.get(session_id) if session_id else None
+        if session is not None:
+            session.add_cancellation(agent_key, model_key, reason, saved_tokens)
+
+    def snapshot(self, session_id: Optional[str] = None) -> Dict[str, Any]:
+        """Return usage totals for the process, or for a single session."""
+        if session_id is not None:
+            session = self.sessions.get(session_id)
+            if session is None:
+                return {"error": f"Unknown session: {session_id}"}
+            return {"session_id": session_id, **session.to_dict()}
+        return {
+            "active_sessions": len(self.sessions),
+            **self.global_rollup.to_dict(),
+        }
+
+    def end_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Stop tracking a session and append its summary to USAGE_LOG_FILE (on the I/O thread)."""
+        session = self.sessions.pop(session_id, None)
+        if session is None:
+            return None
+        summary = {"session_id": session_id, "ended_at": time.time(), **session.to_dict()}
+        self.usage_log.append(summary)
+        totals = summary["totals"]
+        logger.info(
+            f"Session {session_id} usage: {totals['calls']} calls, "
+            f"{totals['total_tokens']} tokens, ${totals['cost_usd']:.4f}"
+        )
+        return summary
+
+
+# Create singleton instance
+usage_tracker = UsageTracker()
@@ -3,75 +3,37 @@ Utility functions for the AI Meeting Assistant.
 Contains shared functions for formatting and standardizing agent outputs.
 """
 import logging
-import os
 import re
 
+from prompt_registry import prompt_registry
+
 # Get the logger instance configured in main.py
 logger = logging.getLogger("main")
 
-# Agent prompt extraction function - doesn't modify original files
-def extract_agent_prompt(agent_name):
+# Agent prompt lookup - prompts are parsed once into the prompt registry
+def extract_agent_prompt(agent_name, original=False):
     """
-    Extracts the prompt text from an agent file without modifying it.
-    Returns the raw prompt text in human-readable form.
+    Returns an agent's prompt text in human-readable (source) form: the
+    prompt it currently uses, or with original=True the one in its module.
     """
-    # Map agent names to their file names
-    agent_files = {
-        "Radical Expander": "radical_expander.py",
-        "Product Agent": "product_agent.py",
-        "Debate Agent": "debate_agent.py", 
-        "Skeptical Agent": "skeptical_agent.py",
-        "Next Step Agent": "one_small_thing_agent.py",
-        "Disruptor": "disruptor_agent.py",
-        "Ethan Mollick": "ethan_mollick_agent.py"
-    }
+    # Built-in agents are registered in agents.registry. Imported here because
+    # the agent modules themselves import this one.
+    from agents.registry import get_agent_spec
+    spec = get_agent_spec(agent_name)
     
-    if agent_name not in agent_files:
+    if not spec:
         logger.error(f"Unknown agent name: {agent_name}")
         return {"error": f"Unknown agent: {agent_name}"}
     
-    # File path
-    file_path = os.path.join(os.path.dirname(__file__), "agents", agent_files[agent_name])
-    
-    try:
-        # Read the file
-        with open(file_path, 'r') as f:
-            content = f.read()
-            
-        # Extract various prompt types (direct_prompt, full_prompt, etc)
-        prompt_text = ""
-        
-        # Check for direct_prompt first (most agents use this)
-        if "direct_prompt = f\"\"\"" in content:
-            match = re.search(r'direct_prompt = f"""(.*?)"""', content, re.DOTALL)
-            if match:
-                prompt_text = match.group(1)
+    prompt_text = prompt_registry.original(spec.name) if original else prompt_registry.current(spec.name)
+    if not prompt_text:
+        return {"error": "No prompt found in agent file"}
         
-        # If not found, check for other common patterns
-        elif "full_prompt = f\"\"\"" in content:
-            match = re.search(r'full_prompt = f"""(.*?)"""', content, re.DOTALL)
-            if match:
-                prompt_text = match.group(1)
-        
-        # If still not found, look for any triple-quoted string
-        if not prompt_text:
-            # Look for any variable assigned to a triple-quoted string
-            matches = re.findall(r'(\w+)\s*=\s*f"""(.*?)"""', content, re.DOTALL)
-            if matches:
-                prompt_text = matches[0][1]  # Get the text part
-        
-        if not prompt_text:
-            return {"error": "No prompt found in agent file"}
-            
-        return {
-            "success": True,
-            "prompt_text": prompt_text,
-            "agent_name": agent_name
-        }
-        
-    except Exception as e:
-        logger.error(f"Error extracting prompt from {file_path}: {str(e)}")
-        return {"error": f"Error extracting prompt: {str(e)}"}
+    return {
+        "success": True,
+        "prompt_text": prompt_text,
+        "agent_name": agent_name
+    }
 
 async def format_agent_response(agent_name: str, content: str, broadcaster: callable, type: str = "insight"):
     """
@@ -165,4 +127,54 @@ CRITICAL REQUIREMENTS:
 - Be concrete, specific, and crystal clear
 - Make sure your idea is truly revolutionary, not an incremental improvement
 - Prioritize ideas that would shock traditional executives
-"""
\ No newline at end of file
+"""
+
+# --- Early Abort of Streamed Responses ---
+# Markers agents answer with when a segment gives them nothing to work with
+NO_CONTEXT_MARKERS = ("NO_BUSINESS_CONTEXT", "NO_RELEVANT_CONTEXT")
+
+# Openings of refusals and apologies, which never turn into a usable card
+APOLOGY_PATTERN = re.compile(r"^(?:i'?m sorry|sorry|i apologi[sz]e|i (?:cannot|can't) (?:help|assist|provide)|i(?:'m| am) unable|as an ai)\b")
+
+# A structured card (see structured_output.py) that declares itself irrelevant
+IRRELEVANT_CARD_PATTERN = re.compile(r'^\{\s*"relevant"\s*:\s*false')
+
+
+class EarlyAbortCheck:
+    """
+    Watches the start of a streamed response and reports when it is a
+    no-context marker or an apology, so the request can be aborted before
+    the rest is generated. Pass an instance as generate_content's early_abort.
+
+    Only the first DECIDE_CHARS characters are inspected; after that every
+    call returns False immediately. A marker is recognised from its first
+    MARKER_PREFIX_CHARS characters, which no real card starts with.
+    """
+    DECIDE_CHARS = 48
+    MARKER_PREFIX_CHARS = 6
+
+    def __init__(self, markers=NO_CONTEXT_MARKERS):
+        self.prefixes = [marker.lower()[:self.MARKER_PREFIX_CHARS] for marker in markers]
+        self.reason = None
+        self._head = ""
+        self._decided = False
+
+    def __call__(self, text: str) -> bool:
+        """Feed the next streamed chunk; returns True once the response should be aborted."""
+        if self._decided:
+            return False
+        self._head += text
+        head = self._head.lstrip(" \t\n\"'`*").lower().replace("\u2019", "'")
+        if any(head.startswith(prefix) for prefix in self.prefixes):
+            self.reason = "no context marker"
+        elif APOLOGY_PATTERN.match(head):
+            self.reason = "apology"
+        elif IRRELEVANT_CARD_PATTERN.match(head):
+            self.reason = "irrelevant structured card"
+        elif len(head) >= self.DECIDE_CHARS:
+            self._decided = True
+            return False
+        else:
+            return False
+        self._decided = True
+        return True
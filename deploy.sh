@@ -29,6 +29,7 @@ gcloud run deploy backend \
     --platform managed \
     --region us-east1 \
     --allow-unauthenticated \
+    --cpu-boost \
     --project=meetinganalyzer-454912
 
 echo -e "${GREEN}Backend deployed successfully.${NC}"